@@ -10,6 +10,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import atexit
+import os
+import shutil
+import sys
+import tempfile
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -40,6 +45,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Первым — чтобы Server-Timing учитывал весь запрос (см. diary_analytic/request_metrics.py)
+    'diary_analytic.request_metrics.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -79,9 +86,30 @@ DATABASES = {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
         # 'NAME': BASE_DIR / 'sync' / 'db' / 'db.sqlite3',
+        # Соединение живёт между запросами (не переоткрывается и не настраивается заново на каждый клик)
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            # Сколько секунд ждать блокировку записи, прежде чем «database is locked»
+            'timeout': 20,
+        },
     }
 }
 
+# Журнал WAL (journal_mode=WAL, synchronous=NORMAL, см. diary_analytic/sqlite_tuning.py).
+# Режим записывается в сам файл базы, а свежие коммиты живут в db.sqlite3-wal до checkpoint:
+# скопированный или закоммиченный в git db.sqlite3 без -wal теряет данные. Поэтому по умолчанию —
+# журнал отката; WAL включайте (DIARY_SQLITE_WAL=1) только для базы, которая не лежит в git.
+DIARY_SQLITE_WAL = os.environ.get('DIARY_SQLITE_WAL') == '1'
+
+# PRAGMA на каждом новом соединении SQLite (после режима журнала); {} — умолчания SQLite
+DIARY_SQLITE_PRAGMAS = {
+    'mmap_size': 256 * 2**20,    # читать файл базы через mmap (до 256 МБ)
+    'cache_size': -64 * 2**10,   # кэш страниц 64 МБ (отрицательное значение — в КиБ)
+    'temp_store': 'MEMORY',
+    'busy_timeout': 20000,       # мс, как OPTIONS['timeout']
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -124,6 +152,74 @@ STATIC_URL = 'static/'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Каталог с обученными моделями: <DIARY_MODELS_DIR>/<strategy>/<target>.pkl
+DIARY_MODELS_DIR = BASE_DIR / 'diary_analytic' / 'trained_models'
+
+# Режим обучения: 'shared' — все targets по одной матрице Грама, 'per_target' — по одному,
+# 'parallel' — по одному, но в пуле из DIARY_TRAIN_WORKERS процессов (0 — по числу ядер)
+DIARY_TRAIN_MODE = 'shared'
+DIARY_TRAIN_WORKERS = 0
+
+# Дообучение после каждой правки значения по сохранённым статистикам (XᵀX, Σx, n),
+# без полного переобучения; статистики появляются после первого retrain
+DIARY_ONLINE_UPDATES = True
+# Правки копятся и применяются в фоне не чаще раза в DIARY_ONLINE_INTERVAL секунд
+# (запись .pkl, статистик и CSV коэффициентов — не в запросе)
+DIARY_ONLINE_INTERVAL = 5
+
+# Экспорт дневника (CSV или .xlsx) после изменений: в фоне и не чаще раза в DIARY_EXPORT_INTERVAL секунд
+DIARY_EXPORT_PATH = BASE_DIR / 'other' / 'export.csv'
+DIARY_EXPORT_INTERVAL = 5
+# Переписывать только строки изменённых дат (индекс строк — в <файл>.index.json); полный экспорт —
+# когда меняется набор столбцов
+DIARY_EXPORT_INCREMENTAL = True
+
+# Снимок широкой таблицы рядом с базой (<db>.snapshot/: matrix.npy + index.json) для быстрого
+# холодного старта; после изменений пересобирается в фоне не чаще раза в DIARY_SNAPSHOT_INTERVAL секунд
+DIARY_SNAPSHOT = True
+DIARY_SNAPSHOT_INTERVAL = 30
+
+# Уровень логгеров подсистем (web/predict/db/base_model/flags_model). 'DEBUG' включает подробные
+# дампы (таблицы при обучении, значения за день) — они считаются, только если уровень их пропускает
+DIARY_LOG_LEVEL = 'INFO'
+
+# Кэши Django. 'predictions' — готовые прогнозы по дате (diary_analytic/prediction_cache.py):
+# ключ включает штампы данных дня и моделей, записи с устаревшими штампами уходят по TIMEOUT/MAX_ENTRIES.
+# Файловый кэш — общий для всех процессов с этим каталогом: штампы, поднятые другим процессом
+# (manage.py import_diary, обучение), видны серверу сразу. В тестах — временный каталог.
+DIARY_CACHE_DIR = BASE_DIR / 'cache'
+if len(sys.argv) > 1 and sys.argv[1] == 'test':
+    DIARY_CACHE_DIR = Path(tempfile.mkdtemp(prefix='diary-test-cache-'))
+    atexit.register(shutil.rmtree, DIARY_CACHE_DIR, ignore_errors=True)
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'predictions': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': str(DIARY_CACHE_DIR / 'predictions'),
+        'TIMEOUT': 24 * 60 * 60,
+        'OPTIONS': {'MAX_ENTRIES': 5000},
+    },
+}
+
+# Сколько последних запросов каждого view хранить для перцентилей /api/metrics/
+DIARY_METRICS_WINDOW = 500
+
+# Каталоги логов: подсистемы (web/predict/db/error) и отладка моделей (base_model/flags_model/my_test).
+# Переопределяются переменной окружения DIARY_LOG_DIR (оба каталога — в ней).
+# manage.py test пишет логи во временный каталог, который удаляется после прогона
+DIARY_LOG_DIR = BASE_DIR / 'logs'
+DIARY_MODEL_LOG_DIR = BASE_DIR / 'diary_analytic' / 'logs'
+if os.environ.get('DIARY_LOG_DIR'):
+    DIARY_LOG_DIR = DIARY_MODEL_LOG_DIR = Path(os.environ['DIARY_LOG_DIR'])
+elif len(sys.argv) > 1 and sys.argv[1] == 'test':
+    DIARY_LOG_DIR = DIARY_MODEL_LOG_DIR = Path(tempfile.mkdtemp(prefix='diary-test-logs-'))
+    atexit.register(shutil.rmtree, DIARY_LOG_DIR, ignore_errors=True)
+# FileHandler из LOGGING открывает файлы при django.setup() — каталог должен существовать
+os.makedirs(DIARY_LOG_DIR, exist_ok=True)
+
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
@@ -131,25 +227,25 @@ LOGGING = {
         'web_file': {
             'level': 'DEBUG',
             'class': 'logging.FileHandler',
-            'filename': str(BASE_DIR / 'logs/web.log'),
+            'filename': str(DIARY_LOG_DIR / 'web.log'),
             'encoding': 'utf-8',
         },
         'predict_file': {
             'level': 'DEBUG',
             'class': 'logging.FileHandler',
-            'filename': str(BASE_DIR / 'logs/predict.log'),
+            'filename': str(DIARY_LOG_DIR / 'predict.log'),
             'encoding': 'utf-8',
         },
         'db_file': {
             'level': 'DEBUG',
             'class': 'logging.FileHandler',
-            'filename': str(BASE_DIR / 'logs/db.log'),
+            'filename': str(DIARY_LOG_DIR / 'db.log'),
             'encoding': 'utf-8',
         },
         'error_file': {
             'level': 'ERROR',
             'class': 'logging.FileHandler',
-            'filename': str(BASE_DIR / 'logs/error.log'),
+            'filename': str(DIARY_LOG_DIR / 'error.log'),
             'encoding': 'utf-8',
         },
         'console': {
@@ -159,24 +255,24 @@ LOGGING = {
         'base_model_file': {
             'level': 'DEBUG',
             'class': 'logging.FileHandler',
-            'filename': str(BASE_DIR / 'logs/base_model.log'),
+            'filename': str(DIARY_LOG_DIR / 'base_model.log'),
             'encoding': 'utf-8',
         },
     },
     'loggers': {
         'web': {
             'handlers': ['web_file', 'error_file'],
-            'level': 'DEBUG',
+            'level': DIARY_LOG_LEVEL,
             'propagate': False,
         },
         'predict': {
             'handlers': ['predict_file', 'error_file'],
-            'level': 'DEBUG',
+            'level': DIARY_LOG_LEVEL,
             'propagate': False,
         },
         'db': {
             'handlers': ['db_file', 'error_file'],
-            'level': 'DEBUG',
+            'level': DIARY_LOG_LEVEL,
             'propagate': False,
         },
         'error': {
@@ -191,7 +287,7 @@ LOGGING = {
         },
         'base_model': {
             'handlers': ['base_model_file', 'error_file'],
-            'level': 'DEBUG',
+            'level': DIARY_LOG_LEVEL,
             'propagate': False,
         },
     },
@@ -16,7 +16,7 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path, include
-from diary_analytic.views import retrain_models_all, get_predictions
+from diary_analytic.views import retrain_models_all, retrain_status, get_predictions, get_predictions_range
 
 from django.shortcuts import redirect
 from datetime import date
@@ -24,7 +24,9 @@ from datetime import date
 
 urlpatterns = [
     path("get_predictions/", get_predictions, name="get_predictions"),
+    path("get_predictions_range/", get_predictions_range, name="get_predictions_range"),
     path("retrain_models_all/", retrain_models_all, name="retrain_models_all"),
+    path("retrain_status/", retrain_status, name="retrain_status"),
 
     path('admin/', admin.site.urls),
 
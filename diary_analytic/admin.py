@@ -11,13 +11,14 @@ import os
 import pandas as pd
 from slugify import slugify
 
-from .models import Entry, EntryValue, Parameter
+from .models import Entry, EntryValue, Parameter, TrainingJob
 from .importers.excel_entry_importer import import_excel_dataframe
+from .importers.stream_importer import import_diary_file
 
 
 # 📥 Форма для загрузки Excel-файла
 class ExcelImportForm(forms.Form):
-    excel_file = forms.FileField(label="Excel-файл с данными")
+    excel_file = forms.FileField(label="Excel- или CSV-файл с данными")
 
 
 @admin.register(Parameter)
@@ -47,8 +48,17 @@ class ParameterAdmin(admin.ModelAdmin):
 
         if request.method == "POST" and form.is_valid():
             try:
-                df = pd.read_excel(form.cleaned_data["excel_file"])
-                created, updated = import_excel_dataframe(df)
+                upload = form.cleaned_data["excel_file"]
+                notes = []
+                if upload.name.lower().endswith((".csv", ".xlsx", ".xlsm")):
+                    # Потоково, кусками — большой файл не читается в память целиком
+                    result = import_diary_file(upload, name=upload.name, message_callback=notes.append)
+                    created, updated = result["created"], result["updated"]
+                else:
+                    df = pd.read_excel(upload)
+                    created, updated = import_excel_dataframe(df, message_callback=notes.append)
+                for note in notes:
+                    self.message_user(request, note, messages.WARNING if note.startswith("⚠️") else messages.INFO)
                 self.message_user(request, f"✅ Импорт завершён. Создано: {created}, обновлено: {updated}", messages.SUCCESS)
                 return redirect("..")
             except Exception as e:
@@ -82,3 +92,11 @@ class EntryValueAdmin(admin.ModelAdmin):
     list_filter = ("parameter", "entry__date")
     search_fields = ("parameter__name", "entry__date")
     date_hierarchy = "entry__date"
+
+
+@admin.register(TrainingJob)
+class TrainingJobAdmin(admin.ModelAdmin):
+    list_display = ("id", "status", "done", "total", "current_target", "created_at", "finished_at")
+    list_filter = ("status",)
+    readonly_fields = [f.name for f in TrainingJob._meta.fields]
+
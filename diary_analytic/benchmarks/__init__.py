@@ -0,0 +1,25 @@
+# diary_analytic/benchmarks/__init__.py
+
+"""
+⏱️ benchmarks — замеры горячих путей дневника на синтетических данных
+
+Запуск:
+    python manage.py benchmark today_row --sizes 1000 10000 100000
+    python manage.py benchmark suite --output bench/base.json      — сохранить результаты
+    python manage.py benchmark suite --compare bench/base.json     — сравнить с прошлым прогоном
+
+Каждый модуль бенчмарка экспортирует функцию run(**options) -> dict.
+Бенчмарки работают во временной SQLite-базе (см. database.py) и не трогают db.sqlite3.
+"""
+
+# имя бенчмарка → модуль с функцией run()
+BENCHMARKS = {
+    "today_row": "diary_analytic.benchmarks.today_row",
+    "train_parallel": "diary_analytic.benchmarks.train_parallel",
+    "export": "diary_analytic.benchmarks.export",
+    "import_excel": "diary_analytic.benchmarks.import_excel",
+    "snapshot": "diary_analytic.benchmarks.snapshot",
+    "sqlite_profile": "diary_analytic.benchmarks.sqlite_profile",
+    "logging_overhead": "diary_analytic.benchmarks.logging_overhead",
+    "suite": "diary_analytic.benchmarks.suite",
+}
@@ -0,0 +1,50 @@
+# diary_analytic/benchmarks/database.py
+
+"""
+🗄️ Временная база для бенчмарков: отдельный SQLite-файл с применёнными миграциями.
+"""
+
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+
+from django.db import connection
+from django.test.utils import override_settings
+
+from diary_analytic.diary_cache import diary_cache
+from diary_analytic.export_scheduler import export_scheduler
+
+
+@contextmanager
+def benchmark_database():
+    """
+    Создаёт временную БД (как тестовый раннер Django), переключает на неё
+    соединение по умолчанию и удаляет её после выхода из блока.
+    Обученные модели тоже пишутся во временный каталог, а не в trained_models/.
+    Фоновый экспорт на время бенчмарка заглушён: он не должен мешать замерам
+    и писать синтетические данные в other/export.csv. Снимок таблицы (diary_snapshot) выключен.
+    """
+    old_name = connection.settings_dict["NAME"]
+    tmp_dir = tempfile.mkdtemp(prefix="diary_bench_")
+    connection.settings_dict.setdefault("TEST", {})["NAME"] = os.path.join(tmp_dir, "bench.sqlite3")
+    connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    overrides = override_settings(
+        DIARY_MODELS_DIR=os.path.join(tmp_dir, "trained_models"),
+        DIARY_EXPORT_PATH=os.path.join(tmp_dir, "export.csv"),
+        # Фоновая пересборка снимка таблицы не должна попадать в замеры (бенчмарк snapshot включает её сам)
+        DIARY_SNAPSHOT=False,
+    )
+    overrides.enable()
+    diary_cache.invalidate()
+    try:
+        with export_scheduler.suppress():
+            try:
+                yield tmp_dir
+            finally:
+                export_scheduler.discard()
+    finally:
+        diary_cache.invalidate()
+        overrides.disable()
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        shutil.rmtree(tmp_dir, ignore_errors=True)
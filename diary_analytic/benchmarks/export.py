@@ -0,0 +1,100 @@
+# diary_analytic/benchmarks/export.py
+
+"""
+📤 Экспорт дневника: время и пиковая память при росте истории.
+
+Размеры задаются в количестве значений (EntryValue): 10k, 100k, 1M.
+Потоковый экспорт (diary_export) сравнивается с прежней реализацией —
+список Entry, запрос entryvalue_set на каждый день и DataFrame целиком.
+Прежняя реализация медленная (N+1 запросов), поэтому меряется только
+до legacy_max значений.
+
+Ожидаемо: пиковая память потокового экспорта почти не растёт с историей.
+
+incremental — правка одного значения в самом свежем дне (update_export):
+переписывается одна строка, без чтения истории из БД.
+"""
+
+import math
+import os
+import tempfile
+import time
+import tracemalloc
+from datetime import date
+
+import pandas as pd
+
+from diary_analytic.diary_export import export_diary, update_export
+from diary_analytic.models import Entry, EntryValue, Parameter
+
+from .synthetic import populate_diary
+from .timing import measure
+
+START = date(2000, 1, 1)
+
+
+def _legacy_export(filepath: str):
+    parameters = list(Parameter.objects.order_by("name"))
+    data = []
+    for entry in Entry.objects.order_by("-date"):
+        row = {"Дата": entry.date.strftime("%d.%m.%y")}
+        values = {ev.parameter_id: ev.value for ev in entry.entryvalue_set.all()}
+        for p in parameters:
+            val = values.get(p.id, None)
+            row[p.name] = "" if val is None else int(val)
+        data.append(row)
+    df = pd.DataFrame(data)[["Дата"] + [p.name for p in parameters]]
+    df.to_csv(filepath, index=False, encoding="utf-8-sig")
+
+
+def _profile(func, filepath: str) -> dict:
+    started = time.perf_counter()
+    func(filepath)
+    elapsed = time.perf_counter() - started
+
+    # Память — отдельным прогоном: tracemalloc заметно замедляет код
+    tracemalloc.start()
+    func(filepath)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "seconds": round(elapsed, 3),
+        "peak_mb": round(peak / 2**20, 2),
+        "file_mb": round(os.path.getsize(filepath) / 2**20, 2),
+    }
+
+
+def _measure_incremental(filepath: str) -> dict:
+    export_diary(filepath)
+    latest = Entry.objects.order_by("-date").first()
+    value = EntryValue.objects.filter(entry=latest).first()
+
+    def edit():
+        # 0 ↔ 10: ширина строки меняется — худший случай со сдвигом хвоста файла
+        value.value = 10.0 if value.value < 10 else 0.0
+        value.save(update_fields=["value"])
+        update_export(filepath, {latest.date})
+
+    return measure(edit, repeat=10)
+
+
+def run(sizes=(10_000, 100_000, 1_000_000), params: int = 40, sparsity: float = 0.3,
+        legacy_max: int = 100_000, **_) -> dict:
+    results = []
+    filled = 0
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "export.csv")
+        for size in sorted(sizes):
+            days = math.ceil(size / (params * (1 - sparsity)))
+            populate_diary(days, params, sparsity=sparsity, start=START, first_day=filled)
+            filled = max(filled, days)
+            result = {
+                "values": EntryValue.objects.count(),
+                "days": filled,
+                "streaming": _profile(export_diary, path),
+            }
+            result["incremental"] = _measure_incremental(path)
+            if size <= legacy_max:
+                result["legacy"] = _profile(_legacy_export, path)
+            results.append(result)
+    return {"params": params, "sparsity": sparsity, "results": results}
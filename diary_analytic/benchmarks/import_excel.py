@@ -0,0 +1,76 @@
+# diary_analytic/benchmarks/import_excel.py
+
+"""
+📥 Импорт листа Excel (import_excel_dataframe): 10 лет × 200 столбцов.
+
+Первый прогон — в пустую базу (создаются Entry, параметры и значения),
+второй — тот же лист ещё раз (все значения обновляются через ON CONFLICT).
+sizes — количество дней (строк листа).
+
+stream — тот же лист, сохранённый в CSV: потоковый импорт кусками
+(stream_importer.import_diary_file) против чтения файла целиком (pd.read_csv);
+время и пиковая память Python (tracemalloc, отдельным прогоном).
+"""
+
+import os
+import tempfile
+import time
+import tracemalloc
+from datetime import date
+
+import pandas as pd
+
+from diary_analytic.importers.excel_entry_importer import import_excel_dataframe
+from diary_analytic.importers.stream_importer import import_diary_file
+
+from .synthetic import diary_sheet
+
+START = date(2010, 1, 1)
+
+
+def _timed_import(sheet: pd.DataFrame) -> dict:
+    started = time.perf_counter()
+    created, updated = import_excel_dataframe(sheet.copy())
+    elapsed = time.perf_counter() - started
+    return {
+        "seconds": round(elapsed, 3),
+        "rows_per_sec": round(len(sheet) / elapsed),
+        "created": created,
+        "updated": updated,
+    }
+
+
+def _profile_file(func, path: str) -> dict:
+    started = time.perf_counter()
+    func(path)
+    elapsed = time.perf_counter() - started
+
+    tracemalloc.start()
+    func(path)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"seconds": round(elapsed, 3), "peak_mb": round(peak / 2**20, 2)}
+
+
+def _measure_stream(sheet: pd.DataFrame) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "dump.csv")
+        sheet.to_csv(path, index=False, encoding="utf-8-sig")
+        return {
+            "file_mb": round(os.path.getsize(path) / 2**20, 2),
+            "streaming": _profile_file(import_diary_file, path),
+            "whole_file": _profile_file(lambda p: import_excel_dataframe(pd.read_csv(p, encoding="utf-8-sig")), path),
+        }
+
+
+def run(sizes=(3650,), params: int = 200, sparsity: float = 0.3, **_) -> dict:
+    results = []
+    for days in sizes:
+        sheet = diary_sheet(days, params, sparsity=sparsity, start=START)
+        results.append({
+            "days": days,
+            "first_import": _timed_import(sheet),
+            "reimport": _timed_import(sheet),
+            "stream": _measure_stream(sheet),
+        })
+    return {"params": params, "sparsity": sparsity, "results": results}
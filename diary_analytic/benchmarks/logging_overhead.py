@@ -0,0 +1,87 @@
+# diary_analytic/benchmarks/logging_overhead.py
+
+"""
+🧵 Стоимость логирования на горячих путях (loggers.py, DIARY_LOG_LEVEL).
+
+Профили:
+    sync_debug   — как было: уровень DEBUG, обработчики пишут в файлы в потоке запроса
+                   (все дампы таблиц и строк считаются на каждом вызове);
+    queued_debug — тот же DEBUG, но запись в файлы — в фоновом QueueListener;
+    queued_info  — по умолчанию: уровень INFO, дампы не считаются, запись в фоне.
+
+Замеры: GET /add/ (страница дня с прогнозами), GET /get_predictions/ и
+base_model.train_model для одного target.
+sizes — количество дней; история без пропусков (train_model отбрасывает строки с NaN).
+"""
+
+import logging
+from datetime import date, timedelta
+
+from django.test import Client
+
+from diary_analytic import loggers
+from diary_analytic.ml_utils import base_model
+from diary_analytic.model_registry import model_registry
+from diary_analytic.predictor_manager import PredictorManager
+from diary_analytic.utils import get_diary_dataframe
+
+from .synthetic import populate_diary
+from .timing import measure
+
+START = date(2000, 1, 1)
+
+# Логгеры, уровень которых задаёт DIARY_LOG_LEVEL
+SUBSYSTEMS = ("web", "predict", "db", "base_model", "flags_model", "my_test")
+
+
+def _set_level(level: int):
+    for name in SUBSYSTEMS:
+        logging.getLogger(name).setLevel(level)
+
+
+def _measure_all(client: Client, probe: str, df, target: str) -> dict:
+    result = {
+        "add_entry": measure(lambda: client.get(f"/add/?date={probe}"), repeat=30),
+        "get_predictions": measure(lambda: client.get(f"/get_predictions/?date={probe}"), repeat=100),
+        "train_model": measure(lambda: base_model.train_model(df, target=target), repeat=20),
+    }
+    loggers.flush_log_queue()
+    return result
+
+
+def run(sizes=(1000,), params: int = 50, sparsity: float = 0.0, **_) -> dict:
+    levels = {name: logging.getLogger(name).level for name in SUBSYSTEMS}
+    client = Client(HTTP_HOST="localhost")
+    results = []
+    filled = 0
+    try:
+        for days in sorted(sizes):
+            populate_diary(days, params, sparsity=sparsity, start=START, first_day=filled)
+            filled = days
+            df = get_diary_dataframe()
+            PredictorManager("base").train(df)
+            model_registry.invalidate()
+            probe = (START + timedelta(days=days - 1)).isoformat()
+            target = df.columns[0]
+
+            queued = loggers.restore_direct_handlers()
+            _set_level(logging.DEBUG)
+            sync_debug = _measure_all(client, probe, df, target)
+
+            for name in queued:
+                loggers.enqueue_handlers(logging.getLogger(name))
+            queued_debug = _measure_all(client, probe, df, target)
+
+            _set_level(logging.INFO)
+            queued_info = _measure_all(client, probe, df, target)
+
+            results.append({
+                "days": days,
+                "sync_debug": sync_debug,
+                "queued_debug": queued_debug,
+                "queued_info": queued_info,
+            })
+    finally:
+        for name, level in levels.items():
+            logging.getLogger(name).setLevel(level)
+    return {"params": params, "sparsity": sparsity, "results": results}
@@ -0,0 +1,101 @@
+# diary_analytic/benchmarks/report.py
+
+"""
+🗂️ Сохранение и сравнение результатов бенчмарков между коммитами.
+
+Файл результатов (--output) — JSON:
+    {"environment": {коммит, Python, версии библиотек, CPU, время запуска},
+     "options": {sizes, params, sparsity},
+     "benchmarks": {имя: результат run()}}
+
+compare() сравнивает медианы (median_ms и seconds) двух таких файлов по одинаковым путям,
+например suite/days=3650/get_today_row.
+"""
+
+import os
+import platform
+import subprocess
+import sys
+from datetime import datetime, timezone
+
+from django.conf import settings
+
+# Метрики, по которым сравниваются прогоны (меньше — лучше)
+METRICS = ("median_ms", "seconds")
+
+
+def environment() -> dict:
+    """
+    Где и на чём снимались цифры: без этого сравнение двух файлов бессмысленно.
+    """
+    import django
+    import numpy
+    import pandas
+    import sklearn
+
+    return {
+        "commit": _git("rev-parse", "HEAD"),
+        "dirty": bool(_git("status", "--porcelain", "--untracked-files=no")),
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "packages": {
+            "django": django.__version__,
+            "numpy": numpy.__version__,
+            "pandas": pandas.__version__,
+            "sklearn": sklearn.__version__,
+        },
+        "argv": sys.argv[1:],
+    }
+
+
+def _git(*args) -> str | None:
+    try:
+        return subprocess.run(
+            ["git", *args], cwd=settings.BASE_DIR, capture_output=True, text=True, timeout=10, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def flatten(result, prefix: str = "") -> dict:
+    """
+    {путь: значение} для всех METRICS в результате. Элементы списков
+    адресуются по размеру истории (days=...), если он есть, иначе по номеру.
+    """
+    flat = {}
+    if isinstance(result, dict):
+        for key, value in result.items():
+            path = f"{prefix}/{key}" if prefix else str(key)
+            if key in METRICS and isinstance(value, (int, float)):
+                flat[path] = float(value)
+            else:
+                flat.update(flatten(value, path))
+    elif isinstance(result, list):
+        for index, item in enumerate(result):
+            label = f"days={item['days']}" if isinstance(item, dict) and "days" in item else str(index)
+            flat.update(flatten(item, f"{prefix}/{label}"))
+    return flat
+
+
+def compare(current: dict, baseline: dict, threshold: float = 1.25) -> list[dict]:
+    """
+    Сравнивает benchmarks двух файлов результатов.
+
+    :param threshold: во сколько раз медленнее считается регрессией
+    :return: [{"path", "baseline", "current", "ratio", "regression"}, ...] по общим путям
+    """
+    now = flatten(current.get("benchmarks", {}))
+    before = flatten(baseline.get("benchmarks", {}))
+    rows = []
+    for path in sorted(now.keys() & before.keys()):
+        ratio = now[path] / before[path] if before[path] else None
+        rows.append({
+            "path": path,
+            "baseline": before[path],
+            "current": now[path],
+            "ratio": round(ratio, 3) if ratio is not None else None,
+            "regression": ratio is not None and ratio > threshold,
+        })
+    return rows
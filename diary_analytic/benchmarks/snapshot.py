@@ -0,0 +1,47 @@
+# diary_analytic/benchmarks/snapshot.py
+
+"""
+💽 Холодный старт широкой таблицы: полный проход по EntryValue через ORM
+против снимка на диске (diary_snapshot: отпечаток БД + mmap matrix.npy).
+
+cold_build — новый DiaryMatrixCache без снимка (как раньше при каждом старте процесса);
+cold_snapshot — новый DiaryMatrixCache при актуальном снимке;
+refresh — фоновая пересборка снимка после изменений (чтение БД + запись файла).
+sizes — количество дней.
+"""
+
+from datetime import date
+from unittest import mock
+
+from django.test.utils import override_settings
+
+from diary_analytic.diary_cache import DiaryMatrixCache, diary_cache
+from diary_analytic.diary_snapshot import snapshot_dir
+
+from .synthetic import populate_diary
+from .timing import measure
+
+START = date(2000, 1, 1)
+
+
+def _cold_start():
+    DiaryMatrixCache().get_dataframe(copy=False)
+
+
+@override_settings(DIARY_SNAPSHOT=True)
+def run(sizes=(1000, 3650, 10000), params: int = 200, sparsity: float = 0.3, **_) -> dict:
+    results = []
+    filled = 0
+    for days in sorted(sizes):
+        populate_diary(days, params, sparsity=sparsity, start=START, first_day=filled)
+        filled = days
+        with mock.patch("diary_analytic.diary_cache.snapshot_dir", return_value=None):
+            cold_build = measure(_cold_start, repeat=3)
+        diary_cache.refresh_snapshot()
+        results.append({
+            "days": days,
+            "cold_build": cold_build,
+            "cold_snapshot": measure(_cold_start, repeat=10),
+            "refresh": measure(diary_cache.refresh_snapshot, repeat=3, warmup=0),
+        })
+    return {"params": params, "sparsity": sparsity, "snapshot_dir": snapshot_dir(), "results": results}
@@ -0,0 +1,123 @@
+# diary_analytic/benchmarks/sqlite_profile.py
+
+"""
+🛠️ Профиль SQLite (sqlite_tuning.py): умолчания SQLite против WAL + DIARY_SQLITE_PRAGMAS.
+
+Для каждого профиля:
+    update_value — POST /update_value/ через тестовый клиент (коммит на каждый клик);
+    diary_dataframe — полное построение широкой таблицы (get_diary_dataframe после сброса кэша);
+    update_under_read — задержка POST /update_value/, пока другой поток в цикле читает
+        всю историю в транзакции (как обучение): в режиме журнала отката писатель ждёт читателя.
+
+«default» — как было до профиля: journal_mode=DELETE, synchronous=FULL, соединение
+переоткрывается на каждый запрос (CONN_MAX_AGE=0). «tuned» — WAL (во временной базе
+бенчмарка его можно включать независимо от DIARY_SQLITE_WAL) и DIARY_SQLITE_PRAGMAS.
+sizes — количество дней.
+"""
+
+import json
+import statistics
+import threading
+import time
+from datetime import date
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import override_settings
+
+from diary_analytic.diary_cache import build_diary_dataframe, diary_cache
+from diary_analytic.models import Entry, Parameter
+from diary_analytic.sqlite_tuning import ROLLBACK_PRAGMAS, WAL_PRAGMAS
+from diary_analytic.utils import get_diary_dataframe
+
+from .synthetic import populate_diary
+from .timing import measure
+
+START = date(2000, 1, 1)
+
+DEFAULT_PROFILE = ROLLBACK_PRAGMAS
+
+
+def _post_value(client: Client, key: str, value: int) -> float:
+    started = time.perf_counter()
+    response = client.post(
+        "/update_value/",
+        data=json.dumps({"parameter": key, "value": value, "date": "2100-01-01"}),
+        content_type="application/json",
+    )
+    assert response.status_code == 200, response.content
+    return (time.perf_counter() - started) * 1000
+
+
+def _reader(stop: threading.Event, reads: list):
+    try:
+        while not stop.is_set():
+            with transaction.atomic():
+                build_diary_dataframe(
+                    dict(Entry.objects.values_list("id", "date")),
+                    dict(Parameter.objects.values_list("id", "key")),
+                )
+            reads.append(1)
+    finally:
+        connection.close()
+
+
+def _update_under_read(client: Client, key: str, writes: int = 30) -> dict:
+    stop, reads = threading.Event(), []
+    thread = threading.Thread(target=_reader, args=(stop, reads), daemon=True)
+    thread.start()
+    time.sleep(0.05)
+    try:
+        samples = [_post_value(client, key, i % 6) for i in range(writes)]
+    finally:
+        stop.set()
+        thread.join()
+    return {
+        "median_ms": round(statistics.median(samples), 3),
+        "max_ms": round(max(samples), 3),
+        "reads_during": len(reads),
+    }
+
+
+def _measure_profile(pragmas: dict, conn_max_age: int, key: str) -> dict:
+    connection.close()
+    old_age = connection.settings_dict["CONN_MAX_AGE"]
+    connection.settings_dict["CONN_MAX_AGE"] = conn_max_age
+    try:
+        with override_settings(DIARY_SQLITE_PRAGMAS=pragmas):
+            client = Client(HTTP_HOST="localhost")
+            values = iter(range(10**6))
+            with connection.cursor() as cursor:
+                cursor.execute("PRAGMA journal_mode")
+                journal_mode = cursor.fetchone()[0]
+
+            def read_all():
+                diary_cache.invalidate()
+                get_diary_dataframe()
+
+            return {
+                "journal_mode": journal_mode,
+                "update_value": measure(lambda: _post_value(client, key, next(values) % 6), repeat=100),
+                "diary_dataframe": measure(read_all, repeat=5),
+                "update_under_read": _update_under_read(client, key),
+            }
+    finally:
+        connection.close()
+        connection.settings_dict["CONN_MAX_AGE"] = old_age
+
+
+def run(sizes=(3650,), params: int = 50, sparsity: float = 0.3, **_) -> dict:
+    tuned = {**WAL_PRAGMAS, **settings.DIARY_SQLITE_PRAGMAS}
+    results = []
+    filled = 0
+    for days in sorted(sizes):
+        populate_diary(days, params, sparsity=sparsity, start=START, first_day=filled)
+        filled = days
+        key = Parameter.objects.order_by("key").values_list("key", flat=True).first()
+        results.append({
+            "days": days,
+            "default": _measure_profile(DEFAULT_PROFILE, 0, key),
+            "tuned": _measure_profile(tuned, 600, key),
+        })
+    return {"params": params, "sparsity": sparsity, "pragmas": tuned, "results": results}
@@ -0,0 +1,87 @@
+# diary_analytic/benchmarks/suite.py
+
+"""
+🧭 Сводный набор: все горячие пути дневника и ML на одной синтетической истории.
+
+Для каждого размера истории (sizes — дней, params параметров, доля пропусков sparsity):
+    get_diary_dataframe — cold: построение широкой таблицы после сброса кэша; warm: из кэша;
+    get_today_row       — строка признаков за один день;
+    train               — PredictorManager("base").train по всей таблице (DIARY_TRAIN_MODE);
+    predict_for_date    — прогноз всех параметров на дату обученными моделями;
+    get_predictions     — GET /get_predictions/ через тестовый клиент (вместе с middleware);
+    import_excel        — import_excel_dataframe листа того же размера (в откатываемой транзакции,
+                          история для следующих размеров не меняется);
+    export_csv          — export_diary_to_csv во временный файл.
+
+Чтобы сравнивать коммиты, сохраняйте результат и сравнивайте с ним следующий прогон:
+    python manage.py benchmark suite --output bench/base.json
+    python manage.py benchmark suite --compare bench/base.json
+"""
+
+import os
+import tempfile
+from datetime import date, timedelta
+
+from django.db import transaction
+from django.test import Client
+
+from diary_analytic.diary_cache import diary_cache
+from diary_analytic.importers.excel_entry_importer import import_excel_dataframe
+from diary_analytic.model_registry import model_registry
+from diary_analytic.models import EntryValue
+from diary_analytic.predictor_manager import PredictorManager
+from diary_analytic.utils import export_diary_to_csv, get_diary_dataframe, get_today_row
+
+from .synthetic import diary_sheet, populate_diary
+from .timing import measure
+
+START = date(2000, 1, 1)
+# Лист импорта — на даты, которых нет в синтетической истории
+IMPORT_START = date(2100, 1, 1)
+
+
+def _cold_dataframe():
+    diary_cache.invalidate()
+    get_diary_dataframe()
+
+
+def _import_rolled_back(sheet):
+    with transaction.atomic():
+        import_excel_dataframe(sheet.copy())
+        transaction.set_rollback(True)
+
+
+def run(sizes=(365, 3650), params: int = 30, sparsity: float = 0.1, **_) -> dict:
+    client = Client(HTTP_HOST="localhost")
+    results = []
+    filled = 0
+    for days in sorted(sizes):
+        populate_diary(days, params, sparsity=sparsity, start=START, first_day=filled)
+        filled = days
+        probe = START + timedelta(days=days - 1)
+        df = get_diary_dataframe()
+        manager = PredictorManager("base")
+
+        result = {
+            "days": days,
+            "values": EntryValue.objects.count(),
+            "get_diary_dataframe": {
+                "cold": measure(_cold_dataframe, repeat=3),
+                "warm": measure(get_diary_dataframe, repeat=20),
+            },
+            "get_today_row": measure(lambda: get_today_row(probe), repeat=200),
+            "train": measure(lambda: manager.train(df.copy()), repeat=3, warmup=0),
+        }
+        model_registry.invalidate()
+        result["predict_for_date"] = measure(lambda: manager.predict_for_date(probe), repeat=200)
+        result["get_predictions"] = measure(
+            lambda: client.get(f"/get_predictions/?date={probe.isoformat()}"), repeat=100,
+        )
+
+        sheet = diary_sheet(days, params, sparsity=sparsity, start=IMPORT_START)
+        result["import_excel"] = measure(lambda: _import_rolled_back(sheet), repeat=3)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "export.csv")
+            result["export_csv"] = measure(lambda: export_diary_to_csv(path), repeat=3)
+        results.append(result)
+    return {"params": params, "sparsity": sparsity, "results": results}
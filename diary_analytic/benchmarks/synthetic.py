@@ -0,0 +1,87 @@
+# diary_analytic/benchmarks/synthetic.py
+
+"""
+🧪 Генератор синтетического дневника: Parameter, Entry и EntryValue пачками,
+а также лист Excel того же вида для импорта.
+"""
+
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+from diary_analytic.models import Entry, EntryValue, Parameter
+
+BATCH_SIZE = 5000
+
+
+def ensure_parameters(count: int) -> list:
+    """
+    Создаёт (если ещё нет) параметры param-000, param-001, ... и возвращает их списком.
+    """
+    keys = [f"param-{i:03d}" for i in range(count)]
+    existing = set(Parameter.objects.filter(key__in=keys).values_list("key", flat=True))
+    Parameter.objects.bulk_create(
+        [Parameter(key=k, name=f"Параметр {k[-3:]}") for k in keys if k not in existing],
+        batch_size=BATCH_SIZE,
+    )
+    by_key = {p.key: p for p in Parameter.objects.filter(key__in=keys)}
+    return [by_key[k] for k in keys]
+
+
+def populate_diary(
+    days: int,
+    params: int,
+    *,
+    sparsity: float = 0.3,
+    start: date = date(2000, 1, 1),
+    first_day: int = 0,
+    seed: int = 0,
+) -> int:
+    """
+    Заполняет дни [first_day, days) начиная от start: каждый параметр получает значение 0–5
+    с вероятностью 1 - sparsity. Сигналы не срабатывают (bulk_create).
+
+    :param first_day: с какого дня продолжать — позволяет наращивать историю по шагам
+    :return: количество созданных EntryValue
+    """
+    rng = np.random.default_rng(seed + first_day)
+    parameters = ensure_parameters(params)
+
+    dates = [start + timedelta(days=i) for i in range(first_day, days)]
+    created = 0
+    for offset in range(0, len(dates), BATCH_SIZE):
+        chunk = dates[offset:offset + BATCH_SIZE]
+        entries = Entry.objects.bulk_create([Entry(date=d) for d in chunk])
+        filled = rng.random((len(entries), len(parameters))) >= sparsity
+        values = rng.integers(0, 6, size=filled.shape)
+        rows, cols = np.nonzero(filled)
+        EntryValue.objects.bulk_create(
+            [
+                EntryValue(entry_id=entries[r].pk, parameter_id=parameters[c].pk, value=float(values[r, c]))
+                for r, c in zip(rows, cols)
+            ],
+            batch_size=BATCH_SIZE,
+        )
+        created += len(rows)
+    return created
+
+
+def diary_sheet(
+    days: int,
+    params: int,
+    *,
+    sparsity: float = 0.3,
+    start: date = date(2010, 1, 1),
+    seed: int = 0,
+) -> pd.DataFrame:
+    """
+    Лист для import_excel_dataframe: столбец «Дата» (ДД.ММ.ГГ) и params столбцов
+    «Параметр NNN» со значениями 0–5, пропуски (NaN) — с вероятностью sparsity.
+    """
+    rng = np.random.default_rng(seed)
+    values = rng.integers(0, 6, size=(days, params)).astype(float)
+    values[rng.random(values.shape) < sparsity] = np.nan
+    sheet = pd.DataFrame(values, columns=[f"Параметр {i:03d}" for i in range(params)])
+    sheet.insert(0, "Дата", pd.date_range(start, periods=days).strftime("%d.%m.%y"))
+    return sheet
@@ -0,0 +1,27 @@
+# diary_analytic/benchmarks/timing.py
+
+"""
+⏲️ Простые замеры времени: несколько повторов, статистика в миллисекундах.
+"""
+
+import statistics
+import time
+
+
+def measure(func, *, repeat: int = 20, warmup: int = 1) -> dict:
+    """
+    Вызывает func() warmup + repeat раз и возвращает статистику по последним repeat вызовам.
+    """
+    for _ in range(warmup):
+        func()
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - started) * 1000)
+    return {
+        "median_ms": round(statistics.median(samples), 4),
+        "min_ms": round(min(samples), 4),
+        "mean_ms": round(statistics.fmean(samples), 4),
+        "repeat": repeat,
+    }
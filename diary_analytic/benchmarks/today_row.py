@@ -0,0 +1,41 @@
+# diary_analytic/benchmarks/today_row.py
+
+"""
+📅 get_today_row: задержка одиночного запроса за день при росте истории.
+
+Ожидаемо: время get_today_row почти не меняется от 1k до 100k дней,
+а полное построение широкой таблицы растёт линейно (для сравнения).
+"""
+
+from datetime import date, timedelta
+
+from diary_analytic.diary_cache import build_diary_dataframe
+from diary_analytic.models import Entry, Parameter
+from diary_analytic.utils import get_today_row
+
+from .synthetic import populate_diary
+from .timing import measure
+
+START = date(2000, 1, 1)
+
+
+def _full_pivot():
+    build_diary_dataframe(
+        dict(Entry.objects.values_list("id", "date")),
+        dict(Parameter.objects.values_list("id", "key")),
+    )
+
+
+def run(sizes=(1000, 10000, 100000), params: int = 10, sparsity: float = 0.3, **_) -> dict:
+    results = []
+    filled = 0
+    for days in sorted(sizes):
+        populate_diary(days, params, sparsity=sparsity, start=START, first_day=filled)
+        filled = days
+        probe = START + timedelta(days=days // 2)
+        results.append({
+            "days": days,
+            "get_today_row": measure(lambda: get_today_row(probe), repeat=200),
+            "full_pivot": measure(_full_pivot, repeat=3),
+        })
+    return {"params": params, "sparsity": sparsity, "results": results}
@@ -0,0 +1,56 @@
+# diary_analytic/benchmarks/train_parallel.py
+
+"""
+🧵 Обучение: поцелевой цикл против пула процессов (по числу ядер) и общей матрицы Грама.
+
+Замеряется только обучение (без сохранения .pkl): speedup считается
+относительно последовательного поцелевого цикла.
+"""
+
+import os
+import time
+
+from diary_analytic.ml_utils import get_model
+from diary_analytic.ml_utils.multi_fit import fit_all_targets
+from diary_analytic.ml_utils.parallel import train_parallel
+from diary_analytic.predictor_manager import training_targets
+from diary_analytic.utils import get_diary_dataframe
+
+from .synthetic import populate_diary
+
+STRATEGIES = ["base", "flags"]
+
+
+def _seconds(func) -> float:
+    started = time.perf_counter()
+    func()
+    return round(time.perf_counter() - started, 4)
+
+
+def run(sizes=(3000,), params: int = 40, sparsity: float = 0.01, workers=None, **_) -> dict:
+    populate_diary(max(sizes), params, sparsity=sparsity)
+    df = get_diary_dataframe().reset_index()
+    targets = training_targets(df)
+    jobs = [(strategy, target) for strategy in STRATEGIES for target in targets]
+
+    def sequential():
+        for strategy, target in jobs:
+            get_model(strategy).train_model(df.copy(), target=target, exclude=[])
+
+    baseline = _seconds(sequential)
+    cores = workers or sorted({1, 2, 4, os.cpu_count() or 1})
+    parallel = []
+    for n in cores:
+        seconds = _seconds(lambda: train_parallel(df, jobs, workers=n))
+        parallel.append({"workers": n, "seconds": seconds, "speedup": round(baseline / seconds, 2)})
+
+    shared = _seconds(lambda: [fit_all_targets(df, targets) for _ in STRATEGIES])
+    return {
+        "days": max(sizes),
+        "params": params,
+        "jobs": len(jobs),
+        "sequential_seconds": baseline,
+        "parallel": parallel,
+        "shared_gram_seconds": shared,
+        "shared_gram_speedup": round(baseline / shared, 2) if shared else None,
+    }
@@ -0,0 +1,150 @@
+# diary_analytic/bulk_values.py
+
+"""
+📦 bulk_values.py — пакетная запись значений дневника
+
+Назначение:
+    - upsert_values: запись (entry_id, parameter_id, value) пачками
+      INSERT ... ON CONFLICT DO UPDATE через executemany (без объекта модели на значение);
+      используется импортом и API /api/update_values/;
+    - apply_value_changes: много правок (дата, параметр, значение | None) одной транзакцией:
+      параметры ищутся одним запросом, недостающие Entry создаются одним bulk_create,
+      значения — один upsert и один DELETE.
+
+Массовая запись идёт в обход сигналов моделей, поэтому после коммита модуль сам
+сообщает об изменённых днях: кэшу таблицы (один патч на всю пачку), дообучению
+и отложенному экспорту (один экспорт на пачку).
+"""
+
+from datetime import datetime
+
+from django.db import connection, transaction
+
+from .diary_cache import diary_cache
+from .export_scheduler import export_scheduler
+from .models import Entry, EntryValue, Parameter
+from .online_training import online_trainer
+from .prediction_cache import prediction_cache
+
+# Сколько строк в одной пачке executemany
+BATCH_SIZE = 5000
+# Больше правок в одном запросе API не принимаем
+MAX_CHANGES = 5000
+
+
+def upsert_values(rows: list):
+    """
+    Записывает (entry_id, parameter_id, value) пачками: новые пары вставляются,
+    существующие получают новое значение (unique_together entry + parameter).
+    """
+    sql = _upsert_sql()
+    with connection.cursor() as cursor:
+        for offset in range(0, len(rows), BATCH_SIZE):
+            cursor.executemany(sql, rows[offset:offset + BATCH_SIZE])
+
+
+def delete_values(pairs: list) -> int:
+    """
+    Удаляет значения по парам (entry_id, parameter_id).
+
+    :return: сколько значений удалено
+    """
+    meta = EntryValue._meta
+    qn = connection.ops.quote_name
+    entry, parameter = (qn(meta.get_field(name).column) for name in ("entry", "parameter"))
+    sql = f"DELETE FROM {qn(meta.db_table)} WHERE {entry} = %s AND {parameter} = %s"
+    deleted = 0
+    with connection.cursor() as cursor:
+        for offset in range(0, len(pairs), BATCH_SIZE):
+            cursor.executemany(sql, pairs[offset:offset + BATCH_SIZE])
+            deleted += max(cursor.rowcount, 0)
+    return deleted
+
+
+def parse_changes(items) -> list[tuple]:
+    """
+    Проверяет правки из JSON: [{"date": "YYYY-MM-DD", "parameter": key, "value": число | null}, ...].
+
+    :return: [(date, key, float | None), ...]
+    :raises ValueError: с номером первой некорректной правки
+    """
+    if not isinstance(items, list):
+        raise ValueError("changes must be a list")
+    if len(items) > MAX_CHANGES:
+        raise ValueError(f"too many changes (max {MAX_CHANGES})")
+    changes = []
+    for index, item in enumerate(items):
+        if not isinstance(item, dict) or not item.get("parameter") or not item.get("date"):
+            raise ValueError(f"change #{index}: missing fields")
+        try:
+            day = datetime.strptime(str(item["date"]), "%Y-%m-%d").date()
+        except ValueError:
+            raise ValueError(f"change #{index}: invalid date")
+        value = item.get("value")
+        if value is not None:
+            try:
+                value = float(value)
+            except (TypeError, ValueError):
+                raise ValueError(f"change #{index}: invalid value")
+        changes.append((day, str(item["parameter"]), value))
+    return changes
+
+
+def apply_value_changes(changes: list[tuple]) -> dict:
+    """
+    Применяет правки одной транзакцией. Повтор пары (дата, параметр) — побеждает последняя.
+
+    :param changes: [(date, parameter_key, value | None), ...]; None — удалить значение
+    :return: {"updated": upsert-нутых значений, "deleted": удалённых, "days": затронутых дат}
+    :raises ValueError: если среди ключей есть неизвестный параметр (ничего не записывается)
+    """
+    latest = {}
+    for day, key, value in changes:
+        latest[(day, key)] = value
+
+    keys = {key for _, key in latest}
+    parameters = dict(Parameter.objects.filter(key__in=keys).values_list("key", "id"))
+    unknown = sorted(keys - set(parameters))
+    if unknown:
+        raise ValueError(f"invalid parameter: {', '.join(unknown)}")
+
+    days = sorted({day for day, _ in latest})
+    upserts, deletes = [], []
+    with transaction.atomic():
+        entry_ids = dict(Entry.objects.filter(date__in=days).values_list("date", "id"))
+        missing = [day for day in days if day not in entry_ids]
+        if missing:
+            Entry.objects.bulk_create([Entry(date=day) for day in missing])
+            entry_ids = dict(Entry.objects.filter(date__in=days).values_list("date", "id"))
+
+        for (day, key), value in latest.items():
+            if value is None:
+                deletes.append((entry_ids[day], parameters[key]))
+            else:
+                upserts.append((entry_ids[day], parameters[key], value))
+        upsert_values(upserts)
+        deleted = delete_values(deletes)
+
+        # Сигналы не отправлялись — сообщаем об изменениях сами (всё применится после коммита)
+        diary_cache.on_values_changed(
+            {entry_ids[day]: day for day in days},
+            {parameters[key]: key for key in keys},
+            upserts + [(entry_id, parameter_id, None) for entry_id, parameter_id in deletes],
+        )
+        online_trainer.on_days_changed(days)
+        prediction_cache.on_days_changed(days)
+        with export_scheduler.suppress():
+            for day in days:
+                export_scheduler.mark_dirty(day)
+
+    return {"updated": len(upserts), "deleted": deleted, "days": len(days)}
+
+
+def _upsert_sql() -> str:
+    meta = EntryValue._meta
+    qn = connection.ops.quote_name
+    entry, parameter, value = (qn(meta.get_field(name).column) for name in ("entry", "parameter", "value"))
+    return (
+        f"INSERT INTO {qn(meta.db_table)} ({entry}, {parameter}, {value}) VALUES (%s, %s, %s) "
+        f"ON CONFLICT ({entry}, {parameter}) DO UPDATE SET {value} = excluded.{value}"
+    )
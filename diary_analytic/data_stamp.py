@@ -0,0 +1,112 @@
+# diary_analytic/data_stamp.py
+
+"""
+🔖 data_stamp.py — общий для процессов штамп изменений дневника
+
+Назначение:
+    - каждый процесс, изменивший значения, даты или параметры (сервер по сигналам и
+      bulk_values, manage.py import_diary, импорт Excel), после коммита увеличивает общий
+      счётчик в файле settings.DIARY_CACHE_DIR/data_stamp;
+    - кэши в памяти процесса (diary_cache, history_cache) помнят штамп, с которым они
+      совпадали с БД. Другой штамп в файле — данные менял кто-то ещё: кэш перестраивается
+      из БД, а не отдаёт устаревшее;
+    - проверка — одно чтение маленького файла, без запросов к БД.
+
+Чтение и увеличение идут под файловой блокировкой (как trained_models/<strategy>/.lock
+в online_training), поэтому bump атомарен: два процесса, закоммитившие одновременно,
+получат разные соседние значения, и тот, чей прежний штамп не совпал со своим, поймёт,
+что между его сверками был чужой коммит. (Кэш Django для этого не подходит: incr
+у FileBasedCache — это get и set без блокировки.)
+
+Штамп — «эпоха:счётчик». Эпоха случайная и меняется, если файл пропал или испорчен:
+старые штампы не совпадут ни с одним новым, кэши процессов просто перестроятся.
+"""
+
+import os
+import uuid
+from contextlib import contextmanager
+
+from django.conf import settings
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+STAMP_FILE = "data_stamp"
+
+
+class DataStamp:
+    """
+    Штамп последнего изменения данных дневника любым процессом.
+
+    :param path: файл счётчика (по умолчанию settings.DIARY_CACHE_DIR/data_stamp)
+    """
+
+    def __init__(self, path: str | None = None):
+        self._path = path
+
+    @property
+    def path(self) -> str:
+        return str(self._path if self._path is not None else os.path.join(settings.DIARY_CACHE_DIR, STAMP_FILE))
+
+    def current(self) -> str:
+        with self._locked() as f:
+            epoch, counter = self._read(f)
+        return f"{epoch}:{counter}"
+
+    def bump(self) -> tuple:
+        """
+        Данные изменены этим процессом (вызывается после коммита).
+
+        :return: (прежний штамп, новый штамп) — если прежний не тот, что помнит вызывающий,
+                 между его сверками данные менял ещё кто-то
+        """
+        with self._locked() as f:
+            epoch, counter = self._read(f)
+            self._write(f, epoch, counter + 1)
+        return f"{epoch}:{counter}", f"{epoch}:{counter + 1}"
+
+    # ----------------------------------------------------------------
+    # 🧩 Внутренняя кухня
+    # ----------------------------------------------------------------
+
+    def _read(self, f) -> tuple:
+        f.seek(0)
+        parts = f.read().split()
+        if len(parts) == 2 and parts[1].isdigit():
+            return parts[0].decode("ascii"), int(parts[1])
+        # Файла не было или он испорчен — новая эпоха
+        epoch = uuid.uuid4().hex[:16]
+        self._write(f, epoch, 0)
+        return epoch, 0
+
+    @staticmethod
+    def _write(f, epoch: str, counter: int):
+        f.seek(0)
+        f.truncate()
+        f.write(f"{epoch} {counter}".encode("ascii"))
+        f.flush()
+
+    @contextmanager
+    def _locked(self):
+        path = self.path
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with os.fdopen(os.open(path, os.O_RDWR | os.O_CREAT, 0o644), "r+b") as f:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            else:
+                msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield f
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+                else:
+                    f.seek(0)
+                    msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+# Единственный экземпляр на процесс
+data_stamp = DataStamp()
@@ -0,0 +1,384 @@
+# diary_analytic/diary_cache.py
+
+"""
+🗃️ diary_cache.py — материализованная «широкая» таблица дневника в памяти процесса
+
+Назначение:
+    - один раз строит матрицу «даты × ключи параметров» из EntryValue;
+    - дальше не перечитывает всю историю, а точечно патчит матрицу
+      по сигналам сохранения/удаления EntryValue, Entry и Parameter (см. signals.py);
+    - ведёт счётчик версии: любое изменение увеличивает `version`,
+      так что вызывающий код может проверить свежесть своих производных данных.
+
+Используется:
+    - utils.get_diary_dataframe() — вместо полного pivot на каждый запрос
+
+Холодный старт: если рядом с базой лежит снимок таблицы с совпадающим отпечатком БД
+(см. diary_snapshot.py), матрица отображается из него в память вместо чтения
+всех EntryValue. После изменений снимок пересобирается из БД в фоне, не чаще раза
+в DIARY_SNAPSHOT_INTERVAL секунд.
+
+⚠️ Кэш живёт в пределах одного процесса. Массовые операции в обход сигналов
+(bulk_create / bulk_update / QuerySet.update) должны вызывать diary_cache.invalidate().
+Изменения других процессов (manage.py import_diary) видны по общему штампу (data_stamp):
+перед выдачей таблицы штамп сверяется с тем, при котором она построена или пропатчена,
+и при расхождении таблица перестраивается из БД.
+"""
+
+import atexit
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.db import connection, transaction
+
+from .data_stamp import data_stamp
+from .diary_snapshot import database_fingerprint, load_snapshot, save_snapshot, snapshot_dir
+from .loggers import db_logger
+from .request_metrics import span
+from .models import Entry, EntryValue, Parameter
+
+
+# --------------------------------------------------------------------
+# 📈 Построение широкой таблицы из БД (полный проход по истории)
+# --------------------------------------------------------------------
+
+def build_diary_dataframe(entry_dates: dict, param_keys: dict) -> pd.DataFrame:
+    """
+    Читает все EntryValue одним запросом и разворачивает их в широкую таблицу:
+        - строки: даты (Entry.date)
+        - столбцы: параметры (Parameter.key)
+        - значения: значения параметров (EntryValue.value)
+
+    :param entry_dates: отображение entry_id → date
+    :param param_keys: отображение parameter_id → key
+    :return: pd.DataFrame, индексированный по дате (пустой, если данных нет)
+    """
+    # Берём только id и значение — даты и ключи подставляем из маленьких справочников,
+    # чтобы не делать JOIN и не создавать ORM-объекты на каждую строку
+    rows = list(EntryValue.objects.values_list("entry_id", "parameter_id", "value"))
+    if not rows:
+        return pd.DataFrame()
+
+    entry_ids, parameter_ids, values = zip(*rows)
+    df = pd.DataFrame({
+        "date": [entry_dates[i] for i in entry_ids],
+        "parameter": [param_keys[i] for i in parameter_ids],
+        "value": values,
+    })
+
+    # было: date | parameter | value
+    # станет: date | toshn | ustalost | ...
+    df = df.pivot(index="date", columns="parameter", values="value")
+    df.sort_index(inplace=True)
+    return df
+
+
+# --------------------------------------------------------------------
+# 🗃️ Кэш широкой таблицы
+# --------------------------------------------------------------------
+
+class DiaryMatrixCache:
+    """
+    Широкая таблица дневника, построенная один раз и обновляемая на месте.
+
+    Все изменения применяются после коммита транзакции (transaction.on_commit),
+    чтобы откат не оставлял в кэше несуществующие значения.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._df = None            # pd.DataFrame или None, если ещё не построен
+        self._entry_dates = {}     # entry_id → date
+        self._param_keys = {}      # parameter_id → key
+        self._stamp = None         # токен data_stamp, с которым таблица совпадает с БД
+        self.version = 0           # растёт при каждом изменении
+        self.builds = 0            # сколько раз таблица строилась с нуля
+        self.snapshot_loads = 0    # сколько раз таблица поднята из снимка на диске
+        self._snapshot_timer = None
+
+    # ----------------------------------------------------------------
+    # 📤 Чтение
+    # ----------------------------------------------------------------
+
+    @property
+    def is_built(self) -> bool:
+        return self._df is not None
+
+    def get_dataframe(self, copy: bool = True) -> pd.DataFrame:
+        """
+        Возвращает широкую таблицу, при необходимости построив её.
+
+        :param copy: вернуть копию (по умолчанию) — вызывающий код может её менять;
+                     copy=False отдаёт внутренний объект только для чтения
+        """
+        with self._lock:
+            if self._df is not None and data_stamp.current() != self._stamp:
+                db_logger.info("[diary_cache] 🔄 Данные изменены другим процессом — перестраиваю таблицу")
+                self._reset()
+            if self._df is None:
+                self._build()
+            df = self._df
+            if df.empty:
+                return pd.DataFrame()
+            return df.copy() if copy else df
+
+    # ----------------------------------------------------------------
+    # 🔄 Сброс
+    # ----------------------------------------------------------------
+
+    def invalidate(self):
+        """
+        Полностью сбрасывает кэш: следующее чтение перестроит таблицу из БД.
+        Данные изменены в обход сигналов — штамп меняется и для других процессов.
+        """
+        with self._lock:
+            data_stamp.bump()
+            self._reset()
+        db_logger.debug("[diary_cache] 🔄 Кэш сброшен, версия %s", self.version)
+
+    # ----------------------------------------------------------------
+    # 📡 Обработчики сигналов (см. signals.py)
+    # ----------------------------------------------------------------
+
+    def on_value_saved(self, instance: EntryValue):
+        entry_id, parameter_id, value = instance.entry_id, instance.parameter_id, float(instance.value)
+        transaction.on_commit(lambda: self._apply(self._set_value, entry_id, parameter_id, value, instance))
+
+    def on_value_deleted(self, instance: EntryValue):
+        entry_id, parameter_id = instance.entry_id, instance.parameter_id
+        transaction.on_commit(lambda: self._apply(self._drop_value, entry_id, parameter_id, instance))
+
+    def on_values_changed(self, entry_dates: dict, param_keys: dict, changes: list):
+        """
+        Пачка правок в обход сигналов (bulk_values): один патч после коммита.
+
+        :param entry_dates: {entry_id: date} для всех entry_id из changes
+        :param param_keys: {parameter_id: key} для всех parameter_id из changes
+        :param changes: [(entry_id, parameter_id, value | None), ...]; None — значение удалено
+        """
+        entry_dates, param_keys, changes = dict(entry_dates), dict(param_keys), list(changes)
+        transaction.on_commit(lambda: self._apply(self._apply_changes, entry_dates, param_keys, changes))
+
+    def on_entry_saved(self, instance: Entry):
+        entry_id, new_date = instance.pk, instance.date
+        transaction.on_commit(lambda: self._apply(self._move_entry, entry_id, new_date))
+
+    def on_parameter_saved(self, instance: Parameter):
+        parameter_id, new_key = instance.pk, instance.key
+        transaction.on_commit(lambda: self._apply(self._rename_parameter, parameter_id, new_key))
+
+    def on_parameter_deleted(self, instance: Parameter):
+        parameter_id = instance.pk
+        transaction.on_commit(lambda: self._apply(self._forget_parameter, parameter_id))
+
+    # ----------------------------------------------------------------
+    # 🧩 Внутренняя кухня
+    # ----------------------------------------------------------------
+
+    def _reset(self):
+        self._df = None
+        self._entry_dates = {}
+        self._param_keys = {}
+        self._stamp = None
+        self.version += 1
+        self._schedule_snapshot()
+
+    def _build(self):
+        with span("dataframe"):
+            started = time.perf_counter()
+            # Штамп — до чтения БД: изменение, закоммиченное во время сборки, его сменит
+            stamp = data_stamp.current()
+            directory = snapshot_dir()
+            # Справочники, отпечаток и значения — из одного согласованного среза БД
+            with transaction.atomic():
+                self._entry_dates = dict(Entry.objects.values_list("id", "date"))
+                self._param_keys = dict(Parameter.objects.values_list("id", "key"))
+                fingerprint = database_fingerprint(self._entry_dates, self._param_keys) if directory else None
+                df = load_snapshot(fingerprint, directory) if directory else None
+                if df is None:
+                    df = build_diary_dataframe(self._entry_dates, self._param_keys)
+                    source = "БД"
+                    self.builds += 1
+                else:
+                    source = "снимка"
+                    self.snapshot_loads += 1
+            self._df = df
+            self._stamp = stamp
+            db_logger.info(
+                "[diary_cache] 🏗️ Построена широкая таблица из %s: %s дат × %s параметров за %.0f мс (сборка №%s)",
+                source, df.shape[0], df.shape[1], (time.perf_counter() - started) * 1000, self.builds,
+            )
+            if directory and source == "БД":
+                self._write_snapshot(df, fingerprint, directory)
+
+    def _apply(self, patch, *args):
+        """
+        Применяет патч к построенной таблице; если таблица ещё не построена —
+        просто увеличивает версию (следующее чтение всё равно прочитает БД).
+        Если с прошлой сверки данные менял другой процесс, патча мало — таблица сбрасывается.
+        При любой неожиданности кэш сбрасывается, а не остаётся рассинхронизированным.
+        """
+        with self._lock:
+            previous, token = data_stamp.bump()
+            if self._df is not None and previous != self._stamp:
+                self._reset()
+                return
+            self.version += 1
+            self._schedule_snapshot()
+            if self._df is None:
+                return
+            self._stamp = token
+            try:
+                patch(*args)
+            except Exception as e:
+                db_logger.exception(f"[diary_cache] ❌ Ошибка при обновлении кэша, сбрасываю: {e}")
+                self.invalidate()
+
+    # ----------------------------------------------------------------
+    # 💽 Снимок на диске (см. diary_snapshot.py)
+    # ----------------------------------------------------------------
+
+    def _schedule_snapshot(self):
+        """
+        Данные изменились — снимок пересоберётся в фоне через DIARY_SNAPSHOT_INTERVAL секунд
+        (все изменения за это время попадут в одну запись).
+        """
+        if self._snapshot_timer is not None or snapshot_dir() is None:
+            return
+        self._snapshot_timer = threading.Timer(settings.DIARY_SNAPSHOT_INTERVAL, self.refresh_snapshot)
+        self._snapshot_timer.daemon = True
+        self._snapshot_timer.start()
+
+    def refresh_snapshot(self):
+        """
+        Пересобирает снимок из БД (а не из патченой таблицы в памяти: патчи применяются
+        после коммита и могут отставать от БД, а снимок должен точно соответствовать отпечатку).
+        """
+        with self._lock:
+            timer, self._snapshot_timer = self._snapshot_timer, None
+        in_thread = timer is not None and threading.current_thread() is timer
+        try:
+            directory = snapshot_dir()
+            if directory is None:
+                return
+            with transaction.atomic():
+                entry_dates = dict(Entry.objects.values_list("id", "date"))
+                param_keys = dict(Parameter.objects.values_list("id", "key"))
+                fingerprint = database_fingerprint(entry_dates, param_keys)
+                df = build_diary_dataframe(entry_dates, param_keys)
+            self._write_snapshot(df, fingerprint, directory)
+        except Exception as e:
+            db_logger.exception(f"[diary_cache] ❌ Снимок не обновлён: {e}")
+        finally:
+            if in_thread:
+                connection.close()
+
+    def _write_snapshot(self, df, fingerprint, directory):
+        started = time.perf_counter()
+        try:
+            save_snapshot(df, fingerprint, directory)
+        except OSError as e:
+            db_logger.warning(f"[diary_cache] ⚠️ Снимок не записан: {e}")
+            return
+        db_logger.info(
+            "[diary_cache] 💽 Снимок таблицы записан: %s дат × %s параметров за %.0f мс",
+            df.shape[0], df.shape[1], (time.perf_counter() - started) * 1000,
+        )
+
+    def _flush_at_exit(self):
+        # Таймер — поток-демон: если снимок ещё ждёт очереди, пишем его сейчас
+        timer = self._snapshot_timer
+        if timer is not None:
+            timer.cancel()
+            self.refresh_snapshot()
+
+    def _date_for(self, entry_id, instance=None):
+        date = self._entry_dates.get(entry_id)
+        if date is None:
+            date = instance.entry.date if instance is not None else Entry.objects.get(pk=entry_id).date
+            self._entry_dates[entry_id] = date
+        return date
+
+    def _key_for(self, parameter_id, instance=None):
+        key = self._param_keys.get(parameter_id)
+        if key is None:
+            key = instance.parameter.key if instance is not None else Parameter.objects.get(pk=parameter_id).key
+            self._param_keys[parameter_id] = key
+        return key
+
+    def _set_value(self, entry_id, parameter_id, value, instance=None):
+        date = self._date_for(entry_id, instance)
+        key = self._key_for(parameter_id, instance)
+        df = self._df
+
+        if df.empty:
+            df = pd.DataFrame({key: [value]}, index=pd.Index([date], name="date"), dtype=float)
+            df.columns.name = "parameter"
+            self._df = df
+            return
+
+        if date not in df.index:
+            df = df.reindex(df.index.union([date]))
+            df.index.name = "date"
+        if key not in df.columns:
+            df[key] = np.nan
+            df = df.sort_index(axis=1)
+            df.columns.name = "parameter"
+        df.at[date, key] = value
+        self._df = df
+
+    def _drop_value(self, entry_id, parameter_id, instance=None):
+        date = self._entry_dates.get(entry_id)
+        key = self._param_keys.get(parameter_id)
+        df = self._df
+        if date is None or key is None or date not in df.index or key not in df.columns:
+            return
+
+        df.at[date, key] = np.nan
+        # Как и pivot: даты и параметры без единого значения в таблицу не попадают
+        if df.loc[date].isna().all():
+            df = df.drop(index=date)
+        if df[key].isna().all():
+            df = df.drop(columns=key)
+        self._df = df
+
+    def _apply_changes(self, entry_dates, param_keys, changes):
+        self._entry_dates.update(entry_dates)
+        self._param_keys.update(param_keys)
+        for entry_id, parameter_id, value in changes:
+            if value is None:
+                self._drop_value(entry_id, parameter_id)
+            else:
+                self._set_value(entry_id, parameter_id, float(value))
+
+    def _move_entry(self, entry_id, new_date):
+        old_date = self._entry_dates.get(entry_id)
+        self._entry_dates[entry_id] = new_date
+        if old_date is None or old_date == new_date or old_date not in self._df.index:
+            return
+        # Смена даты у Entry (например, через админку) — переносим строку
+        self._df = self._df.rename(index={old_date: new_date}).sort_index()
+
+    def _rename_parameter(self, parameter_id, new_key):
+        old_key = self._param_keys.get(parameter_id)
+        self._param_keys[parameter_id] = new_key
+        if old_key is None or old_key == new_key or old_key not in self._df.columns:
+            return
+        df = self._df.rename(columns={old_key: new_key}).sort_index(axis=1)
+        df.columns.name = "parameter"
+        self._df = df
+
+    def _forget_parameter(self, parameter_id):
+        # Значения параметра удаляются каскадно (и приходят своими сигналами),
+        # здесь достаточно забыть сам ключ
+        key = self._param_keys.pop(parameter_id, None)
+        if key is not None and key in self._df.columns:
+            self._df = self._df.drop(columns=key)
+
+
+# Единственный экземпляр на процесс
+diary_cache = DiaryMatrixCache()
+atexit.register(diary_cache._flush_at_exit)
@@ -0,0 +1,451 @@
+# diary_analytic/diary_export.py
+
+"""
+📤 diary_export.py — потоковый экспорт дневника в CSV / XLSX
+
+Назначение:
+    - значения читаются одним запросом (Entry LEFT JOIN EntryValue) в порядке дат
+      через серверный курсор (.iterator()), без загрузки всей истории в память;
+    - строки широкой таблицы собираются генератором по одной дате и сразу пишутся
+      в csv.writer или в лист openpyxl в режиме write_only;
+    - память не зависит от длины истории: в каждый момент в ней одна строка.
+
+Формат совпадает с прежним export_diary_to_csv:
+    - первый столбец «Дата» (ДД.ММ.ГГ), дальше параметры по name, новые даты сверху;
+    - значения — int(value), пропуски — пустая ячейка;
+    - CSV в utf-8-sig, описания параметров — в <имя>_descriptions.csv
+      (для .xlsx — на отдельном листе «Описания параметров»).
+
+Файл пишется во временный и подменяется через os.replace — читатели не увидят
+наполовину записанный экспорт.
+
+📍 Инкрементальный режим (update_export, только CSV):
+    - при полном экспорте рядом с файлом сохраняется индекс <файл>.index.json:
+      столбцы (id и name параметров), размер и mtime файла и для каждой даты —
+      смещение и длина её строки в байтах;
+    - при изменении значений из БД читаются только строки изменённых дат:
+      если длины всех этих строк не изменились — они переписываются на месте,
+      иначе файл собирается заново одним проходом во временном файле (неизменённые
+      куски копируются байтами, без повторного чтения истории из БД) и подменяется
+      через os.replace — сдвиг хвоста никогда не виден читателям наполовину;
+    - полный экспорт выполняется, только если изменился набор столбцов
+      (добавлен, удалён или переименован параметр) или файл не совпадает с индексом
+      (его правили вручную, индекса нет).
+"""
+
+import csv
+import io
+import json
+import os
+import tempfile
+from bisect import bisect_left, bisect_right, insort
+from datetime import date
+from itertools import groupby
+
+from .models import Entry, Parameter
+
+DATE_HEADER = "Дата"
+DATE_FORMAT = "%d.%m.%y"
+DATA_SHEET = "Данные"
+DESCRIPTIONS_SHEET = "Описания параметров"
+DESCRIPTION_HEADER = ["Ключ", "Название", "Описание"]
+CHUNK_SIZE = 5000
+INDEX_SUFFIX = ".index.json"
+# Кусок байтового копирования при пересборке файла
+COPY_CHUNK = 1 << 20
+BOM = "\ufeff".encode("utf-8")
+
+
+# --------------------------------------------------------------------
+# 🧱 Строки экспорта
+# --------------------------------------------------------------------
+
+def export_parameters() -> list:
+    """
+    Параметры в порядке столбцов экспорта (по name).
+    """
+    return list(Parameter.objects.order_by("name"))
+
+
+def iter_export_rows(parameters: list, *, blank="", with_dates: bool = False, queryset=None):
+    """
+    Генератор строк широкой таблицы: [дата, значение параметра 1, ...] — новые даты первыми.
+    Дни без значений тоже попадают в экспорт (пустой строкой), как и раньше.
+
+    :param parameters: столбцы (см. export_parameters)
+    :param blank: чем заполнять пропуски ("" для CSV, None для пустой ячейки XLSX)
+    :param with_dates: отдавать пары (date, row) вместо row
+    :param queryset: какие Entry экспортировать (по умолчанию все)
+    """
+    position = {p.id: i for i, p in enumerate(parameters, start=1)}
+    width = len(parameters) + 1
+    values = (
+        (Entry.objects.all() if queryset is None else queryset)
+        .order_by("-date")
+        .values_list("date", "entryvalue__parameter_id", "entryvalue__value")
+        .iterator(chunk_size=CHUNK_SIZE)
+    )
+    for day, cells in groupby(values, key=lambda item: item[0]):
+        row = [blank] * width
+        row[0] = day.strftime(DATE_FORMAT)
+        for _, parameter_id, value in cells:
+            if value is not None:
+                row[position[parameter_id]] = int(value)
+        yield (day, row) if with_dates else row
+
+
+def header_row(parameters: list) -> list:
+    return [DATE_HEADER] + [p.name for p in parameters]
+
+
+def description_rows(parameters: list):
+    for p in parameters:
+        yield [p.key, p.name, p.description or ""]
+
+
+# --------------------------------------------------------------------
+# 💾 Запись
+# --------------------------------------------------------------------
+
+def write_csv(filepath: str, parameters: list) -> int:
+    """
+    Потоково пишет CSV и файл описаний рядом с ним, а также индекс строк
+    для инкрементальных обновлений (update_export).
+
+    :return: количество строк данных
+    """
+    index = ExportIndex(filepath, _columns_signature(parameters))
+    with _replace_atomically(filepath, binary=True) as f:
+        out = _CountingWriter(f)
+        out.raw.write(BOM)
+        out.offset = len(BOM)
+        writer = csv.writer(out, lineterminator=os.linesep)
+        writer.writerow(header_row(parameters))
+        for day, row in iter_export_rows(parameters, with_dates=True):
+            start = out.offset
+            writer.writerow(row)
+            index.append(day, start, out.offset - start)
+
+    write_descriptions_csv(filepath, parameters)
+    index.save()
+    return len(index.rows)
+
+
+def write_descriptions_csv(filepath: str, parameters: list):
+    with _replace_atomically(descriptions_path(filepath)) as f:
+        writer = csv.writer(f, lineterminator=os.linesep)
+        writer.writerow(DESCRIPTION_HEADER)
+        writer.writerows(description_rows(parameters))
+
+
+def write_xlsx(filepath: str, parameters: list) -> int:
+    """
+    Потоково пишет .xlsx (openpyxl write_only): лист данных и лист описаний.
+
+    :return: количество строк данных
+    """
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    data = workbook.create_sheet(DATA_SHEET)
+    data.append(header_row(parameters))
+    rows = 0
+    for row in iter_export_rows(parameters, blank=None):
+        data.append(row)
+        rows += 1
+
+    descriptions = workbook.create_sheet(DESCRIPTIONS_SHEET)
+    descriptions.append(DESCRIPTION_HEADER)
+    for row in description_rows(parameters):
+        descriptions.append(row)
+
+    with _replace_atomically(filepath, binary=True) as f:
+        workbook.save(f)
+    return rows
+
+
+def export_diary(filepath: str) -> int:
+    """
+    Экспортирует дневник в CSV или XLSX (по расширению файла).
+
+    :return: количество строк данных
+    """
+    parameters = export_parameters()
+    if filepath.endswith(".xlsx"):
+        return write_xlsx(filepath, parameters)
+    return write_csv(filepath, parameters)
+
+
+def descriptions_path(filepath: str) -> str:
+    return filepath.replace(".csv", "_descriptions.csv")
+
+
+# --------------------------------------------------------------------
+# 📍 Инкрементальное обновление
+# --------------------------------------------------------------------
+
+def update_export(filepath: str, days=(), *, check: bool = False) -> dict:
+    """
+    Обновляет в экспорте только строки указанных дат.
+
+    :param days: даты, строки которых могли измениться (появиться, исчезнуть)
+    :param check: сверить столбцы и список дат с БД и переписать описания —
+                  после сохранения Parameter или переноса Entry на другую дату
+    :return: {"mode": "full" | "incremental", "rows": ..., "in_place": ..., "spliced": ...}
+    """
+    if filepath.endswith(".xlsx"):
+        return {"mode": "full", "rows": export_diary(filepath)}
+
+    parameters = export_parameters()
+    index = ExportIndex.load(filepath)
+    if index is None or index.columns != _columns_signature(parameters):
+        return {"mode": "full", "rows": write_csv(filepath, parameters)}
+
+    days = set(days)
+    if check:
+        present = set(Entry.objects.values_list("date", flat=True))
+        indexed = {date.fromisoformat(key) for key in index.rows}
+        days |= present ^ indexed
+        write_descriptions_csv(filepath, parameters)
+
+    in_place = spliced = 0
+    if days:
+        fresh = {
+            d.isoformat(): _encode_row(row)
+            for d, row in iter_export_rows(parameters, with_dates=True, queryset=Entry.objects.filter(date__in=days))
+        }
+        in_place, spliced = index.apply({d.isoformat(): fresh.get(d.isoformat()) for d in days})
+        index.save()
+    return {"mode": "incremental", "rows": len(index.rows), "in_place": in_place, "spliced": spliced}
+
+
+class ExportIndex:
+    """
+    Смещения строк CSV-экспорта: {дата ISO: (offset, length)} в байтах.
+    Действителен, пока размер и mtime файла совпадают с записанными.
+    """
+
+    # Загруженные индексы процесса: путь → ExportIndex (повторно JSON не разбирается)
+    _loaded = {}
+
+    def __init__(self, filepath: str, columns: list):
+        self.filepath = filepath
+        self.columns = columns
+        self.rows = {}
+        self.keys = []          # даты ISO по возрастанию (в файле — по убыванию)
+        self.end = None         # конец данных (размер файла)
+        self.fingerprint = None
+
+    @property
+    def path(self) -> str:
+        return self.filepath + INDEX_SUFFIX
+
+    # ----------------------------------------------------------------
+    # 💾 Файл индекса
+    # ----------------------------------------------------------------
+
+    def append(self, day, offset: int, length: int):
+        """
+        Запись строки при полном экспорте (даты идут по убыванию).
+        """
+        key = day.isoformat()
+        self.rows[key] = (offset, length)
+        self.keys.append(key)
+        self.end = offset + length
+
+    def save(self):
+        self.keys.sort()
+        st = os.stat(self.filepath)
+        self.end = st.st_size
+        self.fingerprint = [st.st_size, st.st_mtime_ns]
+        # json.dumps (C-кодировщик) на порядок быстрее json.dump в файл; строки — параллельными списками
+        data = {
+            "columns": self.columns,
+            "fingerprint": self.fingerprint,
+            "keys": self.keys,
+            "offsets": [self.rows[key][0] for key in self.keys],
+            "lengths": [self.rows[key][1] for key in self.keys],
+        }
+        with _replace_atomically(self.path, encoding="utf-8") as f:
+            f.write(json.dumps(data))
+        ExportIndex._loaded[os.path.abspath(self.filepath)] = self
+
+    @classmethod
+    def load(cls, filepath: str):
+        """
+        Индекс экспорта или None, если его нет или файл менялся в обход индекса.
+        """
+        try:
+            st = os.stat(filepath)
+        except FileNotFoundError:
+            return None
+        fingerprint = [st.st_size, st.st_mtime_ns]
+
+        index = cls._loaded.get(os.path.abspath(filepath))
+        if index is None or index.fingerprint != fingerprint:
+            try:
+                with open(filepath + INDEX_SUFFIX, encoding="utf-8") as f:
+                    data = json.load(f)
+            except (FileNotFoundError, ValueError):
+                return None
+            index = cls(filepath, data["columns"])
+            index.keys = data["keys"]
+            index.rows = dict(zip(index.keys, zip(data["offsets"], data["lengths"])))
+            index.fingerprint = data["fingerprint"]
+            index.end = fingerprint[0]
+        if index.fingerprint != fingerprint:
+            return None
+        cls._loaded[os.path.abspath(filepath)] = index
+        return index
+
+    # ----------------------------------------------------------------
+    # ✏️ Правка строк
+    # ----------------------------------------------------------------
+
+    def position(self, key: str) -> int:
+        """
+        Куда в файле встаёт строка даты key: на её место или перед ближайшей более ранней датой.
+        """
+        if key in self.rows:
+            return self.rows[key][0]
+        i = bisect_left(self.keys, key)
+        return self.rows[self.keys[i - 1]][0] if i > 0 else self.end
+
+    def apply(self, changes: dict) -> tuple:
+        """
+        Заменяет (вставляет, удаляет) строки дат.
+
+        Если длина ни одной строки не меняется — строки переписываются на месте.
+        Иначе сдвигается хвост: файл собирается во временном и подменяет экспорт
+        через os.replace (читатели видят прежний файл или новый, но не смесь).
+
+        :param changes: {дата ISO: новая строка в байтах или None — строки больше нет}
+        :return: (переписано на месте, вставлено / удалено / изменено по длине)
+        """
+        # В файле даты идут по убыванию — в этом порядке правки и применяются
+        edits = [
+            (key, self.position(key), self.rows[key][1] if key in self.rows else 0, line or b"")
+            for key, line in sorted(changes.items(), reverse=True)
+        ]
+        moved = sum(1 for _, _, old_length, new in edits if old_length != len(new))
+        if not moved:
+            with open(self.filepath, "r+b") as f:
+                for _, offset, _, new in edits:
+                    if new:
+                        f.seek(offset)
+                        f.write(new)
+            return len(edits), 0
+
+        self._rewrite(edits)
+        return len(edits) - moved, moved
+
+    def _rewrite(self, edits: list):
+        """
+        Одним проходом копирует файл во временный, подставляя правки, и пересчитывает смещения.
+        """
+        written = {}
+        starts, shifts = [], []
+        shift = 0
+        with open(self.filepath, "rb") as src, _replace_atomically(self.filepath, binary=True) as dst:
+            position = 0
+            for key, offset, old_length, new in edits:
+                _copy_bytes(src, dst, position, offset)
+                if new:
+                    written[key] = (offset + shift, len(new))
+                    dst.write(new)
+                shift += len(new) - old_length
+                starts.append(offset)
+                shifts.append(shift)
+                position = offset + old_length
+            _copy_bytes(src, dst, position, self.end)
+
+        # Нетронутая строка сдвигается на сумму правок, стоящих выше неё или на её месте
+        for key, (start, length) in list(self.rows.items()):
+            if key in written:
+                continue
+            i = bisect_right(starts, start)
+            self.rows[key] = (start + (shifts[i - 1] if i else 0), length)
+        for key, _, _, new in edits:
+            if key in written:
+                if key not in self.rows:
+                    insort(self.keys, key)
+                self.rows[key] = written[key]
+            elif key in self.rows:
+                del self.rows[key]
+                self.keys.remove(key)
+        self.end += shift
+
+
+# --------------------------------------------------------------------
+# 🧩 Внутренняя кухня
+# --------------------------------------------------------------------
+
+class _CountingWriter:
+    """
+    Файл для csv.writer: кодирует строки в UTF-8 и считает записанные байты.
+    """
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.offset = 0
+
+    def write(self, text: str):
+        data = text.encode("utf-8")
+        self.raw.write(data)
+        self.offset += len(data)
+
+
+def _copy_bytes(src, dst, start: int, end: int):
+    src.seek(start)
+    count = end - start
+    while count > 0:
+        chunk = src.read(min(count, COPY_CHUNK))
+        if not chunk:
+            break
+        dst.write(chunk)
+        count -= len(chunk)
+
+
+def _encode_row(row: list) -> bytes:
+    buffer = io.StringIO()
+    csv.writer(buffer, lineterminator=os.linesep).writerow(row)
+    return buffer.getvalue().encode("utf-8")
+
+
+def _columns_signature(parameters: list) -> list:
+    return [[p.id, p.name] for p in parameters]
+
+
+class _replace_atomically:
+    """
+    Открывает временный файл рядом с целевым; при успешном выходе подменяет им целевой.
+    """
+
+    def __init__(self, filepath: str, binary: bool = False, encoding: str = "utf-8-sig"):
+        self.filepath = filepath
+        self.binary = binary
+        self.encoding = encoding
+
+    def __enter__(self):
+        directory = os.path.dirname(os.path.abspath(self.filepath))
+        os.makedirs(directory, exist_ok=True)
+        fd, self.tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        if self.binary:
+            self.file = os.fdopen(fd, "wb")
+        else:
+            self.file = os.fdopen(fd, "w", encoding=self.encoding, newline="")
+        return self.file
+
+    def __exit__(self, exc_type, exc, tb):
+        self.file.close()
+        if exc_type is None:
+            # mkstemp создаёт файл с правами 0600 — сохраняем права прежнего файла
+            try:
+                mode = os.stat(self.filepath).st_mode & 0o777
+            except FileNotFoundError:
+                mode = 0o644
+            os.chmod(self.tmp_path, mode)
+            os.replace(self.tmp_path, self.filepath)
+        elif os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+        return False
@@ -0,0 +1,170 @@
+# diary_analytic/diary_snapshot.py
+
+"""
+💽 diary_snapshot.py — снимок широкой таблицы дневника на диске (холодный старт без ORM)
+
+Назначение:
+    - после изменений diary_cache сохраняет матрицу «даты × параметры» в каталог
+      рядом с SQLite-файлом: <db>.snapshot/matrix.npy (float64, C-порядок)
+      и <db>.snapshot/index.json (даты, ключи параметров, отпечаток БД);
+    - новый процесс при первом чтении таблицы отображает matrix.npy в память
+      (np.load(mmap_mode="c") — без чтения и копирования, правки кэша уходят
+      в приватные страницы процесса и файл не меняют) вместо полного прохода
+      по EntryValue через ORM.
+
+SQLite остаётся источником истины: снимок принимается, только если его отпечаток
+совпадает с текущим отпечатком БД (database_fingerprint). Иначе таблица строится
+из БД, как раньше, и снимок перезаписывается.
+
+Снимок ведётся только для файловой SQLite-базы (для базы в памяти, как в тестах, — нет).
+Отключается настройкой DIARY_SNAPSHOT = False.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from datetime import date
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.db import connection
+
+from .loggers import db_logger
+from .models import Entry, EntryValue, Parameter
+
+MATRIX_FILE = "matrix.npy"
+INDEX_FILE = "index.json"
+FORMAT_VERSION = 2
+# Сколько строк EntryValue читать за один fetchmany при подсчёте отпечатка
+FINGERPRINT_CHUNK = 20000
+
+
+def snapshot_dir() -> str | None:
+    """
+    Каталог снимка для текущей базы или None, если снимок не ведётся.
+    """
+    if not settings.DIARY_SNAPSHOT or connection.vendor != "sqlite":
+        return None
+    if connection.is_in_memory_db():
+        return None
+    return f"{connection.settings_dict['NAME']}.snapshot"
+
+
+# --------------------------------------------------------------------
+# 🔏 Отпечаток состояния БД
+# --------------------------------------------------------------------
+
+def database_fingerprint(entry_dates: dict | None = None, param_keys: dict | None = None) -> dict:
+    """
+    Отпечаток всего, из чего строится широкая таблица:
+        - values — хэш содержимого EntryValue: (entry_id, parameter_id, value) по порядку id.
+          Меняется при любой правке (суммы и счётчики совпадали бы у компенсирующих правок).
+          Строки читаются курсором без ORM-объектов — это примерно треть сборки таблицы из БД;
+        - entries / parameters — хэши справочников id → дата / ключ (перенос даты, переименование).
+
+    :param entry_dates: уже прочитанный справочник entry_id → date (чтобы не читать его второй раз)
+    :param param_keys: уже прочитанный справочник parameter_id → key
+    """
+    if entry_dates is None:
+        entry_dates = dict(Entry.objects.values_list("id", "date"))
+    if param_keys is None:
+        param_keys = dict(Parameter.objects.values_list("id", "key"))
+
+    meta = EntryValue._meta
+    qn = connection.ops.quote_name
+    entry, parameter, value = (qn(meta.get_field(name).column) for name in ("entry", "parameter", "value"))
+    digest = hashlib.blake2b(digest_size=16)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT {entry}, {parameter}, {value} FROM {qn(meta.db_table)} ORDER BY {qn(meta.pk.column)}"
+        )
+        while rows := cursor.fetchmany(FINGERPRINT_CHUNK):
+            # float64 точно хранит и id, и значение; NULL → NaN
+            digest.update(np.array(rows, dtype=np.float64).tobytes())
+
+    return {
+        "values": digest.hexdigest(),
+        "entries": _digest(entry_dates),
+        "parameters": _digest(param_keys),
+    }
+
+
+def _digest(mapping: dict) -> str:
+    payload = ";".join(f"{k}={v}" for k, v in sorted(mapping.items()))
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+# --------------------------------------------------------------------
+# 💾 Запись и чтение
+# --------------------------------------------------------------------
+
+def save_snapshot(df: pd.DataFrame, fingerprint: dict, directory: str):
+    """
+    Записывает снимок атомарно: новый каталог собирается рядом и подменяет старый.
+    """
+    parent = os.path.dirname(os.path.abspath(directory))
+    tmp_dir = tempfile.mkdtemp(dir=parent, prefix=".snapshot-")
+    try:
+        matrix = np.ascontiguousarray(df.to_numpy(dtype=np.float64))
+        np.save(os.path.join(tmp_dir, MATRIX_FILE), matrix)
+        index = {
+            "format": FORMAT_VERSION,
+            "dates": [d.isoformat() for d in df.index],
+            "columns": [str(c) for c in df.columns],
+            "fingerprint": fingerprint,
+        }
+        with open(os.path.join(tmp_dir, INDEX_FILE), "w", encoding="utf-8") as f:
+            json.dump(index, f)
+
+        # Два rename вместо rmtree + rename: читатель видит либо старый, либо новый снимок
+        old_dir = None
+        if os.path.exists(directory):
+            old_dir = f"{tmp_dir}.old"
+            os.replace(directory, old_dir)
+        os.replace(tmp_dir, directory)
+        if old_dir:
+            shutil.rmtree(old_dir, ignore_errors=True)
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+
+def load_snapshot(fingerprint: dict, directory: str) -> pd.DataFrame | None:
+    """
+    Читает снимок, если он есть и его отпечаток совпадает с fingerprint.
+    Матрица не читается в память, а отображается (mmap, copy-on-write).
+
+    :return: широкая таблица (как build_diary_dataframe) или None
+    """
+    try:
+        with open(os.path.join(directory, INDEX_FILE), encoding="utf-8") as f:
+            index = json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        db_logger.warning(f"[diary_snapshot] ⚠️ Индекс снимка не прочитан: {e}")
+        return None
+    if index.get("format") != FORMAT_VERSION or index.get("fingerprint") != fingerprint:
+        return None
+
+    try:
+        matrix = np.load(os.path.join(directory, MATRIX_FILE), mmap_mode="c")
+    except (OSError, ValueError) as e:
+        db_logger.warning(f"[diary_snapshot] ⚠️ Матрица снимка не прочитана: {e}")
+        return None
+    dates, columns = index["dates"], index["columns"]
+    if matrix.shape != (len(dates), len(columns)):
+        return None
+    if not dates:
+        return pd.DataFrame()
+
+    df = pd.DataFrame(
+        matrix,
+        index=pd.Index([date.fromisoformat(d) for d in dates], name="date"),
+        columns=pd.Index(columns, name="parameter"),
+        copy=False,
+    )
+    return df
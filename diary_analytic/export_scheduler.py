@@ -0,0 +1,238 @@
+# diary_analytic/export_scheduler.py
+
+"""
+💾 export_scheduler.py — отложенный экспорт дневника в CSV/XLSX
+
+Назначение:
+    - сигналы (signals.py) больше не экспортируют таблицу сами, а только
+      помечают экспорт «грязным» (mark_dirty);
+    - фоновый поток выполняет export_diary_to_csv не чаще одного раза
+      в DIARY_EXPORT_INTERVAL секунд: все изменения за это время попадают
+      в один экспорт;
+    - на время массовых операций (импорт) сигналы глушатся через
+      `with export_scheduler.suppress():` — экспорт выполнится один раз после выхода;
+    - если известны изменённые даты, а DIARY_EXPORT_INCREMENTAL включён, переписываются
+      только их строки (diary_export.update_export), а не весь файл.
+
+Экспорт ставится в очередь только после коммита транзакции — поток читает БД
+своим соединением и должен видеть сохранённые данные.
+Если при остановке процесса экспорт ещё ждёт своей очереди, он выполняется сразу (atexit).
+Неудачный экспорт не теряет изменения: они возвращаются в очередь и уходят в следующем окне.
+"""
+
+import atexit
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from .loggers import db_logger
+
+
+class ExportScheduler:
+    """
+    Сливает частые запросы на экспорт в редкие фоновые запуски.
+
+    :param export: функция полного экспорта (по умолчанию utils.export_diary_to_csv), получает путь
+    :param update: функция инкрементального экспорта (по умолчанию utils.update_diary_export),
+                   получает путь, множество дат и флаг check
+    :param interval: минимальный интервал между экспортами, сек (по умолчанию settings.DIARY_EXPORT_INTERVAL)
+    :param path: куда экспортировать (по умолчанию settings.DIARY_EXPORT_PATH)
+    """
+
+    def __init__(self, export=None, update=None, interval: float | None = None, path: str | None = None):
+        self._export = export
+        self._update = update
+        self._interval = interval
+        self._path = path
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._thread = None
+        self._dirty = False
+        self._full = False          # нужен полный экспорт
+        self._days = set()          # даты, строки которых изменились
+        self._check = False         # сверить столбцы и даты (сохранён Parameter / Entry)
+        self._suppressed = 0
+        self._last_flush = None     # time.monotonic() последнего экспорта
+        self.requests = 0           # сколько раз просили экспорт
+        self.flushes = 0            # сколько раз реально экспортировали
+
+    @property
+    def interval(self) -> float:
+        return float(self._interval if self._interval is not None else settings.DIARY_EXPORT_INTERVAL)
+
+    @property
+    def path(self) -> str:
+        return str(self._path if self._path is not None else settings.DIARY_EXPORT_PATH)
+
+    # ----------------------------------------------------------------
+    # 📡 Запросы на экспорт
+    # ----------------------------------------------------------------
+
+    def mark_dirty(self, day=None, *, check: bool = False):
+        """
+        Данные изменились — экспорт нужно обновить (не сразу, а в ближайшее окно).
+
+        :param day: дата, строка которой изменилась; без day и check — полный экспорт
+        :param check: сверить столбцы и список дат (сохранён или удалён Parameter / Entry)
+        """
+        with self._lock:
+            self._dirty = True
+            if day is not None:
+                self._days.add(day)
+            if check:
+                self._check = True
+            if day is None and not check:
+                self._full = True
+            self.requests += 1
+            if self._suppressed:
+                return
+        transaction.on_commit(self._wake)
+
+    @contextmanager
+    def suppress(self):
+        """
+        Глушит экспорт на время массовой операции; по выходу — один экспорт, если что-то изменилось.
+        Вложенные вызовы допустимы.
+        """
+        with self._lock:
+            self._suppressed += 1
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._suppressed -= 1
+                wake = not self._suppressed and self._dirty
+            if wake:
+                transaction.on_commit(self._wake)
+
+    def flush(self) -> bool:
+        """
+        Синхронно экспортирует, если есть несохранённые изменения.
+
+        :return: был ли выполнен экспорт (False — нечего экспортировать или экспорт упал)
+        """
+        with self._lock:
+            if not self._dirty:
+                return False
+            changes = self._take()
+        return self._run_export(*changes)
+
+    def discard(self):
+        """
+        Забывает накопленные изменения без экспорта (например, после бенчмарка во временной БД).
+        """
+        with self._lock:
+            self._take()
+
+    def wait(self, timeout: float | None = None) -> bool:
+        """
+        Ждёт, пока фоновый поток доделает все запланированные экспорты.
+        """
+        with self._idle:
+            return self._idle.wait_for(lambda: self._thread is None, timeout)
+
+    # ----------------------------------------------------------------
+    # 🧵 Фоновый поток
+    # ----------------------------------------------------------------
+
+    def _wake(self):
+        with self._lock:
+            if self._suppressed or not self._dirty or self._thread is not None:
+                # Уже запущенный поток сам увидит флаг _dirty перед выходом
+                return
+            self._thread = threading.Thread(target=self._loop, name="diary-export", daemon=True)
+            self._thread.start()
+
+    def _loop(self):
+        try:
+            while True:
+                with self._lock:
+                    if not self._dirty or self._suppressed:
+                        # Изменений нет — не висим окно впустую: следующий mark_dirty запустит новый поток
+                        self._thread = None
+                        self._idle.notify_all()
+                        return
+                    delay = 0.0 if self._last_flush is None else self._last_flush + self.interval - time.monotonic()
+                if delay > 0:
+                    # Окно накопления: изменения за это время уйдут в один экспорт
+                    time.sleep(delay)
+                with self._lock:
+                    if not self._dirty or self._suppressed:
+                        self._thread = None
+                        self._idle.notify_all()
+                        return
+                    changes = self._take()
+                self._run_export(*changes)
+        except Exception as e:
+            db_logger.exception(f"[export_scheduler] 🔥 Поток экспорта остановился: {e}")
+            with self._lock:
+                self._thread = None
+                self._idle.notify_all()
+        finally:
+            connection.close()
+
+    def _take(self):
+        """
+        Забирает накопленные изменения (вызывается под self._lock).
+        """
+        changes = (self._full, self._days, self._check)
+        self._dirty, self._full, self._days, self._check = False, False, set(), False
+        return changes
+
+    def _restore(self, full: bool, days, check: bool):
+        """
+        Возвращает забранные изменения после неудачного экспорта (вызывается под self._lock).
+        """
+        self._dirty = True
+        self._full = self._full or full
+        self._days |= set(days)
+        self._check = self._check or check
+
+    def _run_export(self, full: bool = True, days=(), check: bool = False) -> bool:
+        started = time.perf_counter()
+        with self._lock:
+            requests = self.requests
+        try:
+            if full or not settings.DIARY_EXPORT_INCREMENTAL:
+                export = self._export
+                if export is None:
+                    from .utils import export_diary_to_csv
+                    export = export_diary_to_csv
+                export(self.path)
+            else:
+                update = self._update
+                if update is None:
+                    from .utils import update_diary_export
+                    update = update_diary_export
+                update(self.path, days, check)
+        except Exception as e:
+            db_logger.exception(f"[export_scheduler] ❌ Ошибка экспорта, повтор в следующем окне: {e}")
+            with self._lock:
+                self._restore(full, days, check)
+                self._last_flush = time.monotonic()
+            return False
+        with self._lock:
+            self._last_flush = time.monotonic()
+            self.flushes += 1
+        db_logger.info(
+            f"[export_scheduler] 💾 Экспорт №{self.flushes} за {(time.perf_counter() - started) * 1000:.0f} мс "
+            f"(запросов всего: {requests})"
+        )
+        return True
+
+    def _flush_at_exit(self):
+        # Поток-демон не доживёт до конца отложенного экспорта — дожидаемся идущей записи
+        # (иначе останется недописанный временный файл) и доделываем остальное сами
+        if self._thread is not None:
+            with self._lock:
+                self._suppressed += 1   # поток не начнёт новый экспорт после окна ожидания
+            self.wait(timeout=60)
+            self.flush()
+
+
+# Единственный экземпляр на процесс
+export_scheduler = ExportScheduler()
+atexit.register(export_scheduler._flush_at_exit)
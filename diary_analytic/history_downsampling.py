@@ -0,0 +1,169 @@
+# diary_analytic/history_downsampling.py
+
+"""
+📉 history_downsampling.py — прореживание истории параметра для графиков
+
+Назначение:
+    - lttb_indices: Largest-Triangle-Three-Buckets — из n точек выбирает points так,
+      чтобы сохранить форму линии (пики и провалы не теряются, в отличие от every=N);
+    - bucket_aggregate: агрегация по неделям или месяцам — min / max / среднее / количество
+      в каждой корзине;
+    - history_cache: LRU-кэш готовых ответов /api/parameter_history/ по
+      (параметр, диапазон, разрешение), сбрасывается при смене общего для процессов
+      штампа данных (data_stamp, см. utils.get_parameter_history).
+
+Всё считается в NumPy без цикла по точкам: у LTTB цикл только по корзинам
+(выбор точки зависит от точки, выбранной в предыдущей корзине), внутри корзины —
+векторные операции; средние следующих корзин считаются заранее одним reduceat.
+"""
+
+import threading
+from collections import OrderedDict
+from datetime import date
+
+import numpy as np
+
+RESOLUTIONS = ("week", "month")
+
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+def to_datetime64(dates) -> np.ndarray:
+    """
+    Список date → datetime64[D] через порядковые номера дней
+    (в разы быстрее, чем np.array(dates, dtype="datetime64[D]") по объектам date).
+    """
+    days = np.fromiter((d.toordinal() for d in dates), dtype=np.int64, count=len(dates))
+    return (days - _EPOCH_ORDINAL).astype("datetime64[D]")
+
+
+# --------------------------------------------------------------------
+# 📐 Largest-Triangle-Three-Buckets
+# --------------------------------------------------------------------
+
+def lttb_indices(x, y, points: int) -> np.ndarray:
+    """
+    Индексы точек, которые оставляет LTTB (по возрастанию, первая и последняя — всегда).
+
+    :param x: координаты по оси X (например, номер дня), по возрастанию
+    :param y: значения
+    :param points: сколько точек оставить (не меньше 3); если точек и так не больше — все индексы
+    """
+    if points < 3:
+        raise ValueError("points must be >= 3")
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    n = len(x)
+    if points >= n:
+        return np.arange(n)
+
+    # Внутренние точки 1..n-2 делятся на points-2 корзины (каждая не пуста: ширина >= 1)
+    edges = np.linspace(1, n - 1, points - 1).astype(np.intp)
+    starts, ends = edges[:-1], edges[1:]
+    counts = ends - starts
+    avg_x = np.add.reduceat(x[1:n - 1], starts - 1) / counts
+    avg_y = np.add.reduceat(y[1:n - 1], starts - 1) / counts
+    # Третья вершина треугольника — среднее следующей корзины, для последней — последняя точка
+    next_x = np.append(avg_x[1:], x[-1])
+    next_y = np.append(avg_y[1:], y[-1])
+
+    selected = np.empty(points, dtype=np.intp)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for i, (start, end) in enumerate(zip(starts, ends)):
+        ax, ay = x[a], y[a]
+        area = np.abs((ax - next_x[i]) * (y[start:end] - ay) - (ax - x[start:end]) * (next_y[i] - ay))
+        a = start + int(np.argmax(area))
+        selected[i + 1] = a
+    return selected
+
+
+# --------------------------------------------------------------------
+# 🗓️ Агрегация по неделям / месяцам
+# --------------------------------------------------------------------
+
+def bucket_aggregate(dates, values, resolution: str) -> dict:
+    """
+    Сворачивает ряд по календарным корзинам.
+
+    :param dates: даты по возрастанию (date, строки ISO или datetime64)
+    :param values: значения той же длины
+    :param resolution: "week" (неделя с понедельника) или "month"
+    :return: {"dates": начала корзин (datetime64[D]), "values": средние,
+              "min": ..., "max": ..., "count": точек в корзине}
+    """
+    if resolution not in RESOLUTIONS:
+        raise ValueError(f"unknown resolution: {resolution}")
+    days = np.asarray(dates, dtype="datetime64[D]")
+    values = np.asarray(values, dtype=np.float64)
+    if len(days) == 0:
+        empty = np.array([], dtype=np.float64)
+        return {"dates": days, "values": empty, "min": empty, "max": empty, "count": np.array([], dtype=np.int64)}
+
+    if resolution == "week":
+        # 1970-01-01 — четверг: сдвиг (день + 3) % 7 приводит к понедельнику
+        keys = days - (days.astype(np.int64) + 3) % 7
+    else:
+        keys = days.astype("datetime64[M]").astype("datetime64[D]")
+
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    counts = np.diff(np.r_[starts, len(values)])
+    return {
+        "dates": keys[starts],
+        "values": np.add.reduceat(values, starts) / counts,
+        "min": np.minimum.reduceat(values, starts),
+        "max": np.maximum.reduceat(values, starts),
+        "count": counts,
+    }
+
+
+# --------------------------------------------------------------------
+# 🗃️ Кэш ответов
+# --------------------------------------------------------------------
+
+class HistoryCache:
+    """
+    LRU-кэш рядов истории. Все записи относятся к одной версии данных (токену data_stamp):
+    при запросе с другой версией кэш очищается целиком.
+
+    Возвращаемые словари общие для всех вызывающих — их нельзя изменять.
+    """
+
+    def __init__(self, max_items: int = 256):
+        self._lock = threading.Lock()
+        self._items = OrderedDict()
+        self._version = None
+        self.max_items = max_items
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, version: str):
+        with self._lock:
+            if version != self._version:
+                self._items.clear()
+                self._version = version
+            value = self._items.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, version: str, value: dict):
+        with self._lock:
+            if version != self._version:
+                # Данные успели измениться, пока ряд считался, — не кэшируем
+                return
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self._version = None
+
+
+history_cache = HistoryCache()
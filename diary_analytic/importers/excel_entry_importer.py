@@ -1,6 +1,18 @@
+from diary_analytic.bulk_values import upsert_values
+from diary_analytic.diary_cache import diary_cache
+from diary_analytic.diary_export import DATE_FORMAT
+from diary_analytic.export_scheduler import export_scheduler
+from diary_analytic.loggers import db_logger
 from diary_analytic.models import Entry, EntryValue, Parameter
+from diary_analytic.online_training import online_trainer
+from diary_analytic.prediction_cache import prediction_cache
+from django.db import transaction
 from slugify import slugify
 import pandas as pd
+import time
+
+# Сколько Entry в одной пачке bulk_create
+BATCH_SIZE = 5000
 
 
 def import_excel_dataframe(df, message_callback=None):
@@ -8,68 +20,186 @@ def import_excel_dataframe(df, message_callback=None):
     Импортирует значения Entry и параметры из DataFrame (Excel).
     Совпадает по логике с импортом из admin.py (актуальная версия).
 
+    Импорт векторизован:
+        - столбец дат разбирается целиком (сначала формат экспорта ДД.ММ.ГГ, затем — как раньше, pd.to_datetime);
+        - лист переводится в длинный формат (melt): одна строка = (дата, столбец, значение);
+        - недостающие Entry создаются одним bulk_create;
+        - значения записываются пачками INSERT ... ON CONFLICT DO UPDATE (уникальная пара entry + parameter)
+          (bulk_values.upsert_values) — без создания объекта модели на каждое значение.
+    Всё выполняется в одной транзакции; кэш таблицы, экспорт и дообучение обновляются после коммита.
+
     :param df: pandas.DataFrame с данными (первая колонка — дата, остальные — параметры)
     :param message_callback: функция для сообщений (например, для вывода предупреждений)
     :return: (created, updated) — количество созданных и обновлённых EntryValue
     """
-    columns = [col.strip() for col in df.columns]
+    started = time.perf_counter()
+    # Экспорт — один раз после импорта, а не на каждый созданный параметр
+    with export_scheduler.suppress():
+        created, updated, values = import_rows(df, message_callback)
+        # Массовая запись сигналов не отправляет — помечаем экспорт сами
+        export_scheduler.mark_dirty()
+    report_speed(len(df), len(df.columns) - 1, values, started, message_callback)
+    return created, updated
+
+
+def import_rows(df, message_callback=None, entry_ids: dict | None = None):
+    """
+    Импортирует один DataFrame (весь лист или очередной кусок файла) в своей транзакции.
+    Экспорт не планирует — это делает вызывающий код.
+
+    Запросы — только по датам и записям этого DataFrame, без проходов по всей таблице:
+    кусок большого файла стоит одинаково и в начале, и в конце импорта.
+
+    :param entry_ids: справочник date → entry_id, общий для кусков одного файла;
+                      дополняется найденными и созданными Entry после коммита
+    :return: (created, updated, values) — созданные и обновлённые EntryValue, всего записанных значений
+    """
+    if entry_ids is None:
+        entry_ids = {}
+    columns = [str(col).strip() for col in df.columns]
     df.columns = columns
 
     if len(columns) < 2:
         raise ValueError("Файл должен содержать дату и хотя бы один параметр")
 
-    param_cache = {p.name_ru.strip(): p for p in Parameter.objects.all()}
-    param_counter = len(param_cache)
-    entries = {}
-    entry_values_to_create = []
-    entry_values_to_update = []
-    existing_entry_values = {
-        (ev.entry_id, ev.parameter_id): ev
-        for ev in EntryValue.objects.select_related("entry", "parameter")
-    }
-
-    for index, row in df.iterrows():
-        date_str = str(row[columns[0]]).strip()
-        try:
-            entry_date = pd.to_datetime(date_str).date()
-        except Exception as e:
-            if message_callback:
-                message_callback(f"⚠️ Пропущена строка с некорректной датой '{date_str}': {e}")
-            continue
+    # --------------------------
+    # 📅 1. Даты — всем столбцом
+    # --------------------------
+    dates = parse_dates(df[columns[0]])
+    for raw in df.loc[dates.isna(), columns[0]]:
+        if message_callback:
+            message_callback(f"⚠️ Пропущена строка с некорректной датой '{str(raw).strip()}'")
+    valid = dates.notna()
 
-        if entry_date not in entries:
-            entries[entry_date], _ = Entry.objects.get_or_create(date=entry_date)
-
-        entry = entries[entry_date]
-
-        for col in columns[1:]:
-            value = row[col]
-            if pd.isnull(value):
-                continue
-
-            name_ru = col.strip()
-            param = param_cache.get(name_ru)
-
-            if not param:
-                key = slugify(name_ru)
-                if not key:
-                    param_counter += 1
-                    key = f"param_{param_counter}"
-                param = Parameter.objects.create(name=name_ru, key=key)
-                param_cache[name_ru] = param
-
-            key_tuple = (entry.id, param.id)
-            if key_tuple in existing_entry_values:
-                ev = existing_entry_values[key_tuple]
-                ev.value = float(value)
-                entry_values_to_update.append(ev)
-            else:
-                ev = EntryValue(entry=entry, parameter=param, value=float(value))
-                entry_values_to_create.append(ev)
-
-    if entry_values_to_create:
-        EntryValue.objects.bulk_create(entry_values_to_create)
-    if entry_values_to_update:
-        EntryValue.objects.bulk_update(entry_values_to_update, ["value"])
-
-    return len(entry_values_to_create), len(entry_values_to_update)
+    # --------------------------
+    # 🔄 2. Длинный формат: (date, column, value)
+    # --------------------------
+    value_columns = columns[1:]
+    long = (
+        df.loc[valid, value_columns]
+        .assign(date=dates[valid])
+        .melt(id_vars="date", var_name="column", value_name="value")
+    )
+    long = long[long["value"].notna()]
+    numeric = pd.to_numeric(long["value"], errors="coerce")
+    if message_callback and numeric.isna().any():
+        message_callback(f"⚠️ Пропущено нечисловых значений: {int(numeric.isna().sum())}")
+    long = long.assign(value=numeric).dropna(subset=["value"])
+    # Повтор даты в файле: побеждает последняя строка
+    long = long.drop_duplicates(subset=["date", "column"], keep="last")
+
+    with transaction.atomic():
+        # --------------------------
+        # 📌 3. Параметры по названию (новые — создаём)
+        # --------------------------
+        parameters = _resolve_parameters(sorted(set(long["column"])))
+
+        # --------------------------
+        # 📆 4. Entry: известные — из справочника, остальные — по датам куска, недостающие — bulk_create
+        # --------------------------
+        all_dates = sorted(set(dates[valid]))
+        found = {}
+        unknown = [d for d in all_dates if d not in entry_ids]
+        for offset in range(0, len(unknown), BATCH_SIZE):
+            found.update(Entry.objects.filter(date__in=unknown[offset:offset + BATCH_SIZE]).values_list("date", "id"))
+        missing = [d for d in unknown if d not in found]
+        if missing:
+            # SQLite ≥ 3.35 возвращает id из bulk_create (RETURNING)
+            for entry in Entry.objects.bulk_create([Entry(date=d) for d in missing], batch_size=BATCH_SIZE):
+                found[entry.date] = entry.pk
+        chunk_ids = {**entry_ids, **found}
+
+        # --------------------------
+        # 💾 5. Значения: upsert пачками
+        # --------------------------
+        # У новых Entry значений нет — созданные считаем только среди значений прежних Entry
+        # (upsert считает вставку и обновление одинаково, поэтому rowcount тут не помогает)
+        new_ids = {found[d] for d in missing}
+        existing = sorted({chunk_ids[d] for d in all_dates} - new_ids)
+        before = _count_values(existing)
+        rows = list(zip(
+            long["date"].map(chunk_ids).tolist(),
+            long["column"].map(parameters).tolist(),
+            long["value"].astype(float).tolist(),
+        ))
+        upsert_values(rows)
+        created = sum(entry_id in new_ids for entry_id, _, _ in rows) + _count_values(existing) - before
+        updated = len(rows) - created
+
+        # Массовая запись не отправляет сигналов — кэш и дообучение обновляем сами
+        transaction.on_commit(diary_cache.invalidate)
+        online_trainer.on_days_changed(all_dates)
+        prediction_cache.on_data_changed()
+
+    # Справочник дополняем только после транзакции: откаченные Entry в него не попадут
+    entry_ids.update(found)
+    return created, updated, len(rows)
+
+
+def report_speed(rows: int, columns: int, values: int, started: float, message_callback=None):
+    """
+    Пишет в лог (и в message_callback) итог импорта со скоростью в строках в секунду.
+    """
+    elapsed = time.perf_counter() - started
+    rate = rows / elapsed if elapsed > 0 else float("inf")
+    summary = (
+        f"⏱️ Импорт: {rows} строк × {columns} столбцов, {values} значений "
+        f"за {elapsed:.2f} с ({rate:.0f} строк/с)"
+    )
+    db_logger.info(f"[import_excel] {summary}")
+    if message_callback:
+        message_callback(summary)
+
+
+def parse_dates(column: pd.Series) -> pd.Series:
+    """
+    Разбирает столбец дат целиком: сначала формат экспорта (ДД.ММ.ГГ),
+    остальное — pd.to_datetime по уникальным строкам, как раньше разбиралась каждая строка.
+
+    :return: Series из datetime.date (NaT — дату разобрать не удалось)
+    """
+    if pd.api.types.is_datetime64_any_dtype(column):
+        parsed = column
+    else:
+        text = column.astype(str).str.strip()
+        parsed = pd.to_datetime(text, format=DATE_FORMAT, errors="coerce")
+        rest = parsed.isna() & column.notna()
+        if rest.any():
+            fallback = {}
+            for value in text[rest].unique():
+                try:
+                    fallback[value] = pd.to_datetime(value)
+                except (ValueError, TypeError, OverflowError):
+                    fallback[value] = pd.NaT
+            parsed = parsed.where(~rest, pd.to_datetime(text[rest].map(fallback)))
+    return parsed.dt.date
+
+
+def _count_values(entry_ids: list) -> int:
+    """
+    Сколько EntryValue у этих Entry (по индексу entry_id, пачками — лимит параметров SQLite).
+    """
+    return sum(
+        EntryValue.objects.filter(entry_id__in=entry_ids[offset:offset + BATCH_SIZE]).count()
+        for offset in range(0, len(entry_ids), BATCH_SIZE)
+    )
+
+
+def _resolve_parameters(names: list) -> dict:
+    """
+    Возвращает {название столбца: parameter_id}, создавая недостающие параметры.
+    """
+    by_name = {name.strip(): pk for pk, name in Parameter.objects.values_list("id", "name")}
+    keys = set(Parameter.objects.values_list("key", flat=True))
+    param_counter = len(by_name)
+
+    for name in names:
+        if name in by_name:
+            continue
+        key = slugify(name)
+        while not key or key in keys:
+            param_counter += 1
+            key = f"param_{param_counter}"
+        by_name[name] = Parameter.objects.create(name=name, key=key).pk
+        keys.add(key)
+    return by_name
@@ -0,0 +1,194 @@
+"""
+📥 stream_importer.py — потоковый импорт больших CSV / XLSX с ограниченной памятью
+
+Назначение:
+    - файл читается кусками по CHUNK_ROWS строк: CSV — pd.read_csv(chunksize=...),
+      XLSX — openpyxl в режиме read_only (строки листа не загружаются целиком);
+    - каждый кусок записывается своей транзакцией через excel_entry_importer.import_rows
+      (векторизованный upsert значений); справочник дата → Entry общий для всех кусков,
+      так что кусок не перечитывает таблицы целиком;
+    - после каждого записанного куска обновляется контрольная точка (JSON рядом с файлом):
+      сколько строк данных (разобранных записей, не строк текста) уже импортировано.
+      Прерванный импорт того же файла продолжается с первой незаписанной записи;
+      после успешного завершения контрольная точка удаляется.
+
+Формат как у импорта Excel: первый столбец — дата, остальные — параметры по названию.
+Повтор даты в файле: побеждает последняя строка (в том числе между кусками).
+"""
+
+import json
+import os
+import tempfile
+import time
+
+import pandas as pd
+
+from diary_analytic.export_scheduler import export_scheduler
+from diary_analytic.importers.excel_entry_importer import import_rows, report_speed
+from diary_analytic.loggers import db_logger
+
+# Сколько строк файла (дат) в одном куске / одной транзакции
+CHUNK_ROWS = 500
+CHECKPOINT_SUFFIX = ".import.json"
+
+
+def checkpoint_path(path: str) -> str:
+    return f"{path}{CHECKPOINT_SUFFIX}"
+
+
+def import_diary_file(source, *, name: str | None = None, chunk_rows: int = CHUNK_ROWS,
+                      checkpoint: str | None = None, message_callback=None) -> dict:
+    """
+    Импортирует CSV или XLSX кусками.
+
+    :param source: путь к файлу или открытый бинарный файл (например, загруженный в админке)
+    :param name: имя файла, если source — файловый объект (по расширению выбирается формат)
+    :param chunk_rows: строк файла в одной транзакции
+    :param checkpoint: путь контрольной точки (None — без возобновления)
+    :param message_callback: функция для сообщений (предупреждения и итог)
+    :return: {"rows", "created", "updated", "values", "chunks", "resumed_from"}
+    """
+    started = time.perf_counter()
+    name = name or getattr(source, "name", None) or str(source)
+    state = _load_checkpoint(checkpoint, source)
+    skip = state["rows"]
+    if skip:
+        db_logger.info(f"[import_diary] ⏩ {name}: продолжаем с строки {skip + 1} (контрольная точка)")
+        if message_callback:
+            message_callback(f"⏩ Продолжение импорта: пропущено уже записанных строк — {skip}")
+
+    totals = {"rows": skip, "created": state["created"], "updated": state["updated"],
+              "values": state["values"], "chunks": 0, "resumed_from": skip}
+    columns = 0
+    entry_ids = {}
+    # Экспорт — один раз после всего файла, а не после каждого куска
+    with export_scheduler.suppress():
+        try:
+            for chunk in iter_chunks(source, name=name, chunk_rows=chunk_rows, skip=skip):
+                created, updated, values = import_rows(chunk, message_callback, entry_ids=entry_ids)
+                columns = len(chunk.columns) - 1
+                totals["rows"] += len(chunk)
+                totals["created"] += created
+                totals["updated"] += updated
+                totals["values"] += values
+                totals["chunks"] += 1
+                # Кусок уже закоммичен — фиксируем, докуда дошли
+                _save_checkpoint(checkpoint, source, totals)
+        finally:
+            if totals["chunks"]:
+                export_scheduler.mark_dirty()
+
+    if checkpoint and os.path.exists(checkpoint):
+        os.remove(checkpoint)
+    report_speed(totals["rows"] - skip, columns, totals["values"] - state["values"], started, message_callback)
+    return totals
+
+
+# ----------------------------------------------------------------
+# 📄 Чтение кусками
+# ----------------------------------------------------------------
+
+def iter_chunks(source, *, name: str | None = None, chunk_rows: int = CHUNK_ROWS, skip: int = 0):
+    """
+    Отдаёт DataFrame по chunk_rows строк данных (заголовок — в columns каждого куска).
+
+    :param skip: сколько записей пропустить (уже импортированы) — считаются разобранные
+                 записи: пустые строки и переводы строк в кавычках не в счёт
+    """
+    name = (name or getattr(source, "name", None) or str(source)).lower()
+    if name.endswith(".csv"):
+        yield from _iter_csv(source, chunk_rows, skip)
+    elif name.endswith((".xlsx", ".xlsm")):
+        yield from _iter_xlsx(source, chunk_rows, skip)
+    else:
+        raise ValueError(f"Неподдерживаемый формат файла: {name} (нужен .csv или .xlsx)")
+
+
+def _iter_csv(source, chunk_rows: int, skip: int):
+    # Пропуск — по разобранным записям, как в контрольной точке (skiprows считал бы строки текста)
+    reader = pd.read_csv(
+        source,
+        encoding="utf-8-sig",
+        dtype=str,
+        chunksize=chunk_rows,
+        skip_blank_lines=True,
+    )
+    with reader:
+        for chunk in reader:
+            if skip >= len(chunk):
+                skip -= len(chunk)
+                continue
+            if skip:
+                chunk, skip = chunk.iloc[skip:], 0
+            yield chunk
+
+
+def _iter_xlsx(source, chunk_rows: int, skip: int):
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(source, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        header = ["" if value is None else str(value) for value in header]
+        batch = []
+        seen = 0
+        for row in rows:
+            if all(value is None for value in row):
+                continue
+            seen += 1
+            if seen <= skip:
+                continue
+            batch.append(row[:len(header)])
+            if len(batch) >= chunk_rows:
+                yield pd.DataFrame(batch, columns=header)
+                batch = []
+        if batch:
+            yield pd.DataFrame(batch, columns=header)
+    finally:
+        workbook.close()
+
+
+# ----------------------------------------------------------------
+# 📌 Контрольная точка
+# ----------------------------------------------------------------
+
+def _fingerprint(source):
+    if isinstance(source, (str, os.PathLike)):
+        st = os.stat(source)
+        return [st.st_size, st.st_mtime_ns]
+    return None
+
+
+def _load_checkpoint(checkpoint: str | None, source) -> dict:
+    empty = {"rows": 0, "created": 0, "updated": 0, "values": 0}
+    if not checkpoint or not os.path.exists(checkpoint):
+        return empty
+    try:
+        with open(checkpoint, encoding="utf-8") as f:
+            state = json.load(f)
+    except (OSError, ValueError) as e:
+        db_logger.warning(f"[import_diary] ⚠️ Контрольная точка не прочитана ({e}), импорт с начала")
+        return empty
+    if state.get("source") != _fingerprint(source):
+        db_logger.warning(f"[import_diary] ⚠️ Файл изменился после прерванного импорта — импорт с начала")
+        return empty
+    return {key: int(state.get(key, 0)) for key in empty}
+
+
+def _save_checkpoint(checkpoint: str | None, source, totals: dict):
+    if not checkpoint:
+        return
+    state = {key: totals[key] for key in ("rows", "created", "updated", "values")}
+    state["source"] = _fingerprint(source)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(checkpoint)), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(tmp_path, checkpoint)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
@@ -1,16 +1,21 @@
 # diary_analytic/loggers.py
 
+import atexit
 import logging
 import os
+import queue
+import threading
 from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener
+
+from django.conf import settings
 
 # -------------------------------------------------------------------
 # 📁 Каталог для логов
 # -------------------------------------------------------------------
 
-# Получаем абсолютный путь до директории /logs, находящейся в корне проекта
-# (на один уровень выше текущего файла, т.е. выше diary_analytic/)
-LOG_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "logs")
+# Каталог логов из настроек (по умолчанию /logs в корне проекта, в тестах — временный)
+LOG_DIR = str(settings.DIARY_LOG_DIR)
 
 # Если каталог logs ещё не создан — создаём его (иначе FileNotFoundError)
 os.makedirs(LOG_DIR, exist_ok=True)
@@ -79,6 +84,139 @@ error_handler = logging.FileHandler(os.path.join(LOG_DIR, "error.log"), encoding
 error_handler.setFormatter(logging.Formatter("[%(asctime)s] [%(name)s] [%(funcName)s] — %(message)s"))
 error_logger.addHandler(error_handler)
 
+# -------------------------------------------------------------------
+# 🧵 Фоновая запись логов (QueueHandler → QueueListener)
+# -------------------------------------------------------------------
+#
+# Обработчики логгеров подсистем (файлы web/predict/db/error/base_model/flags_model)
+# снимаются с логгеров и переезжают в один фоновый поток QueueListener.
+# На логгере остаётся только QueueHandler: вызов logger.info(...) в запросе
+# лишь кладёт запись в очередь, а форматирование по шаблону файла и запись
+# на диск идут в фоне. Каждая запись попадает только в файлы своего логгера.
+#
+# Поток-писатель не переживает fork: дочерний процесс (воркер gunicorn --preload)
+# получает новую очередь и запускает свой поток при первой записи. Воркеры пула
+# обучения пишут синхронно — их initializer вызывает restore_direct_handlers.
+
+_log_queue = queue.SimpleQueue()
+_routes = {}        # имя логгера → его прежние обработчики
+_listener = None
+_listener_lock = threading.Lock()
+
+
+class _RoutedQueueHandler(QueueHandler):
+    """
+    QueueHandler, помечающий запись именем логгера, чьи файлы её получат.
+    """
+
+    def __init__(self, log_queue, route: str):
+        super().__init__(log_queue)
+        self.route = route
+
+    def prepare(self, record):
+        record = super().prepare(record)
+        record.diary_route = self.route
+        return record
+
+    def enqueue(self, record):
+        if _listener is None:
+            _start_listener()
+        super().enqueue(record)
+
+
+class _RouteHandler(logging.Handler):
+    """
+    Обработчик фонового потока: отдаёт запись прежним обработчикам её логгера.
+    """
+
+    def handle(self, record):
+        for handler in _routes.get(getattr(record, "diary_route", None), ()):
+            if record.levelno >= handler.level:
+                handler.handle(record)
+        return True
+
+
+def enqueue_handlers(logger: logging.Logger):
+    """
+    Переводит обработчики логгера на фоновую запись (повторный вызов безвреден).
+    """
+    handlers = [h for h in logger.handlers if not isinstance(h, QueueHandler)]
+    if not handlers:
+        return
+    for handler in handlers:
+        logger.removeHandler(handler)
+    _routes.setdefault(logger.name, []).extend(handlers)
+    if not any(isinstance(h, QueueHandler) for h in logger.handlers):
+        logger.addHandler(_RoutedQueueHandler(_log_queue, logger.name))
+    _start_listener()
+
+
+def _start_listener():
+    global _listener
+    with _listener_lock:
+        if _listener is None:
+            _listener = QueueListener(_log_queue, _RouteHandler())
+            _listener.start()
+
+
+def flush_log_queue():
+    """
+    Дожидается записи всего, что уже в очереди (останавливает и снова запускает поток).
+    """
+    if _listener is not None:
+        _listener.stop()
+        _listener.start()
+
+
+def restore_direct_handlers() -> list[str]:
+    """
+    Возвращает логгерам их обработчики: запись снова синхронная, без очереди.
+    Нужна короткоживущим процессам, которым поток-писатель ни к чему (воркеры пула обучения).
+
+    :return: имена логгеров, которые писали через очередь
+    """
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+    return _reattach_handlers()
+
+
+def _reattach_handlers() -> list[str]:
+    names = list(_routes)
+    for name, handlers in _routes.items():
+        logger = logging.getLogger(name)
+        for handler in [h for h in logger.handlers if isinstance(h, _RoutedQueueHandler)]:
+            logger.removeHandler(handler)
+        for handler in handlers:
+            logger.addHandler(handler)
+    _routes.clear()
+    return names
+
+
+def _after_fork_in_child():
+    # Поток-писатель родителя в дочернем процессе не существует, а в очереди могут быть
+    # записи родителя (их запишет он сам): новая очередь, поток — при первой записи
+    global _listener, _listener_lock, _log_queue
+    _listener = None
+    _listener_lock = threading.Lock()
+    _log_queue = queue.SimpleQueue()
+    for name in _routes:
+        for handler in logging.getLogger(name).handlers:
+            if isinstance(handler, _RoutedQueueHandler):
+                handler.queue = _log_queue
+
+
+def _stop_at_exit():
+    if _listener is not None:
+        _listener.stop()
+
+
+atexit.register(_stop_at_exit)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
+
+
 # Функция для перенаправления ошибок в error.log
 def log_error(logger_name, error_msg, exc_info=None):
     error_logger.error(f"[{logger_name}] {error_msg}", exc_info=exc_info)
@@ -92,6 +230,10 @@ for logger in [web_logger, predict_logger, db_logger]:
     
     logger.addHandler(ErrorHandler())
 
+# Все подсистемы пишут в свои файлы через фоновый поток
+for logger in [web_logger, predict_logger, db_logger, error_logger]:
+    enqueue_handlers(logger)
+
 # Логируем инициализацию
 web_logger.info("🚀 Инициализирован web-логгер")
 predict_logger.info("🚀 Инициализирован predict-логгер")
@@ -0,0 +1,75 @@
+import importlib
+import json
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from diary_analytic.benchmarks import BENCHMARKS
+from diary_analytic.benchmarks.database import benchmark_database
+from diary_analytic.benchmarks.report import compare, environment
+
+
+class Command(BaseCommand):
+    help = 'Запускает бенчмарки горячих путей на синтетических данных во временной БД'
+
+    def add_arguments(self, parser):
+        parser.add_argument('names', nargs='*', help=f'Бенчмарки: {", ".join(BENCHMARKS)} (по умолчанию — все)')
+        parser.add_argument('--sizes', nargs='+', type=int, help='Размеры истории в днях (для export — в значениях)')
+        parser.add_argument('--params', type=int, help='Количество параметров')
+        parser.add_argument('--sparsity', type=float, help='Доля пропущенных значений (0–1)')
+        parser.add_argument('--output', help='Сохранить результаты и окружение в JSON-файл')
+        parser.add_argument('--compare', help='JSON прошлого прогона (--output): сравнить медианы')
+        parser.add_argument('--threshold', type=float, default=1.25,
+                            help='Во сколько раз медленнее считать регрессией (для --compare)')
+
+    def handle(self, *args, **options):
+        names = options['names'] or list(BENCHMARKS)
+        unknown = [n for n in names if n not in BENCHMARKS]
+        if unknown:
+            raise CommandError(f'Неизвестные бенчмарки: {", ".join(unknown)}')
+        baseline = None
+        if options['compare']:
+            try:
+                with open(options['compare'], encoding='utf-8') as f:
+                    baseline = json.load(f)
+            except (OSError, ValueError) as e:
+                raise CommandError(f'Не удалось прочитать {options["compare"]}: {e}')
+
+        kwargs = {k: options[k] for k in ('sizes', 'params', 'sparsity') if options[k] is not None}
+        report = {"environment": environment(), "options": kwargs, "benchmarks": {}}
+        for name in names:
+            module = importlib.import_module(BENCHMARKS[name])
+            with benchmark_database():
+                result = module.run(**kwargs)
+            report["benchmarks"][name] = result
+            self.stdout.write(self.style.SUCCESS(f'⏱️ {name}'))
+            self.stdout.write(json.dumps(result, ensure_ascii=False, indent=2))
+
+        if options['output']:
+            directory = os.path.dirname(os.path.abspath(options['output']))
+            os.makedirs(directory, exist_ok=True)
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+            self.stdout.write(f'💾 Результаты сохранены: {options["output"]}')
+
+        if baseline is not None:
+            self.write_comparison(report, baseline, options['threshold'])
+
+    def write_comparison(self, report, baseline, threshold):
+        rows = compare(report, baseline, threshold)
+        before = baseline.get('environment', {})
+        self.stdout.write(
+            f'📊 Сравнение с {before.get("commit") or "?"} ({before.get("timestamp") or "?"}), '
+            f'порог регрессии ×{threshold}'
+        )
+        if not rows:
+            self.stdout.write('Нет общих замеров (другие бенчмарки, размеры или параметры)')
+            return
+        for row in rows:
+            line = f'{row["path"]}: {row["baseline"]:.3f} → {row["current"]:.3f}'
+            if row['ratio'] is not None:
+                line += f' (×{row["ratio"]})'
+            self.stdout.write(self.style.ERROR(line) if row['regression'] else line)
+        regressions = sum(row['regression'] for row in rows)
+        summary = f'Замеров: {len(rows)}, регрессий: {regressions}'
+        self.stdout.write(self.style.ERROR(summary) if regressions else self.style.SUCCESS(summary))
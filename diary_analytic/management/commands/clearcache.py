@@ -1,9 +1,10 @@
 from django.core.management.base import BaseCommand
-from django.core.cache import cache
+from django.core.cache import caches
 
 class Command(BaseCommand):
-    help = 'Очищает весь кэш Django'
+    help = 'Очищает все кэши Django (в том числе кэш прогнозов)'
 
     def handle(self, *args, **kwargs):
-        cache.clear()
-        self.stdout.write(self.style.SUCCESS('✅ Кэш Django успешно очищен!'))
+        for cache in caches.all(initialized_only=False):
+            cache.clear()
+        self.stdout.write(self.style.SUCCESS(f'✅ Кэши Django успешно очищены: {", ".join(caches.settings)}'))
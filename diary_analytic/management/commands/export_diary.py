@@ -0,0 +1,21 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from diary_analytic.diary_export import export_diary
+
+
+class Command(BaseCommand):
+    help = 'Экспортирует дневник в CSV или XLSX (потоково, см. diary_export)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', help='Файл .csv или .xlsx (по умолчанию DIARY_EXPORT_PATH)')
+
+    def handle(self, *args, **options):
+        path = str(options['path'] or settings.DIARY_EXPORT_PATH)
+        started = time.perf_counter()
+        rows = export_diary(path)
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Экспорт завершён: {path}, строк: {rows}, {time.perf_counter() - started:.2f} с'
+        ))
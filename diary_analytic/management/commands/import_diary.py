@@ -0,0 +1,33 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from diary_analytic.importers.stream_importer import CHUNK_ROWS, checkpoint_path, import_diary_file
+
+
+class Command(BaseCommand):
+    help = 'Импортирует дневник из CSV или XLSX кусками (потоково, с возобновлением, см. stream_importer)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл .csv или .xlsx: первый столбец — дата, остальные — параметры')
+        parser.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS, help='Строк файла в одной транзакции')
+        parser.add_argument('--restart', action='store_true', help='Игнорировать контрольную точку и начать с начала')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if not os.path.isfile(path):
+            raise CommandError(f'Файл не найден: {path}')
+        checkpoint = checkpoint_path(path)
+        if options['restart'] and os.path.exists(checkpoint):
+            os.remove(checkpoint)
+
+        result = import_diary_file(
+            path,
+            chunk_rows=options['chunk_rows'],
+            checkpoint=checkpoint,
+            message_callback=self.stdout.write,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Импорт завершён: строк {result['rows']}, создано {result['created']}, "
+            f"обновлено {result['updated']}, кусков {result['chunks']}"
+        ))
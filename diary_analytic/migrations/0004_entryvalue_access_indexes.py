@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:13
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('diary_analytic', '0003_trainingjob'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='entryvalue',
+            name='entry',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='diary_analytic.entry'),
+        ),
+        migrations.AlterField(
+            model_name='entryvalue',
+            name='parameter',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='diary_analytic.parameter'),
+        ),
+        migrations.AddIndex(
+            model_name='entryvalue',
+            index=models.Index(fields=['parameter', 'entry'], name='entryvalue_param_entry'),
+        ),
+    ]
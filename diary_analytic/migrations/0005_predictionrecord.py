@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('diary_analytic', '0004_entryvalue_access_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PredictionRecord',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('strategy', models.CharField(max_length=32)),
+                ('target', models.CharField(max_length=100)),
+                ('value', models.FloatField(null=True)),
+                ('model_version', models.CharField(max_length=32)),
+            ],
+            options={
+                'unique_together': {('date', 'strategy', 'target')},
+            },
+        ),
+    ]
@@ -4,10 +4,14 @@ import logging
 import datetime
 import os
 
+from django.conf import settings
+
+from diary_analytic.loggers import enqueue_handlers
+
 logger = logging.getLogger(__name__)
 
 # Логгер для отладки входных данных
-logs_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'logs')
+logs_dir = str(settings.DIARY_MODEL_LOG_DIR)
 os.makedirs(logs_dir, exist_ok=True)
 my_test_log_path = os.path.join(logs_dir, 'my_test.log')
 base_model_log_path = os.path.join(logs_dir, 'base_model.log')
@@ -20,7 +24,7 @@ try:
     base_model_handler = logging.FileHandler(base_model_log_path, mode="a", encoding="utf-8")
     base_model_handler.setFormatter(logging.Formatter("[%(asctime)s] %(message)s"))
     base_model_logger.addHandler(base_model_handler)
-    base_model_logger.setLevel(logging.DEBUG)
+    base_model_logger.setLevel(settings.DIARY_LOG_LEVEL)
 except Exception as e:
     # Если не удалось создать логгер, ничего не делаем
     pass
@@ -32,10 +36,14 @@ try:
     my_test_handler = logging.FileHandler(my_test_log_path, mode="a", encoding="utf-8")
     my_test_handler.setFormatter(logging.Formatter("[%(asctime)s] %(message)s"))
     my_test_logger.addHandler(my_test_handler)
-    my_test_logger.setLevel(logging.DEBUG)
+    my_test_logger.setLevel(settings.DIARY_LOG_LEVEL)
 except Exception as e:
     base_model_logger.error("Ошибка при создании my_test_handler: %s", e)
 
+# Запись в файлы — в фоновом потоке (см. loggers.enqueue_handlers)
+enqueue_handlers(base_model_logger)
+enqueue_handlers(my_test_logger)
+
 DROP_ALWAYS = ["date", "Дата", "дата", "index"]
 
 def train_model(
@@ -52,15 +60,16 @@ def train_model(
     drop_cols = DROP_ALWAYS + exclude + [target]
     X = df.drop(columns=drop_cols, errors="ignore")
 
-    # Логируем shape и типы исходных данных
-    base_model_logger.debug(f"=== train_model: target={target} ===")
-    base_model_logger.debug(f"df.shape: {df.shape}")
-    base_model_logger.debug(f"df.dtypes: {df.dtypes}")
-    base_model_logger.debug(f"df.head():\n{df.head()}\n")
-    base_model_logger.debug(f"X.shape: {X.shape}")
-    base_model_logger.debug(f"X.dtypes: {X.dtypes}")
-    base_model_logger.debug(f"X.head():\n{X.head()}\n")
-    base_model_logger.debug(f"X unique types: {[set(type(x) for x in X[col]) for col in X.columns]}")
+    # Логируем shape и типы исходных данных (дампы дорогие — только если DEBUG включён)
+    if base_model_logger.isEnabledFor(logging.DEBUG):
+        base_model_logger.debug("=== train_model: target=%s ===", target)
+        base_model_logger.debug("df.shape: %s", df.shape)
+        base_model_logger.debug("df.dtypes: %s", df.dtypes)
+        base_model_logger.debug("df.head():\n%s\n", df.head())
+        base_model_logger.debug("X.shape: %s", X.shape)
+        base_model_logger.debug("X.dtypes: %s", X.dtypes)
+        base_model_logger.debug("X.head():\n%s\n", X.head())
+        base_model_logger.debug("X unique types: %s", [set(type(x) for x in X[col]) for col in X.columns])
 
     # Удаляем все столбцы, где есть хотя бы одно значение типа date/datetime
     def has_date_value(series):
@@ -69,7 +78,7 @@ def train_model(
     if date_cols:
         logger.warning("Удаляю столбцы с датами: %s", date_cols)
         X = X.drop(columns=date_cols)
-        my_test_logger.debug(f"Удалены столбцы с датами: {date_cols}")
+        my_test_logger.debug("Удалены столбцы с датами: %s", date_cols)
 
     # Оставляем только числовые признаки
     # X = X.select_dtypes(include=["number"]).fillna(0.0)
@@ -84,14 +93,14 @@ def train_model(
     mask_X = ~X.isna().any(axis=1)
     X = X[mask_X]
     y = y[mask_X]
-    base_model_logger.debug(f"Удалено строк с NaN в признаках: {len(mask_y) - mask_X.sum()}")
-    my_test_logger.debug(f"Удалено строк с NaN в признаках: {len(mask_y) - mask_X.sum()}")
-
-    my_test_logger.debug(f"y.name: {y.name}")
-    my_test_logger.debug(f"y.dtype: {y.dtype}")
-    my_test_logger.debug(f"y.head():\n{y.head()}\n")
-    my_test_logger.debug(f"y unique types: {set(type(x) for x in y)}")
-    my_test_logger.debug(f"--- END train_model: target={target} ---\n")
+    base_model_logger.debug("Удалено строк с NaN в признаках: %s", len(mask_y) - mask_X.sum())
+    if my_test_logger.isEnabledFor(logging.DEBUG):
+        my_test_logger.debug("Удалено строк с NaN в признаках: %s", len(mask_y) - mask_X.sum())
+        my_test_logger.debug("y.name: %s", y.name)
+        my_test_logger.debug("y.dtype: %s", y.dtype)
+        my_test_logger.debug("y.head():\n%s\n", y.head())
+        my_test_logger.debug("y unique types: %s", set(type(x) for x in y))
+        my_test_logger.debug("--- END train_model: target=%s ---\n", target)
 
     # 🛡 Если целевая переменная не числовая — пропускаем
     if not pd.api.types.is_numeric_dtype(df[target]):
@@ -0,0 +1,168 @@
+"""
+🧮 multi_fit.py — обучение всех targets одной стратегии за один проход
+
+train_model (base_model / flags_model) для каждого target:
+    - убирает target из признаков,
+    - оставляет строки, где target и все признаки не NaN,
+    - обучает LinearRegression.
+
+Раз признаки — это все остальные столбцы, набор строк одинаков для всех targets:
+это «полные» строки, где заполнены все столбцы. Поэтому достаточно один раз
+подготовить матрицу Z (строки × столбцы), один раз посчитать центрированную
+матрицу Грама C = Zcᵀ Zc и для каждого target j решить нормальные уравнения
+    C[-j, -j] · β = C[-j, j],   intercept = mean[j] - mean[-j] · β
+Это та же задача наименьших квадратов, что решает LinearRegression
+(с центрированием при fit_intercept=True), поэтому коэффициенты совпадают
+с поцелевым циклом с точностью до ошибок округления.
+"""
+
+import datetime
+import logging
+
+import numpy as np
+import pandas as pd
+from sklearn.linear_model import LinearRegression
+
+from .base_model import DROP_ALWAYS
+
+logger = logging.getLogger(__name__)
+
+
+def complete_rows(df: pd.DataFrame, *, exclude: list[str] | None = None) -> pd.DataFrame:
+    """
+    Числовые признаки полных строк — тех, где заполнены все столбцы.
+    Индекс результата — номера строк df.reset_index() (по ним можно найти дату).
+
+    :raises ValueError: если среди признаков есть нечисловые столбцы
+    """
+    if exclude is None:
+        exclude = []
+    df = df.reset_index()
+    data = df.drop(columns=DROP_ALWAYS + exclude, errors="ignore")
+
+    # Удаляем столбцы с датами — как has_date_value в train_model, но только среди object-столбцов
+    date_cols = [
+        col for col in data.columns
+        if data[col].dtype == object
+        and data[col].map(lambda x: isinstance(x, (datetime.date, datetime.datetime))).any()
+    ]
+    if date_cols:
+        logger.warning("Удаляю столбцы с датами: %s", date_cols)
+        data = data.drop(columns=date_cols)
+
+    non_numeric = [col for col in data.columns if not pd.api.types.is_numeric_dtype(data[col])]
+    if non_numeric:
+        raise ValueError(f"Нечисловые столбцы: {non_numeric}")
+
+    return data[data.notna().all(axis=1)]
+
+
+def prepare_matrix(df: pd.DataFrame, *, exclude: list[str] | None = None):
+    """
+    Готовит общую матрицу признаков один раз для всех targets.
+
+    :return: (Z, columns) — np.ndarray полных строк и имена его столбцов
+    :raises ValueError: если среди признаков есть нечисловые столбцы
+    """
+    data = complete_rows(df, exclude=exclude)
+    return data.to_numpy(dtype=float), list(data.columns)
+
+
+def fit_all_targets(df: pd.DataFrame, targets: list[str], *, exclude: list[str] | None = None) -> dict:
+    """
+    Обучает leave-target-out регрессии для всех targets по одной матрице Грама.
+
+    :param df: широкая таблица (как для train_model)
+    :param targets: для каких столбцов обучать модели
+    :return: {target: {"model": LinearRegression или None, "features": [...]}}
+             либо {target: Exception}, если обучение этого target невозможно
+    """
+    Z, columns = prepare_matrix(df, exclude=exclude)
+    n_rows = Z.shape[0]
+
+    mean = Z.mean(axis=0) if n_rows else np.zeros(len(columns))
+    Zc = Z - mean
+    logger.debug("fit_all_targets: Z.shape=%s, targets=%d", Z.shape, len(targets))
+    return solve_targets(Zc.T @ Zc, mean, n_rows, columns, targets, centered_rows=lambda: Zc)
+
+
+def solve_targets(gram: np.ndarray, mean: np.ndarray, n_rows: int, columns: list[str], targets: list[str],
+                  centered_rows=None) -> dict:
+    """
+    Решает нормальные уравнения всех targets по центрированной матрице Грама.
+
+    Если матрица хорошо обусловлена, все регрессии берутся из одной обратной
+    матрицы P = C⁻¹: для target j коэффициенты β = -P[-j, j] / P[j, j]
+    (одно обращение вместо lstsq на каждый target). Иначе — lstsq по каждому target,
+    как в LinearRegression (решение минимальной нормы): по самим строкам, если они
+    переданы, — обусловленность та же, что у sklearn, — или по матрице Грама.
+
+    :param centered_rows: функция без аргументов → центрированная матрица полных строк Zc;
+                          вызывается, только если матрица Грама плохо обусловлена
+    :return: как fit_all_targets
+    """
+    position = {col: i for i, col in enumerate(columns)}
+    precision = _precision(gram) if n_rows > len(columns) else None
+    Zc = centered_rows() if precision is None and centered_rows is not None and n_rows else None
+
+    results = {}
+    for target in targets:
+        if target not in position:
+            results[target] = {"model": None, "features": []}
+            continue
+        j = position[target]
+        others = [i for i in range(len(columns)) if i != j]
+        features = [columns[i] for i in others]
+        if not features:
+            logger.warning("fit_all_targets: Пропущено обучение для '%s' — нет признаков (X пуст)", target)
+            results[target] = {"model": None, "features": []}
+            continue
+        if n_rows == 0:
+            results[target] = ValueError(
+                f"Found array with 0 sample(s) (shape=(0, {len(features)})) while a minimum of 1 is required."
+            )
+            continue
+
+        if precision is not None:
+            beta = -precision[others, j] / precision[j, j]
+            rank, singular = len(others), None
+        elif Zc is not None:
+            beta, _, rank, singular = np.linalg.lstsq(Zc[:, others], Zc[:, j], rcond=None)
+            singular = singular ** 2  # как у lstsq по матрице Грама (см. _linear_regression)
+        else:
+            beta, _, rank, singular = np.linalg.lstsq(gram[np.ix_(others, others)], gram[others, j], rcond=None)
+        results[target] = {"model": _linear_regression(beta, mean[j] - mean[others] @ beta, features, rank, singular),
+                           "features": features}
+    return results
+
+
+def _precision(gram: np.ndarray, rcond: float = 1e-6):
+    """
+    Обратная матрица Грама или None, если матрица вырождена или плохо обусловлена.
+
+    Ошибка обращения растёт как cond(C) · eps; при cond(C) до 1/rcond = 10⁶ коэффициенты
+    совпадают с LinearRegression примерно до 10⁻¹⁰, дальше — lstsq.
+    """
+    if gram.size == 0:
+        return None
+    eigenvalues = np.linalg.eigvalsh(gram)
+    if eigenvalues[0] <= eigenvalues[-1] * rcond:
+        return None
+    return np.linalg.inv(gram)
+
+
+def _linear_regression(coef, intercept, features, rank, singular) -> LinearRegression:
+    """
+    Собирает обученный LinearRegression из готовых коэффициентов —
+    сохраняется в .pkl и прогнозирует так же, как модель после fit().
+    """
+    model = LinearRegression()
+    model.coef_ = np.asarray(coef, dtype=float)
+    model.intercept_ = float(intercept)
+    model.n_features_in_ = len(features)
+    model.feature_names_in_ = np.asarray(features, dtype=object)
+    model.rank_ = int(rank)
+    if singular is not None:
+        # lstsq по матрице Грама возвращает квадраты сингулярных чисел Zc
+        model.singular_ = np.sqrt(np.clip(singular, 0.0, None))
+    return model
@@ -0,0 +1,151 @@
+"""
+📈 online_stats.py — достаточные статистики регрессий для дообучения без полного refit
+
+Все leave-target-out регрессии стратегии обучаются на одних и тех же «полных»
+строках (см. multi_fit), поэтому для них достаточно хранить:
+    n      — число полных строк,
+    total  — Σ z (сумма строк),
+    gram   — Σ z zᵀ (нецентрированная матрица Грама).
+Центрированная матрица получается как C = gram - n · mean meanᵀ, а коэффициенты
+всех targets — через multi_fit.solve_targets, ровно как при полном обучении.
+
+Добавление, изменение или удаление одного дня — обновление ранга один:
+    добавить строку z:  n += 1, total += z, gram += z zᵀ
+    убрать строку z:    n -= 1, total -= z, gram -= z zᵀ
+Чтобы убрать или заменить строку, статистики помнят поглощённые строки по ключу (дате).
+
+Модуль не зависит от Django.
+"""
+
+import json
+import os
+import tempfile
+
+import numpy as np
+
+from .multi_fit import solve_targets
+
+
+class GramStatistics:
+    """
+    XᵀX, Σx и n по полным строкам таблицы с фиксированным набором столбцов.
+
+    :ivar columns: порядок столбцов в векторах строк
+    :ivar rows: {ключ: np.ndarray} — строки, вошедшие в статистики
+    :ivar meta: произвольные данные вызывающей стороны (сохраняются вместе со статистиками)
+    """
+
+    def __init__(self, columns: list[str], meta: dict | None = None):
+        self.columns = list(columns)
+        self.meta = dict(meta or {})
+        self.rows = {}
+        self.n = 0
+        self.total = np.zeros(len(self.columns))
+        self.gram = np.zeros((len(self.columns), len(self.columns)))
+
+    @classmethod
+    def from_rows(cls, columns: list[str], keys: list[str], Z: np.ndarray, meta: dict | None = None):
+        """
+        Статистики по готовой матрице полных строк (одно умножение Zᵀ Z вместо n обновлений).
+        """
+        stats = cls(columns, meta)
+        Z = np.asarray(Z, dtype=float).reshape(len(keys), len(stats.columns))
+        stats.rows = dict(zip(keys, Z))
+        stats.n = len(keys)
+        stats.total = Z.sum(axis=0)
+        stats.gram = Z.T @ Z
+        return stats
+
+    # ----------------------------------------------------------------
+    # ✏️ Обновление ранга один
+    # ----------------------------------------------------------------
+
+    def set_row(self, key: str, vector) -> bool:
+        """
+        Заменяет строку с ключом key: старая вычитается, новая (если не None) добавляется.
+
+        :param vector: значения в порядке columns или None — строки больше нет / она неполная
+        :return: изменились ли статистики
+        """
+        old = self.rows.pop(key, None)
+        new = None if vector is None else np.asarray(vector, dtype=float)
+        if old is not None and new is not None and np.array_equal(old, new):
+            self.rows[key] = old
+            return False
+        if old is not None:
+            self._downdate(old)
+        if new is not None:
+            self._update(new)
+            self.rows[key] = new
+        return old is not None or new is not None
+
+    def _update(self, z: np.ndarray):
+        self.n += 1
+        self.total += z
+        self.gram += np.outer(z, z)
+
+    def _downdate(self, z: np.ndarray):
+        self.n -= 1
+        self.total -= z
+        self.gram -= np.outer(z, z)
+
+    # ----------------------------------------------------------------
+    # 🧮 Коэффициенты
+    # ----------------------------------------------------------------
+
+    def solve(self, targets: list[str] | None = None) -> dict:
+        """
+        Коэффициенты всех targets — результат как у multi_fit.fit_all_targets.
+        """
+        if self.n:
+            mean = self.total / self.n
+            centered = self.gram - self.n * np.outer(mean, mean)
+        else:
+            mean = np.zeros(len(self.columns))
+            centered = self.gram
+        return solve_targets(
+            centered, mean, self.n, self.columns, self.columns if targets is None else targets,
+            centered_rows=lambda: self._matrix() - mean,
+        )
+
+    def _matrix(self) -> np.ndarray:
+        return np.array(list(self.rows.values()), dtype=float).reshape(len(self.rows), len(self.columns))
+
+    # ----------------------------------------------------------------
+    # 💾 Файл
+    # ----------------------------------------------------------------
+
+    def save(self, path: str):
+        """
+        Сохраняет статистики в .npz атомарно (через временный файл и os.replace).
+        """
+        keys = list(self.rows)
+        matrix = self._matrix()
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez(
+                    f,
+                    columns=np.array(self.columns, dtype=str),
+                    keys=np.array(keys, dtype=str),
+                    rows=matrix,
+                    n=np.array(self.n),
+                    total=self.total,
+                    gram=self.gram,
+                    meta=np.array(json.dumps(self.meta)),
+                )
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    @classmethod
+    def load(cls, path: str):
+        with np.load(path, allow_pickle=False) as data:
+            stats = cls([str(c) for c in data["columns"]], json.loads(str(data["meta"])))
+            stats.rows = dict(zip((str(k) for k in data["keys"]), data["rows"].reshape(-1, len(stats.columns))))
+            stats.n = int(data["n"])
+            stats.total = data["total"].astype(float)
+            stats.gram = data["gram"].astype(float)
+        return stats
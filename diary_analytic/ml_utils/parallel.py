@@ -0,0 +1,76 @@
+"""
+🧵 parallel.py — обучение targets и стратегий в пуле процессов
+
+Матрица признаков готовится один раз в родительском процессе и сохраняется
+во временный .npy-файл; воркеры открывают его через np.load(mmap_mode="r"),
+так что данные не пиклятся в каждую задачу — по сети процессов едут только
+(стратегия, target) и обученная модель обратно.
+
+Модуль не зависит от Django: воркеры могут стартовать любым способом (fork/spawn).
+"""
+
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+# Общая матрица воркера: открывается один раз в initializer
+_shared_df = None
+
+
+def _init_worker(matrix_path: str, columns: list[str], setup=None):
+    global _shared_df
+    if setup is not None:
+        setup()
+    data = np.load(matrix_path, mmap_mode="r")
+    _shared_df = pd.DataFrame(data, columns=columns, copy=False)
+
+
+def _train_one(strategy: str, target: str):
+    from . import get_model
+    if target not in _shared_df.columns:
+        # Нечисловой target: train_model пропустил бы его обучение
+        return {"model": None, "features": []}
+    try:
+        return get_model(strategy).train_model(_shared_df, target=target, exclude=[])
+    except Exception as e:
+        # Ошибка одного target не должна ронять остальные — вернём её как результат
+        return e
+
+
+def train_parallel(df: pd.DataFrame, jobs: list[tuple[str, str]], *, workers: int, worker_setup=None) -> dict:
+    """
+    Обучает train_model для каждой пары (стратегия, target) в ProcessPoolExecutor.
+
+    В общую матрицу попадают только числовые столбцы: служебные (date) и столбцы
+    с датами train_model всё равно отбрасывает. Если target нечисловой, его нет
+    в матрице, и train_model вернёт «пропущено», как и при обычном обучении.
+
+    :param df: широкая таблица (как для train_model)
+    :param jobs: список (strategy, target)
+    :param workers: число процессов
+    :param worker_setup: функция без аргументов, вызываемая в каждом воркере при старте
+                         (уровня модуля — чтобы пиклилась и при spawn)
+    :return: {(strategy, target): результат train_model или Exception} — в порядке jobs
+    """
+    numeric = df.reset_index(drop=True).select_dtypes(include="number")
+    columns = list(numeric.columns)
+
+    tmp_dir = tempfile.mkdtemp(prefix="diary_train_")
+    try:
+        matrix_path = os.path.join(tmp_dir, "matrix.npy")
+        np.save(matrix_path, numeric.to_numpy(dtype=float))
+
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_worker,
+            initargs=(matrix_path, columns, worker_setup),
+        ) as pool:
+            futures = [pool.submit(_train_one, strategy, target) for strategy, target in jobs]
+            # Собираем строго в порядке постановки — результат детерминирован
+            return {job: future.result() for job, future in zip(jobs, futures)}
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
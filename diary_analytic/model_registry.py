@@ -0,0 +1,228 @@
+# diary_analytic/model_registry.py
+
+"""
+📚 model_registry.py — реестр обученных моделей в памяти процесса
+
+Назначение:
+    - загружает каждый trained_models/<strategy>/<target>.pkl один раз и держит в памяти;
+    - ключ — (стратегия, target);
+    - замечает подмену файла (переобучение) по mtime и размеру и перечитывает его;
+    - считает попадания / промахи / перезагрузки (stats()).
+    - отдаёт отпечаток файлов стратегии (fingerprint()) и поколение обучения (generation()) —
+      версию моделей для PredictionRecord: поколение меняет только полное обучение,
+      дообучение после правок (online_training) его не трогает.
+
+Используется:
+    - PredictorManager.predict_for_date
+    - views.get_predictions
+"""
+
+import hashlib
+import os
+import tempfile
+import threading
+import uuid
+
+import joblib
+from django.conf import settings
+
+from .loggers import predict_logger
+from .prediction_cache import prediction_cache
+from .request_metrics import span
+
+# Поколение полного обучения стратегии: trained_models/<strategy>/_generation
+GENERATION_FILE = "_generation"
+
+
+class ModelRegistry:
+    """
+    Кэш моделей {(strategy, target): запись}.
+    Запись хранит отпечаток файла (mtime_ns, size) и содержимое .pkl в нормализованном виде:
+        {"model": <estimator или None>, "features": [...] или None}
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._entries = {}    # (strategy, target) → (fingerprint, payload)
+        self.hits = 0
+        self.misses = 0
+        self.reloads = 0
+        self.version = 0      # растёт, когда меняется набор загруженных моделей
+
+    # ----------------------------------------------------------------
+    # 📂 Пути
+    # ----------------------------------------------------------------
+
+    @property
+    def base_dir(self) -> str:
+        return str(settings.DIARY_MODELS_DIR)
+
+    def model_dir(self, strategy: str) -> str:
+        return os.path.join(self.base_dir, strategy)
+
+    def model_path(self, strategy: str, target: str) -> str:
+        return os.path.join(self.model_dir(strategy), f"{target}.pkl")
+
+    # ----------------------------------------------------------------
+    # 📤 Чтение
+    # ----------------------------------------------------------------
+
+    def get_models(self, strategy: str) -> dict:
+        """
+        Возвращает все модели стратегии: {target: {"model": ..., "features": ...}}.
+        Стоимость повторного вызова — один os.scandir и stat на файл, без распаковки .pkl.
+        """
+        with span("model_load"):
+            model_dir = self.model_dir(strategy)
+            if not os.path.isdir(model_dir):
+                self._forget_missing(strategy, set())
+                return {}
+
+            found = {}
+            with os.scandir(model_dir) as it:
+                for dirent in it:
+                    if dirent.name.endswith(".pkl") and dirent.is_file():
+                        found[dirent.name[:-len(".pkl")]] = dirent.path
+
+            with self._lock:
+                self._forget_missing(strategy, set(found))
+                return {
+                    target: self._load(strategy, target, found[target])
+                    for target in sorted(found)
+                }
+
+    def get(self, strategy: str, target: str):
+        """
+        Возвращает одну модель {"model": ..., "features": ...} или None, если файла нет.
+        """
+        with span("model_load"):
+            path = self.model_path(strategy, target)
+            if not os.path.isfile(path):
+                return None
+            with self._lock:
+                return self._load(strategy, target, path)
+
+    def fingerprint(self, strategy: str) -> str:
+        """
+        Версия моделей стратегии по файлам на диске: (имя, mtime, размер) всех .pkl.
+        Меняется при любом сохранении модели (обучение, дообучение) в любом процессе;
+        ничего не распаковывает — один os.scandir и stat на файл.
+        """
+        files = []
+        model_dir = self.model_dir(strategy)
+        if os.path.isdir(model_dir):
+            with os.scandir(model_dir) as it:
+                for dirent in it:
+                    if dirent.name.endswith(".pkl") and dirent.is_file():
+                        st = dirent.stat()
+                        files.append((dirent.name, st.st_mtime_ns, st.st_size))
+        return hashlib.blake2b(repr(sorted(files)).encode(), digest_size=8).hexdigest()
+
+    def generation(self, strategy: str) -> str:
+        """
+        Поколение моделей стратегии: случайный токен, записанный последним полным обучением.
+        Стратегия, обученная до появления файла поколения, — по отпечатку файлов (fingerprint).
+        """
+        try:
+            with open(os.path.join(self.model_dir(strategy), GENERATION_FILE), encoding="ascii") as f:
+                token = f.read().strip()
+        except FileNotFoundError:
+            token = ""
+        return token or self.fingerprint(strategy)
+
+    def new_generation(self, strategy: str) -> str:
+        """
+        Записывает новое поколение (после полного обучения, под PredictorManager.train).
+        """
+        token = uuid.uuid4().hex[:16]
+        model_dir = self.model_dir(strategy)
+        os.makedirs(model_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=model_dir, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="ascii") as f:
+            f.write(token)
+        os.replace(tmp_path, os.path.join(model_dir, GENERATION_FILE))
+        return token
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "reloads": self.reloads,
+                "loaded": len(self._entries),
+                "version": self.version,
+            }
+
+    # ----------------------------------------------------------------
+    # 🔄 Сброс
+    # ----------------------------------------------------------------
+
+    def invalidate(self, strategy: str | None = None, target: str | None = None):
+        """
+        Забывает модели: все, одной стратегии или одну конкретную.
+        Следующее обращение перечитает файл с диска.
+        """
+        with self._lock:
+            for key in list(self._entries):
+                if (strategy is None or key[0] == strategy) and (target is None or key[1] == target):
+                    del self._entries[key]
+            self.version += 1
+        # Готовые прогнозы по старым моделям больше не читаются
+        prediction_cache.on_models_changed()
+
+    # ----------------------------------------------------------------
+    # 🧩 Внутренняя кухня
+    # ----------------------------------------------------------------
+
+    def _load(self, strategy: str, target: str, path: str) -> dict:
+        key = (strategy, target)
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            self._entries.pop(key, None)
+            return {"model": None, "features": None}
+        fingerprint = (st.st_mtime_ns, st.st_size)
+
+        cached = self._entries.get(key)
+        if cached is not None and cached[0] == fingerprint:
+            self.hits += 1
+            return cached[1]
+
+        if cached is None:
+            self.misses += 1
+        else:
+            self.reloads += 1
+            predict_logger.info(f"[model_registry] 🔄 Файл модели изменился, перечитываю: {path}")
+            prediction_cache.on_models_changed()
+
+        payload = self._read(path)
+        self._entries[key] = (fingerprint, payload)
+        self.version += 1
+        return payload
+
+    @staticmethod
+    def _read(path: str) -> dict:
+        try:
+            model_dict = joblib.load(path)
+        except Exception as e:
+            # Битый файл не перечитываем на каждый запрос — до следующей подмены
+            predict_logger.error(f"[model_registry] ❌ Не удалось загрузить модель {path}: {e}")
+            return {"model": None, "features": None}
+
+        if isinstance(model_dict, dict) and "model" in model_dict:
+            return {"model": model_dict["model"], "features": model_dict.get("features", None)}
+        return {"model": model_dict, "features": None}
+
+    def _forget_missing(self, strategy: str, present: set):
+        with self._lock:
+            stale = [key for key in self._entries if key[0] == strategy and key[1] not in present]
+            for key in stale:
+                del self._entries[key]
+            if stale:
+                self.version += 1
+        if stale:
+            prediction_cache.on_models_changed()
+
+
+# Единственный экземпляр на процесс
+model_registry = ModelRegistry()
@@ -50,10 +50,12 @@ class Parameter(models.Model):
 
 class EntryValue(models.Model):
     # Ссылка на запись дня (Entry)
-    entry = models.ForeignKey(Entry, on_delete=models.CASCADE)
+    # Отдельный индекс не нужен: entry — первый столбец уникального индекса (entry, parameter)
+    entry = models.ForeignKey(Entry, on_delete=models.CASCADE, db_index=False)
 
     # Ссылка на тип параметра (Parameter)
-    parameter = models.ForeignKey(Parameter, on_delete=models.CASCADE)
+    # Отдельный индекс не нужен: parameter — первый столбец индекса (parameter, entry)
+    parameter = models.ForeignKey(Parameter, on_delete=models.CASCADE, db_index=False)
 
     # Значение параметра (от 0.0 до 5.0)
     value = models.FloatField()
@@ -61,6 +63,12 @@ class EntryValue(models.Model):
     class Meta:
         # Уникальность по паре: один параметр может быть задан один раз в один день
         unique_together = ('entry', 'parameter')
+        indexes = [
+            # История одного параметра по датам (parameter_history, графики) и «есть ли у параметра
+            # значения» — поиск по parameter; entry_id для JOIN с Entry.date берётся прямо из индекса.
+            # value в индекс не входит: иначе каждая правка значения переписывала бы и его
+            models.Index(fields=['parameter', 'entry'], name='entryvalue_param_entry'),
+        ]
 
     def __str__(self):
         # Отображение в админке: "toshn = 3.0 (2025-05-12)"
@@ -68,3 +76,77 @@ class EntryValue(models.Model):
 
     # Пример: EntryValue(entry=Entry(...), parameter=Parameter(...), value=3.0)
 
+
+
+# ------------------------------------------------------
+# 🔁 Модель TrainingJob (фоновое переобучение моделей)
+# ------------------------------------------------------
+
+class TrainingJob(models.Model):
+    STATUS_QUEUED = "queued"
+    STATUS_RUNNING = "running"
+    STATUS_OK = "ok"
+    STATUS_ERROR = "error"
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, "В очереди"),
+        (STATUS_RUNNING, "Выполняется"),
+        (STATUS_OK, "Готово"),
+        (STATUS_ERROR, "Ошибка"),
+    ]
+
+    # Какие стратегии переобучаем (например: ["base", "flags"])
+    strategies = models.JSONField(default=list)
+
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=STATUS_QUEUED)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    # Прогресс: сколько пар (стратегия, target) обработано из общего числа
+    total = models.PositiveIntegerField(default=0)
+    done = models.PositiveIntegerField(default=0)
+    current_target = models.CharField(max_length=255, blank=True, default="")
+
+    # Кто выполняет задание: "hostname:pid" — чтобы отличать прерванные задания от чужих живых
+    worker = models.CharField(max_length=255, blank=True, default="")
+
+    # Время по каждому target: {"base:toshn": 0.012, ...}
+    timings = models.JSONField(default=dict)
+
+    # Сообщения PredictorManager.train (как раньше в ответе retrain_models_all)
+    details = models.JSONField(default=list)
+
+    # Текст исключения, если упало всё задание целиком
+    error = models.TextField(blank=True, default="")
+
+    def __str__(self):
+        # Отображение в админке: "TrainingJob #3 (running 5/32)"
+        return f"TrainingJob #{self.pk} ({self.status} {self.done}/{self.total})"
+
+
+# ------------------------------------------------------------------
+# 🔮 Модель PredictionRecord (готовый прогноз, см. prediction_store.py)
+# ------------------------------------------------------------------
+
+class PredictionRecord(models.Model):
+    # Дата, на которую сделан прогноз (по строке признаков этого дня)
+    date = models.DateField()
+
+    # Стратегия и параметр-target (например: "base", "toshn")
+    strategy = models.CharField(max_length=32)
+    target = models.CharField(max_length=100)
+
+    # Прогноз (None — модель не смогла посчитать)
+    value = models.FloatField(null=True)
+
+    # Версия моделей стратегии, которыми посчитан прогноз (ModelRegistry.generation)
+    model_version = models.CharField(max_length=32)
+
+    class Meta:
+        # Прогнозы дня ищутся по (date, strategy) — это начало уникального индекса
+        unique_together = ('date', 'strategy', 'target')
+
+    def __str__(self):
+        # Отображение в админке: "base:toshn = 2.4 (2025-05-12)"
+        return f"{self.strategy}:{self.target} = {self.value} ({self.date})"
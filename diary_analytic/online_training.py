@@ -0,0 +1,458 @@
+# diary_analytic/online_training.py
+
+"""
+⚡ online_training.py — дообучение моделей после каждой правки значения
+
+Назначение:
+    - после полного переобучения (PredictorManager.train) для стратегии сохраняются
+      достаточные статистики регрессий (ml_utils.online_stats.GramStatistics)
+      рядом с моделями: trained_models/<strategy>/_online_stats.npz;
+    - каждое сохранение / удаление EntryValue меняет одну строку (день):
+      старая строка вычитается из статистик, новая добавляется — обновление ранга один;
+    - коэффициенты всех targets пересчитываются из статистик за миллисекунды
+      и записываются в те же .pkl ({"model": LinearRegression, "features": [...]}),
+      так что прогнозы сразу используют свежие модели, а файлы остаются совместимыми.
+
+Как и при полном обучении, учитываются только дни строго до сегодняшнего.
+Когда наступает новый день, вчерашняя строка добирается при следующем обновлении.
+Сохранение Entry или Parameter (перенос записи на другую дату, переименование
+или удаление параметра) проверяется двумя дешёвыми запросами. Если изменился
+набор столбцов, статистики пересобираются из всей таблицы — это всё равно
+дешевле полного обучения: одно Zᵀ Z и одно решение.
+
+Запрос только запоминает изменённые дни: после коммита их забирает фоновый поток
+не чаще раза в DIARY_ONLINE_INTERVAL секунд — все правки за это время дают одну запись
+моделей, статистик и CSV коэффициентов, после которой готовые прогнозы (PredictionRecord)
+изменённых дней пересчитываются новыми моделями — строка признаков остальных дней не менялась,
+их записи остаются. Изменение столбцов или дат (check) пересчитывает всю сетку.
+Запись стратегии (и полное обучение, см. PredictorManager.train) идёт под файловой
+блокировкой trained_models/<strategy>/.lock: процессы не перетирают файлы друг друга,
+а перед применением статистики перечитываются, если их записал другой процесс.
+Если при остановке процесса правки ещё ждут, они применяются сразу (atexit).
+
+Пока полного обучения не было (нет файла статистик), дообучение ничего не делает.
+Отключается настройкой DIARY_ONLINE_UPDATES = False.
+"""
+
+import atexit
+import math
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date, datetime
+
+import joblib
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Exists, OuterRef
+
+from .loggers import predict_logger
+from .ml_utils.multi_fit import complete_rows
+from .ml_utils.online_stats import GramStatistics
+from .model_registry import model_registry
+from .models import Entry, EntryValue, Parameter
+
+STATS_FILE = "_online_stats.npz"
+LOCK_FILE = ".lock"
+
+try:
+    import fcntl
+except ImportError:     # Windows
+    fcntl = None
+    import msvcrt
+
+
+class OnlineTrainer:
+    """
+    Держит статистики стратегий в памяти и применяет к ним изменённые дни.
+    Изменения копятся до коммита транзакции и дальше — до фоновой записи:
+    частые правки пересчитывают модели один раз за окно.
+    """
+
+    def __init__(self, interval: float | None = None):
+        self._interval = interval
+        self._lock = threading.Lock()           # очередь изменений и поток
+        self._apply_lock = threading.RLock()    # статистики в памяти (после файловой блокировки)
+        self._stats = {}          # strategy → (fingerprint файла, GramStatistics)
+        self._pending = set()     # даты, изменённые в ещё не применённых транзакциях
+        self._check = False       # сохранялись Entry / Parameter — сверить столбцы и даты
+        self._thread = None
+        self._idle = threading.Condition(self._lock)
+        self._last_flush = None   # time.monotonic() последнего применения
+        self.updates = 0
+
+    @property
+    def interval(self) -> float:
+        return float(self._interval if self._interval is not None else settings.DIARY_ONLINE_INTERVAL)
+
+    def stats_path(self, strategy: str) -> str:
+        return os.path.join(model_registry.model_dir(strategy), STATS_FILE)
+
+    @contextmanager
+    def lock(self, strategy: str):
+        """
+        Файловая блокировка моделей стратегии — общая для всех процессов.
+        Под ней пишутся .pkl, статистики и CSV (дообучение и PredictorManager.train).
+        """
+        path = os.path.join(model_registry.model_dir(strategy), LOCK_FILE)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "a+b") as f:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+                else:
+                    f.seek(0)
+                    msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+    # ----------------------------------------------------------------
+    # 🏗️ Статистики после полного обучения
+    # ----------------------------------------------------------------
+
+    def reset(self, strategy: str, df):
+        """
+        Строит статистики стратегии по обучающей таблице (той же, что получил train).
+        Вызывается под lock(strategy).
+        """
+        frame = df if "date" in df.columns else df.reset_index()
+        if "date" not in frame.columns:
+            predict_logger.warning(f"[online_training] ⚠️ {strategy}: в таблице нет дат, дообучение отключено")
+            self._discard(strategy)
+            return None
+        try:
+            rows = complete_rows(frame)
+        except ValueError as e:
+            predict_logger.warning(f"[online_training] ⚠️ {strategy}: статистики не построены ({e}), дообучение отключено")
+            self._discard(strategy)
+            return None
+
+        keys = [_day_key(d) for d in frame.loc[rows.index, "date"]]
+        stats = GramStatistics.from_rows(
+            list(rows.columns), keys, rows.to_numpy(dtype=float), meta={"until": date.today().isoformat()},
+        )
+        with self._apply_lock:
+            self._save(strategy, stats)
+        predict_logger.info(
+            f"[online_training] 📐 {strategy}: статистики построены — {stats.n} полных строк × {len(stats.columns)} столбцов"
+        )
+        return stats
+
+    # ----------------------------------------------------------------
+    # 📡 Обработчики сигналов (см. signals.py)
+    # ----------------------------------------------------------------
+
+    def on_value_changed(self, instance: EntryValue):
+        if not settings.DIARY_ONLINE_UPDATES:
+            return
+        try:
+            day = instance.entry.date
+        except Entry.DoesNotExist:
+            return
+        with self._lock:
+            self._pending.add(day)
+        transaction.on_commit(self._wake)
+
+    def on_days_changed(self, days):
+        """
+        Значения этих дней изменены в обход сигналов (массовая запись при импорте).
+        """
+        if not settings.DIARY_ONLINE_UPDATES:
+            return
+        with self._lock:
+            self._pending.update(days)
+        transaction.on_commit(self._wake)
+
+    def on_structure_changed(self, instance=None, created: bool = False):
+        """
+        Сохранён или удалён Entry / Parameter. Новые объекты ещё без значений ничего не меняют;
+        в остальных случаях при применении сверяются набор столбцов и список дат.
+        """
+        if not settings.DIARY_ONLINE_UPDATES or created:
+            return
+        with self._lock:
+            if isinstance(instance, Entry) and instance.date is not None:
+                self._pending.add(instance.date)
+            self._check = True
+        transaction.on_commit(self._wake)
+
+    # ----------------------------------------------------------------
+    # 🔁 Применение изменений
+    # ----------------------------------------------------------------
+
+    def flush(self) -> bool:
+        """
+        Синхронно применяет накопленные изменения ко всем стратегиям, у которых есть статистики.
+        Ошибка дообучения не должна ломать сохранение значения — она логируется,
+        а изменения возвращаются в очередь до следующего окна.
+
+        :return: было ли что применять
+        """
+        with self._lock:
+            days, check = self._pending, self._check
+            self._pending, self._check = set(), False
+        if not days and not check:
+            return False
+        try:
+            for strategy in self._strategies():
+                if self.apply(strategy, days, check=check):
+                    self._materialize(strategy, None if check else days)
+        except Exception as e:
+            predict_logger.exception(f"[online_training] ❌ Ошибка дообучения, повторю в следующем окне: {e}")
+            with self._lock:
+                self._pending |= days
+                self._check = self._check or check
+        finally:
+            with self._lock:
+                self._last_flush = time.monotonic()
+        return True
+
+    def wait(self, timeout: float | None = None) -> bool:
+        """
+        Ждёт, пока фоновый поток применит все накопленные изменения.
+        """
+        with self._idle:
+            return self._idle.wait_for(lambda: self._thread is None, timeout)
+
+    # ----------------------------------------------------------------
+    # 🧵 Фоновый поток
+    # ----------------------------------------------------------------
+
+    def _wake(self):
+        with self._lock:
+            if self._thread is not None or (not self._pending and not self._check):
+                # Уже запущенный поток сам заберёт новые изменения перед выходом
+                return
+            self._thread = threading.Thread(target=self._loop, name="diary-online-training", daemon=True)
+            self._thread.start()
+
+    def _loop(self):
+        try:
+            while True:
+                with self._lock:
+                    if not self._pending and not self._check:
+                        self._thread = None
+                        self._idle.notify_all()
+                        return
+                    delay = 0.0 if self._last_flush is None else self._last_flush + self.interval - time.monotonic()
+                if delay > 0:
+                    # Окно накопления: правки за это время применяются одной записью
+                    time.sleep(delay)
+                self.flush()
+        except Exception as e:
+            predict_logger.exception(f"[online_training] 🔥 Поток дообучения остановился: {e}")
+            with self._lock:
+                self._thread = None
+                self._idle.notify_all()
+        finally:
+            connection.close()
+
+    def _flush_at_exit(self):
+        # Поток-демон не доживёт до конца окна — применяем оставшееся сами
+        self.wait(timeout=60)
+        self.flush()
+
+    def apply(self, strategy: str, days=(), check: bool = False) -> bool:
+        """
+        Обновляет статистики стратегии по изменённым дням и пересчитывает её модели.
+
+        :param days: даты, значения которых могли измениться
+        :param check: сверить столбцы статистик с параметрами в БД и убрать дни,
+                      записи которых больше нет
+        :return: перезаписаны ли модели
+        """
+        started = time.perf_counter()
+        with self.lock(strategy), self._apply_lock:
+            stats = self._load(strategy)
+            if stats is None:
+                return False
+            today = date.today()
+            days = set(days)
+            columns = set(stats.columns)
+
+            rebuild = False
+            if check:
+                # Параметры, у которых есть хоть одно значение: по одному поиску в индексе
+                # (parameter, entry) на параметр, а не DISTINCT по всем значениям
+                keys = set(
+                    Parameter.objects.filter(Exists(EntryValue.objects.filter(parameter=OuterRef("pk"))))
+                    .values_list("key", flat=True)
+                )
+                rebuild = keys != columns
+                live = {_day_key(d) for d in Entry.objects.values_list("date", flat=True)}
+                days.update(date.fromisoformat(key) for key in stats.rows if key not in live)
+
+            # Наступил новый день — добираем дни, которые раньше были «сегодня»
+            until = date.fromisoformat(stats.meta.get("until", today.isoformat()))
+            if until < today:
+                days.update(Entry.objects.filter(date__gte=until, date__lt=today).values_list("date", flat=True))
+
+            rows = _rows_for(days)
+            # Значение параметра, которого нет среди столбцов, — новый столбец
+            rebuild = rebuild or any(set(row) - columns for row in rows.values())
+
+            if rebuild:
+                from .training_jobs import load_training_frame
+                stats = self.reset(strategy, load_training_frame())
+                if stats is None:
+                    return False
+            else:
+                changed = 0
+                for day in days:
+                    if day < today:
+                        changed += stats.set_row(_day_key(day), _vector(rows.get(day, {}), stats.columns))
+                stats.meta["until"] = max(until, today).isoformat()
+                self._save(strategy, stats)
+                if not changed:
+                    return False
+
+            saved = self._refresh_models(strategy, stats)
+            self.updates += 1
+        predict_logger.info(
+            f"[online_training] ⚡ {strategy}: дообучено {saved} моделей по {stats.n} строкам "
+            f"за {(time.perf_counter() - started) * 1000:.1f} мс{' (пересборка статистик)' if rebuild else ''}"
+        )
+        return saved > 0
+
+    def _materialize(self, strategy: str, days=None):
+        """
+        Пересчитывает PredictionRecord новыми моделями сразу, а не по одному дню на запрос
+        (вне файловой блокировки, как после полного обучения).
+
+        :param days: изменённые дни; None — вся сетка (изменились столбцы или даты)
+        """
+        from .predictor_manager import PredictorManager
+
+        started = time.perf_counter()
+        manager = PredictorManager(strategy)
+        try:
+            saved = manager.materialize_predictions() if days is None else manager.materialize_days(days)
+        except Exception as e:
+            predict_logger.exception(f"[online_training] ❌ {strategy}: прогнозы не записаны: {e}")
+            return
+        predict_logger.info(
+            f"[online_training] 🗄️ {strategy}: записано прогнозов: {saved} за {time.perf_counter() - started:.2f} с"
+        )
+
+    # ----------------------------------------------------------------
+    # 🧩 Внутренняя кухня
+    # ----------------------------------------------------------------
+
+    def _refresh_models(self, strategy: str, stats: GramStatistics) -> int:
+        """
+        Пересчитывает коэффициенты всех targets и перезаписывает .pkl и CSV коэффициентов.
+        Если полных строк нет, старые модели остаются как есть.
+        """
+        from .predictor_manager import PredictorManager
+
+        if stats.n == 0:
+            return 0
+        manager = PredictorManager(strategy)
+        saved = 0
+        for target, result in stats.solve().items():
+            if isinstance(result, Exception) or result.get("model") is None:
+                continue
+            _dump_atomic(
+                {"model": result["model"], "features": result["features"]},
+                model_registry.model_path(strategy, target),
+            )
+            manager.save_model_coefs(result["model"], result["features"], target)
+            saved += 1
+        # Один сброс реестра на все модели стратегии; другие процессы заметят новые mtime
+        model_registry.invalidate(strategy)
+        return saved
+
+    def _strategies(self) -> list[str]:
+        base_dir = model_registry.base_dir
+        if not os.path.isdir(base_dir):
+            return []
+        return sorted(
+            name for name in os.listdir(base_dir)
+            if os.path.isfile(os.path.join(base_dir, name, STATS_FILE))
+        )
+
+    def _load(self, strategy: str):
+        path = self.stats_path(strategy)
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            self._stats.pop(strategy, None)
+            return None
+        fingerprint = (st.st_mtime_ns, st.st_size)
+        cached = self._stats.get(strategy)
+        if cached is not None and cached[0] == fingerprint:
+            return cached[1]
+        # Файл записан другим процессом (или впервые читается этим) — перечитываем
+        stats = GramStatistics.load(path)
+        self._stats[strategy] = (fingerprint, stats)
+        return stats
+
+    def _save(self, strategy: str, stats: GramStatistics):
+        path = self.stats_path(strategy)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        stats.save(path)
+        st = os.stat(path)
+        self._stats[strategy] = ((st.st_mtime_ns, st.st_size), stats)
+
+    def _discard(self, strategy: str):
+        with self._apply_lock:
+            self._stats.pop(strategy, None)
+            path = self.stats_path(strategy)
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def _day_key(day) -> str:
+    if isinstance(day, datetime):
+        day = day.date()
+    return day.isoformat()
+
+
+def _rows_for(days) -> dict:
+    """
+    Значения дней из БД одним запросом: {date: {key: value}}.
+    """
+    rows = {}
+    days = list(days)
+    if not days:
+        return rows
+    for day, key, value in EntryValue.objects.filter(entry__date__in=days).values_list(
+        "entry__date", "parameter__key", "value"
+    ):
+        if value is not None and not math.isnan(value):
+            rows.setdefault(day, {})[key] = float(value)
+    return rows
+
+
+def _vector(row: dict, columns: list[str]):
+    """
+    Строка в порядке столбцов статистик или None, если она неполная (в обучение не входит).
+    """
+    if any(column not in row for column in columns):
+        return None
+    return [row[column] for column in columns]
+
+
+def _dump_atomic(payload: dict, path: str):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    os.close(fd)
+    try:
+        joblib.dump(payload, tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+# Единственный экземпляр на процесс
+online_trainer = OnlineTrainer()
+atexit.register(online_trainer._flush_at_exit)
@@ -0,0 +1,155 @@
+# diary_analytic/prediction_cache.py
+
+"""
+🗃️ prediction_cache.py — кэш готовых прогнозов в кэше Django (алиас CACHES["predictions"])
+
+Назначение:
+    - прогноз на дату зависит только от строки этого дня (get_today_row) и моделей,
+      поэтому готовый ответ хранится под ключом
+          <вид>:<дата>:<штамп данных>:<штамп дня>:<штамп моделей>
+      и отдаётся без get_today_row, загрузки моделей и умножения матриц;
+    - штампы лежат в том же кэше и меняются точно по событиям:
+          штамп дня    — правка / удаление значения за этот день (сигналы, bulk_values);
+          штамп данных — всё, что меняет строки многих дней: параметр сохранён/удалён,
+                         перенос Entry, импорт листа;
+          штамп моделей — модели переобучены или дообучены (model_registry.invalidate).
+      Новый штамп — новые ключи: старые записи больше не читаются и уходят по TIMEOUT / MAX_ENTRIES.
+
+Штамп — случайный токен, а не счётчик: если кэш вытеснит штамп, при следующем чтении
+появится новый токен, и старые записи не совпадут с ним по ошибке.
+Штампы данных меняются после коммита (transaction.on_commit) — иначе параллельный запрос
+мог бы положить в кэш прогноз по ещё не закоммиченным данным под новым штампом.
+
+Те же события удаляют готовые прогнозы из таблицы PredictionRecord (prediction_store) —
+после коммита, перед сменой штампов (транзакция правки не удлиняется лишним DELETE):
+этот слой общий для процессов и переживает перезапуск.
+
+Штампы общие для процессов, только если общий сам кэш: по умолчанию это FileBasedCache
+в settings.DIARY_CACHE_DIR, и изменения, сделанные другим процессом (manage.py import_diary),
+меняют штампы и для сервера. С LocMemCache у каждого процесса свои штампы, и чужие изменения
+этот процесс не увидит до перезапуска (clear() чистит только кэш своего процесса).
+"""
+
+import uuid
+
+from django.core.cache import caches
+from django.db import transaction
+
+from .prediction_store import prediction_store
+
+CACHE_ALIAS = "predictions"
+
+DATA_STAMP = "stamp:data"
+MODEL_STAMP = "stamp:models"
+
+_MISSING = object()
+
+
+def _day_stamp(day) -> str:
+    return f"stamp:day:{day.isoformat()}"
+
+
+def _new_token() -> str:
+    return uuid.uuid4().hex[:16]
+
+
+class PredictionCache:
+    """
+    Готовые прогнозы по дате со штампами данных и моделей.
+    """
+
+    def __init__(self, alias: str = CACHE_ALIAS):
+        self.alias = alias
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    # ----------------------------------------------------------------
+    # 📤 Чтение
+    # ----------------------------------------------------------------
+
+    def get_or_compute(self, kind: str, day, compute):
+        """
+        Прогноз вида kind (например, "strategy:base") на дату day: из кэша или compute().
+
+        Ключ собирается до вычисления: если данные изменятся, пока compute() работает,
+        результат ляжет под старым штампом и читаться не будет.
+        None тоже кэшируется (например, «нет данных на дату»).
+        """
+        key = self.key(kind, day)
+        value = self.cache.get(key, _MISSING)
+        if value is not _MISSING:
+            self.hits += 1
+            return value
+        self.misses += 1
+        value = compute()
+        self.cache.set(key, value)
+        return value
+
+    def key(self, kind: str, day) -> str:
+        stamps = self._stamps([DATA_STAMP, _day_stamp(day), MODEL_STAMP])
+        return f"{kind}:{day.isoformat()}:{':'.join(stamps)}"
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses}
+
+    # ----------------------------------------------------------------
+    # 🔄 Сброс (сигналы, массовая запись, обучение)
+    # ----------------------------------------------------------------
+
+    def on_days_changed(self, days):
+        """
+        Изменились значения за эти дни — прогнозы остальных дней остаются.
+        """
+        days = set(days)
+        if not days:
+            return
+        names = [_day_stamp(day) for day in days]
+
+        def forget():
+            prediction_store.forget_days(days)
+            self._bump(names)
+
+        transaction.on_commit(forget)
+
+    def on_data_changed(self):
+        """
+        Изменилось то, что влияет на строки многих дней (параметры, даты, импорт).
+        """
+        def forget():
+            prediction_store.forget_all()
+            self._bump([DATA_STAMP])
+
+        transaction.on_commit(forget)
+
+    def on_models_changed(self):
+        """
+        Модели на диске заменены — сразу, файлы не ждут коммита.
+        """
+        self._bump([MODEL_STAMP])
+
+    def clear(self):
+        self.cache.clear()
+
+    # ----------------------------------------------------------------
+    # 🧩 Штампы
+    # ----------------------------------------------------------------
+
+    def _stamps(self, names: list) -> list:
+        found = self.cache.get_many(names)
+        for name in names:
+            if name not in found:
+                token = _new_token()
+                # add: если параллельный запрос успел первым — берём его токен
+                found[name] = token if self.cache.add(name, token, timeout=None) else self.cache.get(name, token)
+        return [found[name] for name in names]
+
+    def _bump(self, names: list):
+        self.cache.set_many({name: _new_token() for name in names}, timeout=None)
+
+
+# Единственный экземпляр на процесс
+prediction_cache = PredictionCache()
@@ -0,0 +1,181 @@
+# diary_analytic/prediction_engine.py
+
+"""
+⚡ prediction_engine.py — «скомпилированный» прогноз всех параметров стратегии
+
+Назначение:
+    - все модели стратегии — LinearRegression, поэтому их coef_ и intercept_
+      складываются в одну матрицу коэффициентов W (признаки × targets) и вектор b;
+    - признаки выравниваются по общему индексу (объединение признаков всех моделей),
+      отсутствующие у модели признаки получают коэффициент 0;
+    - прогноз всех targets на дату — одно умножение x @ W + b,
+      на много дат — X @ W + b, без построения DataFrame на каждую модель.
+
+Модели без coef_/intercept_ или без списка признаков прогнозируются как раньше —
+через model.predict (predict_with_model), так что поведение не меняется.
+Результат совпадает с model.predict с точностью до ошибок округления (~1e-12).
+
+Матрица пересобирается, когда меняется набор моделей в model_registry.
+"""
+
+import threading
+
+import numpy as np
+import pandas as pd
+
+from .loggers import predict_logger
+from .model_registry import model_registry
+from .request_metrics import span
+
+
+# --------------------------------------------------------------------
+# 🔮 Прогноз одной модели через sklearn (эталон и запасной путь)
+# --------------------------------------------------------------------
+
+def predict_with_model(model, features, row: dict) -> float:
+    """
+    Прогноз одной модели по строке признаков {key: value}.
+    Отсутствующие признаки заменяются нулём — в том же порядке, что и при обучении.
+    """
+    if features is not None:
+        X = pd.DataFrame([{f: row.get(f, 0.0) for f in features}])
+    elif hasattr(model, 'feature_names_in_'):
+        X = pd.DataFrame([{f: row.get(f, 0.0) for f in model.feature_names_in_}])
+    else:
+        # Fallback: просто все значения row
+        X = pd.DataFrame([row])
+    return float(model.predict(X)[0])
+
+
+# --------------------------------------------------------------------
+# 🧮 Скомпилированная стратегия
+# --------------------------------------------------------------------
+
+class CompiledStrategy:
+    """
+    Матричное представление всех моделей одной стратегии.
+
+    :ivar features: общий индекс признаков (порядок столбцов X)
+    :ivar targets: порядок столбцов W и результата
+    :ivar W: np.ndarray формы (len(features), len(targets))
+    :ivar b: np.ndarray формы (len(targets),)
+    :ivar fallback: {target: {"model", "features"}} — модели, которые не удалось скомпилировать
+    """
+
+    def __init__(self, strategy: str, models: dict, registry_version: int):
+        self.strategy = strategy
+        self.registry_version = registry_version
+
+        linear = {}
+        self.fallback = {}
+        for target, entry in models.items():
+            model = entry["model"]
+            features = entry["features"]
+            if features is None and hasattr(model, "feature_names_in_"):
+                features = list(model.feature_names_in_)
+            coef = getattr(model, "coef_", None)
+            if (
+                features is not None
+                and coef is not None
+                and np.ndim(coef) == 1
+                and len(coef) == len(features)
+                and np.ndim(getattr(model, "intercept_", None)) == 0
+            ):
+                linear[target] = (list(features), np.asarray(coef, dtype=float), float(model.intercept_))
+            else:
+                self.fallback[target] = entry
+
+        self.features = sorted({f for features, _, _ in linear.values() for f in features})
+        self.targets = sorted(linear)
+        position = {f: i for i, f in enumerate(self.features)}
+
+        self.W = np.zeros((len(self.features), len(self.targets)))
+        self.b = np.zeros(len(self.targets))
+        for j, target in enumerate(self.targets):
+            features, coef, intercept = linear[target]
+            self.W[[position[f] for f in features], j] = coef
+            self.b[j] = intercept
+
+    # ----------------------------------------------------------------
+    # 🧱 Матрица признаков
+    # ----------------------------------------------------------------
+
+    def feature_vector(self, row: dict) -> np.ndarray:
+        return np.fromiter((row.get(f, 0.0) for f in self.features), dtype=float, count=len(self.features))
+
+    def feature_matrix(self, df: pd.DataFrame) -> np.ndarray:
+        """
+        Строит X (даты × признаки) из широкой таблицы: нет столбца или NaN → 0.0,
+        как row.get(f, 0.0) при прогнозе на одну дату.
+        """
+        return df.reindex(columns=self.features).fillna(0.0).to_numpy(dtype=float)
+
+    # ----------------------------------------------------------------
+    # 🔮 Прогноз
+    # ----------------------------------------------------------------
+
+    def predict_matrix(self, X: np.ndarray) -> np.ndarray:
+        """
+        Прогноз всех скомпилированных targets: (даты × признаки) → (даты × targets).
+        """
+        with span("predict"):
+            return X @ self.W + self.b
+
+    def predict_row(self, row: dict) -> dict:
+        """
+        Прогноз всех моделей стратегии по одной строке признаков.
+
+        :return: {target: float или None (если модель не смогла дать прогноз)}
+        """
+        with span("predict"):
+            predictions = dict(zip(self.targets, (self.feature_vector(row) @ self.W + self.b).tolist()))
+            for target, entry in self.fallback.items():
+                predictions[target] = self.predict_fallback(target, entry, row)
+        return predictions
+
+    def predict_fallback(self, target: str, entry: dict, row: dict):
+        try:
+            return predict_with_model(entry["model"], entry["features"], row)
+        except Exception as e:
+            predict_logger.error(f"[prediction_engine] ⚠️ Ошибка при прогнозе {target}_{self.strategy}: {e}")
+            return None
+
+
+# --------------------------------------------------------------------
+# 🏭 Кэш скомпилированных стратегий
+# --------------------------------------------------------------------
+
+class PredictionEngine:
+    """
+    Отдаёт CompiledStrategy для стратегии, пересобирая её при изменении моделей.
+    """
+
+    def __init__(self, registry=model_registry):
+        self._registry = registry
+        self._lock = threading.Lock()
+        self._compiled = {}   # strategy → CompiledStrategy
+        self.compiles = 0
+
+    def get(self, strategy: str) -> CompiledStrategy:
+        with span("model_load"):
+            models = self._registry.get_models(strategy)
+            version = self._registry.version
+            with self._lock:
+                compiled = self._compiled.get(strategy)
+                if compiled is None or compiled.registry_version != version:
+                    compiled = CompiledStrategy(strategy, models, version)
+                    self._compiled[strategy] = compiled
+                    self.compiles += 1
+                    predict_logger.info(
+                        f"[prediction_engine] 🧮 Собрана матрица для {strategy}: "
+                        f"{len(compiled.features)} признаков × {len(compiled.targets)} targets, "
+                        f"вне матрицы: {len(compiled.fallback)}"
+                    )
+                return compiled
+
+    def predict_row(self, strategy: str, row: dict) -> dict:
+        return self.get(strategy).predict_row(row)
+
+
+# Единственный экземпляр на процесс
+prediction_engine = PredictionEngine()
@@ -0,0 +1,170 @@
+# diary_analytic/prediction_store.py
+
+"""
+🗄️ prediction_store.py — готовые прогнозы в таблице PredictionRecord
+
+Назначение:
+    - после полного обучения (PredictorManager.train) прогнозы стратегии на все даты
+      с записями и на завтра считаются одной матрицей (predict_range) и записываются
+      в PredictionRecord: (дата, стратегия, target, значение, версия моделей);
+    - predict_for_date (а через него add_entry и /get_predictions/) сначала ищет
+      прогнозы дня по индексу (date, strategy) — без строки признаков и загрузки .pkl;
+    - версия моделей — ModelRegistry.generation: поколение полного обучения. Записи другой
+      версии не читаются, поэтому таблицу видят все процессы и она переживает перезапуск;
+    - правка значений дня удаляет записи этого дня сразу после коммита
+      (prediction_cache.on_days_changed), изменение параметров, перенос Entry
+      или импорт — все записи (on_data_changed). Следующий запрос дня считает
+      прогноз как раньше и записывает его (save_day), если данные не изменились,
+      пока он считался (штамп data_stamp).
+
+Дообучение (DIARY_ONLINE_UPDATES) поколение не меняет: фоновый поток online_training
+после записи моделей пересчитывает только изменённые дни (materialize_days → upsert),
+а после изменения столбцов или дат — всю сетку (materialize_predictions → replace).
+Сетка пишется пачками целых дней, каждая своей транзакцией: правки значений не ждут,
+пока запишутся все дни. Если данные изменились во время записи (штамп data_stamp),
+запись останавливается — остальные дни посчитаются по запросу.
+"""
+
+import math
+
+from django.db import DatabaseError, connection, transaction
+
+from .data_stamp import data_stamp
+from .loggers import predict_logger
+from .models import PredictionRecord
+
+# Сколько строк в одной пачке executemany (и в одной транзакции записи сетки)
+BATCH_SIZE = 5000
+
+
+class PredictionStore:
+    """
+    Чтение и запись PredictionRecord.
+    """
+
+    # ----------------------------------------------------------------
+    # 📤 Чтение
+    # ----------------------------------------------------------------
+
+    def lookup(self, strategy: str, day, version: str) -> dict | None:
+        """
+        Прогнозы стратегии на день {target: значение}, посчитанные моделями версии version;
+        None — таких записей нет.
+        """
+        rows = PredictionRecord.objects.filter(date=day, strategy=strategy, model_version=version)
+        return dict(rows.values_list("target", "value")) or None
+
+    # ----------------------------------------------------------------
+    # 💾 Запись
+    # ----------------------------------------------------------------
+
+    def save_day(self, strategy: str, day, version: str, predictions: dict, stamp: str | None = None):
+        """
+        Записывает прогнозы одного дня (после расчёта по запросу) вместо прежних.
+        Ошибка записи (например, параллельный запрос успел первым) не ломает прогноз — только логируется.
+
+        :param stamp: токен data_stamp, взятый до чтения строки признаков; если он сменился,
+                      запись откатывается. Проверка идёт после вставки, внутри транзакции:
+                      правка, закоммиченная раньше, уже сменила штамп, а удаление прогнозов
+                      правки, закоммиченной позже, дождётся этой транзакции и сотрёт запись
+        """
+        if not predictions:
+            return
+        try:
+            with transaction.atomic():
+                PredictionRecord.objects.filter(date=day, strategy=strategy).delete()
+                PredictionRecord.objects.bulk_create([
+                    PredictionRecord(date=day, strategy=strategy, target=target, value=value, model_version=version)
+                    for target, value in predictions.items()
+                ])
+                if stamp is not None and data_stamp.current() != stamp:
+                    transaction.set_rollback(True)
+                    predict_logger.info(f"[prediction_store] ✋ {strategy}: данные изменились, прогнозы на {day} не записаны")
+        except DatabaseError as e:
+            predict_logger.warning(f"[prediction_store] ⚠️ {strategy}: прогнозы на {day} не записаны: {e}")
+
+    def replace(self, strategy: str, version: str, frame, stamp: str | None = None) -> int:
+        """
+        Заменяет записи стратегии сеткой прогнозов (даты × targets, NaN — нет прогноза):
+        upsert, затем удаление записей других версий.
+
+        :return: сколько записей вставлено
+        """
+        written = self.upsert(strategy, version, frame, stamp=stamp)
+
+        # Записи других версий больше не читаются — удаляем их теми же пачками
+        stale = PredictionRecord.objects.filter(strategy=strategy).exclude(model_version=version)
+        while True:
+            with transaction.atomic():
+                ids = list(stale.values_list("id", flat=True)[:BATCH_SIZE])
+                if not ids:
+                    break
+                PredictionRecord.objects.filter(id__in=ids).delete()
+        return written
+
+    def upsert(self, strategy: str, version: str, frame, stamp: str | None = None) -> int:
+        """
+        Записывает прогнозы дней сетки поверх прежних; записи других дней не трогает.
+
+        Строки пишутся пачками целых дней (каждая — своя транзакция): поиск дня видит
+        либо все его прогнозы, либо ни одного.
+
+        :param stamp: токен data_stamp, по данным которого посчитана сетка; если он сменился,
+                      запись останавливается (прогнозы изменённых дней устарели бы)
+        :return: сколько записей вставлено
+        """
+        days = [day.isoformat() for day in frame.index]
+        targets = list(frame.columns)
+        values = frame.to_numpy(dtype=float).tolist()
+        rows = [
+            (day, strategy, target, None if math.isnan(value) else value, version)
+            for day, row in zip(days, values)
+            for target, value in zip(targets, row)
+        ]
+        sql = _upsert_sql()
+        step = max(1, BATCH_SIZE // max(1, len(targets))) * len(targets)
+        written = 0
+        for offset in range(0, len(rows), step):
+            if stamp is not None and data_stamp.current() != stamp:
+                predict_logger.info(
+                    f"[prediction_store] ✋ {strategy}: данные изменились, записано {written} из {len(rows)} прогнозов"
+                )
+                break
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.executemany(sql, rows[offset:offset + step])
+            written += len(rows[offset:offset + step])
+        return written
+
+    # ----------------------------------------------------------------
+    # 🔄 Сброс (через prediction_cache — в транзакции изменения)
+    # ----------------------------------------------------------------
+
+    def forget_days(self, days):
+        try:
+            PredictionRecord.objects.filter(date__in=list(days)).delete()
+        except DatabaseError as e:
+            predict_logger.error(f"[prediction_store] ❌ Прогнозы на {sorted(days)} не удалены: {e}")
+
+    def forget_all(self):
+        try:
+            PredictionRecord.objects.all().delete()
+        except DatabaseError as e:
+            predict_logger.error(f"[prediction_store] ❌ Прогнозы не удалены: {e}")
+
+
+def _upsert_sql() -> str:
+    meta = PredictionRecord._meta
+    qn = connection.ops.quote_name
+    date, strategy, target, value, version = (
+        qn(meta.get_field(name).column) for name in ("date", "strategy", "target", "value", "model_version")
+    )
+    return (
+        f"INSERT INTO {qn(meta.db_table)} ({date}, {strategy}, {target}, {value}, {version}) "
+        f"VALUES (%s, %s, %s, %s, %s) "
+        f"ON CONFLICT ({date}, {strategy}, {target}) "
+        f"DO UPDATE SET {value} = excluded.{value}, {version} = excluded.{version}"
+    )
+
+
+# Единственный экземпляр на процесс
+prediction_store = PredictionStore()
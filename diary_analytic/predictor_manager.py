@@ -15,12 +15,64 @@
 """
 
 from diary_analytic.ml_utils import get_model
-from .loggers import predict_logger
+from diary_analytic.ml_utils.multi_fit import fit_all_targets
+from diary_analytic.ml_utils.parallel import train_parallel
+from django.conf import settings
+from .loggers import predict_logger, restore_direct_handlers
 import os
+import time
+from datetime import date, timedelta
 import pandas as pd
 from pprint import pformat
 import joblib
 from diary_analytic.models import Parameter
+from .model_registry import model_registry
+from .prediction_engine import prediction_engine
+from .prediction_cache import prediction_cache
+from .prediction_store import prediction_store
+from .online_training import online_trainer
+
+
+def training_targets(df) -> list:
+    """
+    Столбцы широкой таблицы, для которых обучаются модели (все, кроме служебных).
+    """
+    return [target for target in df.columns if target not in ("date", "Дата", "comment")]
+
+
+def train_strategies(df, strategies: list[str], mode: str | None = None, workers: int | None = None,
+                     progress=None) -> list:
+    """
+    Обучает несколько стратегий и возвращает общий список результатов.
+
+    В режиме "parallel" все пары (стратегия, target) раздаются в пул процессов
+    (ml_utils.parallel), матрица признаков передаётся воркерам через memory-mapped файл.
+    Результаты собираются и сохраняются в детерминированном порядке.
+
+    :param workers: число процессов для "parallel" (по умолчанию settings.DIARY_TRAIN_WORKERS
+                    или количество ядер)
+    :param progress: см. PredictorManager.train
+    """
+    mode = mode or settings.DIARY_TRAIN_MODE
+    if mode != "parallel":
+        results = []
+        for strategy_name in strategies:
+            predict_logger.debug("[train_strategies] ▶️ Стратегия: %s", strategy_name)
+            results.extend(PredictorManager(strategy_name).train(df.copy(), mode=mode, progress=progress))
+        return results
+
+    workers = workers or settings.DIARY_TRAIN_WORKERS or os.cpu_count() or 1
+    targets = training_targets(df)
+    jobs = [(strategy_name, target) for strategy_name in strategies for target in targets]
+    predict_logger.info(f"[train_strategies] 🧵 Параллельное обучение: {len(jobs)} задач, процессов: {workers}")
+    # Воркерам пула поток записи логов ни к чему — пишут в файлы синхронно
+    fitted = train_parallel(df, jobs, workers=workers, worker_setup=restore_direct_handlers)
+
+    results = []
+    for strategy_name in strategies:
+        strategy_fitted = {target: fitted[(strategy_name, target)] for target in targets}
+        results.extend(PredictorManager(strategy_name).train(df, mode=mode, fitted=strategy_fitted, progress=progress))
+    return results
 
 
 # -------------------------------------------------------------
@@ -40,10 +92,12 @@ class PredictorManager:
         """
         Сохраняет модель и признаки в .pkl-файл.
         """
-        model_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "diary_analytic", "trained_models", self.strategy)
+        model_dir = model_registry.model_dir(self.strategy)
         os.makedirs(model_dir, exist_ok=True)
-        file_path = os.path.join(model_dir, f"{target}.pkl")
+        file_path = model_registry.model_path(self.strategy, target)
         joblib.dump({"model": model, "features": features}, file_path)
+        # В этом процессе сразу забываем старую модель; остальные заметят новый mtime
+        model_registry.invalidate(self.strategy, target)
         predict_logger.info(f"[save_model] ✅ Модель сохранена: {file_path}")
 
     def save_model_coefs(self, model, features, target):
@@ -62,10 +116,7 @@ class PredictorManager:
                     "coef": model.coef_
                 })
                 coef_df["intercept"] = model.intercept_
-                export_dir = os.path.join(
-                    os.path.dirname(os.path.dirname(__file__)),
-                    "diary_analytic", "trained_models", self.strategy, "csv"
-                )
+                export_dir = os.path.join(model_registry.model_dir(self.strategy), "csv")
                 os.makedirs(export_dir, exist_ok=True)
                 export_path = os.path.join(export_dir, f"{target}_{self.strategy}_coefs.csv")
                 predict_logger.info(f"[save_model_coefs] Сохраняю CSV по пути: {export_path}")
@@ -76,35 +127,78 @@ class PredictorManager:
         else:
             predict_logger.warning(f"[save_model_coefs] Модель не имеет coef_ или model=None. model: {type(model)}, features: {features}")
 
-    def train(self, df):
+    def train(self, df, mode: str | None = None, fitted: dict | None = None, progress=None):
         """
         Обучает все параметры (кроме служебных) по выбранной стратегии.
         :param df: датафрейм всех записей пользователя
+        :param mode: "shared" — все targets по одной матрице Грама (ml_utils.multi_fit),
+                     "per_target" — отдельный train_model на каждый target;
+                     по умолчанию settings.DIARY_TRAIN_MODE
+        :param fitted: уже обученные результаты {target: результат train_model или Exception}
+                       (например, из пула процессов) — тогда остаётся только сохранить их
+        :param progress: объект с методами start(strategy, target) и
+                         finish(strategy, target, seconds, message) — для отчёта о ходе обучения
         :return: список результатов по каждому target
         """
-        results = []
-        for target in df.columns:
-            if target in ("date", "Дата", "comment"):
-                continue
-            predict_logger.info(f"[train] ▶️ Стратегия: {self.strategy}, target={target}, df.columns={list(df.columns)}")
+        mode = mode or settings.DIARY_TRAIN_MODE
+        targets = training_targets(df)
+
+        if fitted is None and mode == "shared":
             try:
-                result = self.model_module.train_model(df.copy(), target=target, exclude=[])
-                model = result.get("model")
-                features = result.get("features")
-                if model:
-                    self.save_model(model, features, target)
-                    self.save_model_coefs(model, features, target)
-                    msg = f"[{self.strategy}] ✅ Обучено и сохранено: {target}"
-                    predict_logger.info("[train] " + msg)
-                    results.append(msg)
-                else:
-                    msg = f"[{self.strategy}] ⚠️ Пропущено: {target}"
-                    predict_logger.warning("[train] " + msg)
+                fitted = fit_all_targets(df, targets, exclude=[])
+                predict_logger.info(f"[train] 🧮 Стратегия: {self.strategy}, общая матрица Грама для {len(targets)} targets")
+            except ValueError as e:
+                predict_logger.warning(f"[train] ⚠️ Общее обучение невозможно ({e}), обучаю по одному target")
+
+        # Модели и статистики стратегии пишутся под той же блокировкой, что и дообучение
+        with online_trainer.lock(self.strategy):
+            results = []
+            for target in targets:
+                predict_logger.info("[train] ▶️ Стратегия: %s, target=%s, df.columns=%s", self.strategy, target, list(df.columns))
+                if progress is not None:
+                    progress.start(self.strategy, target)
+                started = time.perf_counter()
+                try:
+                    if fitted is not None:
+                        result = fitted[target]
+                        if isinstance(result, Exception):
+                            raise result
+                    else:
+                        result = self.model_module.train_model(df.copy(), target=target, exclude=[])
+                    model = result.get("model")
+                    features = result.get("features")
+                    if model:
+                        self.save_model(model, features, target)
+                        self.save_model_coefs(model, features, target)
+                        msg = f"[{self.strategy}] ✅ Обучено и сохранено: {target}"
+                        predict_logger.info("[train] " + msg)
+                        results.append(msg)
+                    else:
+                        msg = f"[{self.strategy}] ⚠️ Пропущено: {target}"
+                        predict_logger.warning("[train] " + msg)
+                        results.append(msg)
+                except Exception as e:
+                    msg = f"[{self.strategy}] ❌ Ошибка при обучении {target}: {e}"
+                    predict_logger.exception("[train] " + msg)
                     results.append(msg)
-            except Exception as e:
-                msg = f"[{self.strategy}] ❌ Ошибка при обучении {target}: {e}"
-                predict_logger.exception("[train] " + msg)
-                results.append(msg)
+                if progress is not None:
+                    progress.finish(self.strategy, target, time.perf_counter() - started, results[-1])
+
+            # Статистики для дообучения после правок (см. online_training)
+            online_trainer.reset(self.strategy, df)
+            # Новое поколение: прежние PredictionRecord больше не читаются
+            model_registry.new_generation(self.strategy)
+
+        # Готовые прогнозы на все даты — add_entry и /get_predictions/ только читают их
+        started = time.perf_counter()
+        try:
+            saved = self.materialize_predictions()
+            predict_logger.info(
+                f"[train] 🗄️ Стратегия: {self.strategy}, записано прогнозов: {saved} "
+                f"за {time.perf_counter() - started:.2f} с"
+            )
+        except Exception as e:
+            predict_logger.exception(f"[train] ❌ Стратегия: {self.strategy}, прогнозы не записаны: {e}")
         return results
 
     # -----------------------------------------------------------------
@@ -121,7 +215,7 @@ class PredictorManager:
 
         :return: float-прогноз (или np.nan/null при невозможности)
         """
-        predict_logger.debug(f"📥 [predict_today] Стратегия: {strategy}, Данные: {today_row}")
+        predict_logger.debug("📥 [predict_today] Стратегия: %s, Данные: %s", strategy, today_row)
         try:
             if strategy == "base":
                 return get_model("base").predict(model["model"], model["features"], today_row)
@@ -140,40 +234,104 @@ class PredictorManager:
         :param date: дата (datetime.date)
         :return: dict {param_key: value, ...}
         """
+        # Готовый ответ живёт, пока не изменились строка этого дня и модели (см. prediction_cache)
+        predictions = prediction_cache.get_or_compute(
+            f"strategy:{self.strategy}", date, lambda: self._predict_for_date(date),
+        )
+        return dict(predictions)
+
+    def _predict_for_date(self, date) -> dict:
+        from diary_analytic.data_stamp import data_stamp
+        # Версия и штамп — до чтения: прогноз по моделям, заменённым во время расчёта, запишется
+        # под старой версией, а по данным, изменённым во время расчёта, не запишется вовсе
+        version = model_registry.generation(self.strategy)
+        stamp = data_stamp.current()
+        stored = prediction_store.lookup(self.strategy, date, version)
+        if stored is not None:
+            return stored
+
         from diary_analytic.utils import get_today_row
-        import os
-        import joblib
-        import pandas as pd
         row = get_today_row(date)
-        predictions = {}
-        # Путь к папке с моделями данной стратегии
-        model_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "diary_analytic", "trained_models", self.strategy)
-        if not os.path.exists(model_dir):
-            return predictions
-        for fname in os.listdir(model_dir):
-            if not fname.endswith(".pkl"):
-                continue
-            param_key = fname.replace(".pkl", "")
-            model_path = os.path.join(model_dir, fname)
-            try:
-                model_dict = joblib.load(model_path)
-                if isinstance(model_dict, dict) and "model" in model_dict:
-                    model = model_dict["model"]
-                    features = model_dict.get("features", None)
-                else:
-                    model = model_dict
-                    features = None
-                # Формируем вход для модели
-                if features is not None:
-                    X = pd.DataFrame([{f: row.get(f, 0.0) for f in features}])
-                    value = float(model.predict(X)[0])
-                elif hasattr(model, 'feature_names_in_'):
-                    X = pd.DataFrame([{f: row.get(f, 0.0) for f in model.feature_names_in_}])
-                    value = float(model.predict(X)[0])
-                else:
-                    X = pd.DataFrame([row])
-                    value = float(model.predict(X)[0])
-                predictions[param_key] = round(value, 2)
-            except Exception as e:
-                predictions[param_key] = None
+        # Все targets стратегии — одним матричным умножением (см. prediction_engine)
+        predictions = prediction_engine.predict_row(self.strategy, row)
+        predictions = {
+            param_key: round(value, 2) if value is not None else None
+            for param_key, value in predictions.items()
+        }
+        prediction_store.save_day(self.strategy, date, version, predictions, stamp=stamp)
         return predictions
+
+    def materialize_predictions(self) -> int:
+        """
+        Записывает в PredictionRecord прогнозы на все даты с записями и на завтра
+        (одна матрица признаков, см. predict_dates и prediction_store).
+        Вызывается после полного обучения и после изменений, затронувших все даты
+        (параметры, перенос Entry — см. online_training).
+
+        :return: сколько прогнозов записано
+        """
+        from diary_analytic.data_stamp import data_stamp
+        from diary_analytic.diary_cache import diary_cache
+        # Версия и штамп — до расчёта: при смене моделей или данных записи не будут читаться
+        version = model_registry.generation(self.strategy)
+        stamp = data_stamp.current()
+        days = set(diary_cache.get_dataframe(copy=False).index)
+        days.add(date.today() + timedelta(days=1))
+        frame = self.predict_dates(sorted(days))
+        return prediction_store.replace(self.strategy, version, frame, stamp=stamp)
+
+    def materialize_days(self, days) -> int:
+        """
+        Пересчитывает в PredictionRecord прогнозы только этих дат (строка признаков прогноза —
+        строка того же дня, поэтому от правки дня зависят лишь его прогнозы).
+        Даты без записей пропускаются: их прогнозы удалены вместе с записью.
+
+        :return: сколько прогнозов записано
+        """
+        from diary_analytic.data_stamp import data_stamp
+        from diary_analytic.diary_cache import diary_cache
+        version = model_registry.generation(self.strategy)
+        stamp = data_stamp.current()
+        present = diary_cache.get_dataframe(copy=False).index
+        days = sorted(day for day in set(days) if day in present)
+        if not days:
+            return 0
+        return prediction_store.upsert(self.strategy, version, self.predict_dates(days), stamp=stamp)
+
+    def predict_range(self, start, end) -> pd.DataFrame:
+        """
+        Возвращает прогнозы по всем параметрам на каждую дату из [start, end].
+
+        Матрица признаков строится сразу для всех дат из широкой таблицы (diary_cache),
+        прогноз всех targets — одно умножение X @ W + b (см. prediction_engine).
+        Для каждой даты результат совпадает с predict_for_date(date).
+
+        :param start: первая дата (datetime.date)
+        :param end: последняя дата включительно (datetime.date)
+        :return: pd.DataFrame (даты × targets), значения округлены до 2 знаков, NaN — нет прогноза
+        """
+        return self.predict_dates(pd.date_range(start, end, freq="D").date)
+
+    def predict_dates(self, dates) -> pd.DataFrame:
+        """
+        То же, что predict_range, для произвольного списка дат (в том же порядке).
+        """
+        from diary_analytic.diary_cache import diary_cache
+        dates = pd.Index(list(dates), name="date")
+        history = diary_cache.get_dataframe(copy=False).reindex(index=dates)
+
+        compiled = prediction_engine.get(self.strategy)
+        result = pd.DataFrame(
+            compiled.predict_matrix(compiled.feature_matrix(history)),
+            index=dates,
+            columns=compiled.targets,
+        )
+        # Модели вне матрицы — построчно, как в predict_for_date
+        for target, entry in compiled.fallback.items():
+            result[target] = [
+                compiled.predict_fallback(target, entry, row.dropna().to_dict())
+                for _, row in history.iterrows()
+            ]
+        result = result.astype(float).round(2)
+        return result[sorted(result.columns)]
+
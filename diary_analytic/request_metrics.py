@@ -0,0 +1,174 @@
+# diary_analytic/request_metrics.py
+
+"""
+⏱️ request_metrics.py — время запросов по частям (Server-Timing и /api/metrics/)
+
+Назначение:
+    - RequestMetricsMiddleware замеряет каждый запрос: общее время, число и время
+      SQL-запросов (connection.execute_wrapper), плюс отрезки span(...) из кода;
+    - ответ получает заголовок Server-Timing — разбивка видна прямо во вкладке
+      Network браузера:
+          Server-Timing: db;dur=4.1;desc="12 queries", model_load;dur=0.8, predict;dur=0.2, total;dur=31.5
+    - request_metrics хранит последние DIARY_METRICS_WINDOW замеров на каждый view
+      и отдаёт перцентили (p50/p90/p99) — их показывает /api/metrics/.
+
+Отрезки (span) в коде:
+    model_load — модели из model_registry и сборка матрицы стратегии (prediction_engine);
+    predict    — прогноз по скомпилированной матрице;
+    dataframe  — построение широкой таблицы (diary_cache);
+    render     — отрисовка шаблона страницы.
+
+Вне запроса (фоновые потоки, команды) span ничего не делает. Вложенный span
+с тем же именем не считается второй раз. Для потоковых ответов
+(StreamingHttpResponse) учитывается только время до начала отдачи тела.
+"""
+
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+import numpy as np
+from django.conf import settings
+from django.db import connection
+
+_current = ContextVar("diary_request_trace", default=None)
+
+PERCENTILES = (50, 90, 99)
+
+
+# --------------------------------------------------------------------
+# 🧩 Замер одного запроса
+# --------------------------------------------------------------------
+
+class RequestTrace:
+    """
+    Накопитель замеров текущего запроса: отрезки span и SQL.
+    """
+
+    def __init__(self):
+        self.spans = {}       # имя → миллисекунды (сумма за запрос)
+        self.open = set()     # открытые сейчас span (вложенные с тем же именем не считаются)
+        self.queries = 0
+        self.db_ms = 0.0
+
+    def execute_wrapper(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.db_ms += (time.perf_counter() - started) * 1000
+
+
+@contextmanager
+def span(name: str):
+    """
+    Отрезок времени внутри запроса: with span("predict"): ...
+    """
+    trace = _current.get()
+    if trace is None or name in trace.open:
+        yield
+        return
+    trace.open.add(name)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.open.discard(name)
+        trace.spans[name] = trace.spans.get(name, 0.0) + (time.perf_counter() - started) * 1000
+
+
+def server_timing(trace: RequestTrace, total_ms: float) -> str:
+    parts = [f'db;dur={trace.db_ms:.1f};desc="{trace.queries} queries"']
+    parts += [f"{name};dur={ms:.1f}" for name, ms in trace.spans.items()]
+    parts.append(f"total;dur={total_ms:.1f}")
+    return ", ".join(parts)
+
+
+# --------------------------------------------------------------------
+# 📊 Скользящие перцентили по view
+# --------------------------------------------------------------------
+
+class RequestMetrics:
+    """
+    Последние замеры каждого view (кольцевой буфер) и перцентили по ним.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._samples = {}    # view_name → deque[(total_ms, queries, db_ms, spans)]
+        self.started = time.time()
+
+    def record(self, view_name: str, total_ms: float, trace: RequestTrace):
+        with self._lock:
+            samples = self._samples.get(view_name)
+            if samples is None:
+                samples = self._samples[view_name] = deque(maxlen=settings.DIARY_METRICS_WINDOW)
+            samples.append((total_ms, trace.queries, trace.db_ms, dict(trace.spans)))
+
+    def snapshot(self) -> dict:
+        """
+        {view_name: {"count", "total_ms": {p50, p90, p99}, "queries": {...}, "db_ms": {...},
+                     "spans": {имя: {...}}}} — по последним DIARY_METRICS_WINDOW запросам.
+        """
+        with self._lock:
+            samples = {name: list(values) for name, values in self._samples.items()}
+        views = {}
+        for name, values in sorted(samples.items()):
+            totals, queries, db_ms, spans = zip(*values)
+            span_names = sorted({s for per_request in spans for s in per_request})
+            views[name] = {
+                "count": len(values),
+                "total_ms": _percentiles(totals),
+                "queries": _percentiles(queries),
+                "db_ms": _percentiles(db_ms),
+                # Отрезок, которого в запросе не было, считается за 0 мс
+                "spans": {s: _percentiles([per_request.get(s, 0.0) for per_request in spans]) for s in span_names},
+            }
+        return {"window": settings.DIARY_METRICS_WINDOW, "since": self.started, "views": views}
+
+    def reset(self):
+        with self._lock:
+            self._samples.clear()
+            self.started = time.time()
+
+
+def _percentiles(values) -> dict:
+    result = np.percentile(np.asarray(values, dtype=np.float64), PERCENTILES)
+    return {f"p{p}": round(float(v), 3) for p, v in zip(PERCENTILES, result)}
+
+
+# Единственный экземпляр на процесс
+request_metrics = RequestMetrics()
+
+
+# --------------------------------------------------------------------
+# 🧱 Middleware
+# --------------------------------------------------------------------
+
+class RequestMetricsMiddleware:
+    """
+    Замеряет запрос целиком и добавляет заголовок Server-Timing.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        trace = RequestTrace()
+        token = _current.set(trace)
+        started = time.perf_counter()
+        try:
+            with connection.execute_wrapper(trace.execute_wrapper):
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        total_ms = (time.perf_counter() - started) * 1000
+
+        response["Server-Timing"] = server_timing(trace, total_ms)
+        match = getattr(request, "resolver_match", None)
+        if match is not None:
+            request_metrics.record(match.view_name, total_ms, trace)
+        return response
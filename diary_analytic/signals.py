@@ -1,17 +1,67 @@
+from django.db.backends.signals import connection_created
 from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
-from .models import EntryValue
+from .models import Entry, EntryValue
 from .models import Parameter
-from .utils import export_diary_to_csv
+from .export_scheduler import export_scheduler
+from .diary_cache import diary_cache
+from .online_training import online_trainer
+from .prediction_cache import prediction_cache
+from .sqlite_tuning import on_connection_created
+
+# Профиль SQLite (WAL, synchronous=NORMAL, mmap, ...) — на каждом новом соединении
+connection_created.connect(on_connection_created, dispatch_uid="diary_sqlite_tuning")
+
+def _mark_value_dirty(instance):
+    # В экспорте и в кэше прогнозов меняется только строка дня этого значения
+    try:
+        day = instance.entry.date
+    except Entry.DoesNotExist:
+        export_scheduler.mark_dirty(check=True)
+        prediction_cache.on_data_changed()
+        return
+    export_scheduler.mark_dirty(day)
+    prediction_cache.on_days_changed([day])
 
 @receiver(post_save, sender=EntryValue)
 def entryvalue_saved(sender, instance, **kwargs):
-    export_diary_to_csv()
+    diary_cache.on_value_saved(instance)
+    online_trainer.on_value_changed(instance)
+    _mark_value_dirty(instance)
 
 @receiver(post_delete, sender=EntryValue)
 def entryvalue_deleted(sender, instance, **kwargs):
-    export_diary_to_csv()
+    diary_cache.on_value_deleted(instance)
+    online_trainer.on_value_changed(instance)
+    _mark_value_dirty(instance)
+
+@receiver(post_save, sender=Entry)
+def entry_saved(sender, instance, created, **kwargs):
+    diary_cache.on_entry_saved(instance)
+    online_trainer.on_structure_changed(instance, created)
+    # Новый день появляется в экспорте пустой строкой; перенос даты — сверка списка дат
+    export_scheduler.mark_dirty(instance.date, check=not created)
+    if not created:
+        # Возможен перенос даты — строки двух дней
+        prediction_cache.on_data_changed()
+
+@receiver(post_delete, sender=Entry)
+def entry_deleted(sender, instance, **kwargs):
+    export_scheduler.mark_dirty(instance.date)
+    prediction_cache.on_days_changed([instance.date])
 
 @receiver(post_save, sender=Parameter)
-def parameter_saved(sender, instance, **kwargs):
-    export_diary_to_csv() 
\ No newline at end of file
+def parameter_saved(sender, instance, created, update_fields=None, **kwargs):
+    diary_cache.on_parameter_saved(instance)
+    online_trainer.on_structure_changed(instance, created)
+    export_scheduler.mark_dirty(check=True)
+    # Описание на прогнозы не влияет — готовые прогнозы остаются
+    if not created and update_fields != frozenset({"description"}):
+        prediction_cache.on_data_changed()
+
+@receiver(post_delete, sender=Parameter)
+def parameter_deleted(sender, instance, **kwargs):
+    diary_cache.on_parameter_deleted(instance)
+    online_trainer.on_structure_changed(instance)
+    export_scheduler.mark_dirty(check=True)
+    prediction_cache.on_data_changed()
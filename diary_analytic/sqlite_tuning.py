@@ -0,0 +1,74 @@
+# diary_analytic/sqlite_tuning.py
+
+"""
+🛠️ sqlite_tuning.py — профиль производительности SQLite для базы дневника
+
+Назначение:
+    - при каждом новом соединении (сигнал connection_created, см. signals.py)
+      выполняются PRAGMA режима журнала, затем settings.DIARY_SQLITE_PRAGMAS, по порядку;
+    - режим журнала (settings.DIARY_SQLITE_WAL):
+        выключен (по умолчанию) — journal_mode=DELETE, synchronous=FULL: всё закоммиченное
+                               лежит в самом db.sqlite3 (база хранится в git и копируется файлом);
+        включён              — journal_mode=WAL: читатели (обучение, экспорт, снимок) не блокируют
+                               запись и наоборот; synchronous=NORMAL — fsync только при checkpoint
+                               (после сбоя питания можно потерять последние коммиты, но не целостность);
+    - DIARY_SQLITE_PRAGMAS (config/settings.py):
+        mmap_size, cache_size, temp_store — чтение истории без лишних копий и обращений к диску;
+        busy_timeout         — писатель ждёт блокировку, а не падает с «database is locked».
+
+journal_mode сохраняется в самом файле базы, поэтому при выключенном WAL режим DELETE
+выставляется явно — база, однажды открытая в WAL, возвращается к журналу отката.
+Для базы в памяти (тесты) SQLite сам оставляет journal_mode=memory.
+"""
+
+import re
+
+from django.conf import settings
+
+from .loggers import db_logger
+
+_PRAGMA_NAME = re.compile(r"^[a-z_]+$")
+_PRAGMA_VALUE = re.compile(r"^-?\w+$")
+
+# Режимы журнала: выбирается по settings.DIARY_SQLITE_WAL
+ROLLBACK_PRAGMAS = {"journal_mode": "DELETE", "synchronous": "FULL"}
+WAL_PRAGMAS = {"journal_mode": "WAL", "synchronous": "NORMAL"}
+
+
+def default_pragmas() -> dict:
+    """
+    Профиль для новых соединений: режим журнала и settings.DIARY_SQLITE_PRAGMAS.
+    """
+    journal = WAL_PRAGMAS if settings.DIARY_SQLITE_WAL else ROLLBACK_PRAGMAS
+    return {**journal, **settings.DIARY_SQLITE_PRAGMAS}
+
+
+def apply_sqlite_pragmas(connection, pragmas: dict | None = None) -> dict:
+    """
+    Выполняет PRAGMA на соединении и возвращает фактические значения (SQLite может
+    отказать, например, WAL для базы в памяти).
+
+    :param connection: соединение Django (DatabaseWrapper) с vendor == "sqlite"
+    :param pragmas: {имя: значение}; по умолчанию default_pragmas()
+    """
+    if connection.vendor != "sqlite":
+        return {}
+    pragmas = default_pragmas() if pragmas is None else pragmas
+    applied = {}
+    with connection.cursor() as cursor:
+        for name, value in pragmas.items():
+            value = str(value)
+            if not _PRAGMA_NAME.match(name) or not _PRAGMA_VALUE.match(value):
+                db_logger.warning(f"[sqlite_tuning] ⚠️ Пропущена некорректная PRAGMA {name}={value!r}")
+                continue
+            cursor.execute(f"PRAGMA {name} = {value}")
+            cursor.execute(f"PRAGMA {name}")
+            row = cursor.fetchone()
+            applied[name] = row[0] if row else None
+    return applied
+
+
+def on_connection_created(sender, connection, **kwargs):
+    applied = apply_sqlite_pragmas(connection)
+    if applied:
+        db_logger.debug("[sqlite_tuning] 🛠️ Новое соединение с %s: %s", connection.settings_dict["NAME"], applied)
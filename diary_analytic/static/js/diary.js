@@ -37,32 +37,9 @@ document.addEventListener("DOMContentLoaded", async function () {
         const paramKey = block.getAttribute("data-key");
 
         if (isAlreadySelected) {
-          // Повторный клик — удаляем значение
-          const payload = {
-            parameter: paramKey,
-            value: null,
-            date: dateValue,
-          };
-          console.log("🟡 Отправка запроса на удаление:", payload);
-          try {
-            const response = await fetch("/update_value/", {
-              method: "POST",
-              headers: {
-                "Content-Type": "application/json",
-                "X-CSRFToken": getCookie("csrftoken"),
-              },
-              body: JSON.stringify(payload),
-            });
-            if (response.ok) {
-              console.log(`🗑️ Удалено: ${paramKey}`);
-              this.classList.remove("selected");
-              loadPredictions();
-            } else {
-              console.error(`❌ Ошибка удаления ${paramKey}`);
-            }
-          } catch (error) {
-            console.error("Ошибка соединения:", error);
-          }
+          // Повторный клик — удаляем значение (уйдёт на сервер вместе с соседними кликами)
+          this.classList.remove("selected");
+          queueValueChange(paramKey, null, dateValue);
           return;
         }
 
@@ -70,36 +47,15 @@ document.addEventListener("DOMContentLoaded", async function () {
         buttons.forEach((b) => b.classList.remove("selected"));
         this.classList.add("selected");
 
-        // 2. Отправка на сервер
-        const payload = {
-          parameter: paramKey,
-          value: selectedValue,
-          date: dateValue,
-        };
-        console.log("🟢 Отправка запроса на обновление:", payload);
-        try {
-          const response = await fetch("/update_value/", {
-            method: "POST",
-            headers: {
-              "Content-Type": "application/json",
-              "X-CSRFToken": getCookie("csrftoken"),
-            },
-            body: JSON.stringify(payload),
-          });
-
-          if (response.ok) {
-            console.log(`✅ Обновлено: ${paramKey} = ${selectedValue}`);
-            loadPredictions();
-          } else {
-            console.error(`❌ Ошибка обновления ${paramKey}`);
-          }
-        } catch (error) {
-          console.error("Ошибка соединения:", error);
-        }
+        // 2. В очередь на сервер: быстрые клики уходят одним запросом
+        queueValueChange(paramKey, selectedValue, dateValue);
       });
     });
   });
 
+  // Недоотправленные клики — при уходе со страницы (смена даты, закрытие вкладки)
+  window.addEventListener("pagehide", () => flushValueChanges({ beacon: true }));
+
   // Инициализируем выбранные значения
   parameterBlocks.forEach(block => {
       const key = block.dataset.key;
@@ -122,6 +78,7 @@ document.addEventListener("DOMContentLoaded", async function () {
       btn.disabled = true;
       btn.textContent = '⏳ Обновление...';
       try {
+        // Сервер только ставит задание в очередь и сразу отвечает его id
         const res = await fetch('/retrain_models_all/', {
           method: 'POST',
           headers: {
@@ -129,12 +86,19 @@ document.addEventListener("DOMContentLoaded", async function () {
             'Content-Type': 'application/json',
           },
         });
-        const data = await res.json();
+        const queued = await res.json();
+        const data = await pollRetrainStatus(queued.job_id, (status) => {
+          if (status.total) {
+            btn.textContent = `⏳ ${status.done}/${status.total}`;
+          }
+        });
         if (data.status === 'ok') {
           alert('Модели успешно переобучены!');
+          loadPredictions();
         } else if (data.status === 'error') {
           // Можно сделать красивое модальное окно, но пока alert
-          alert('Есть ошибки при обучении моделей:\n' + (data.details || []).join('\n'));
+          const details = (data.details || []).filter((msg) => msg.includes('❌'));
+          alert('Есть ошибки при обучении моделей:\n' + (details.length ? details : [data.error]).join('\n'));
         } else {
           alert('Неизвестный ответ от сервера');
         }
@@ -362,6 +326,7 @@ if (sortBtnPercent) {
       defBtn.textContent = '⏳ def...';
       try {
         let count = 0;
+        const defaults = [];
         for (const block of document.querySelectorAll('.parameter-block')) {
           const paramKey = block.getAttribute('data-key');
           const paramTitle = block.querySelector('.param-title').textContent;
@@ -372,33 +337,22 @@ if (sortBtnPercent) {
             // Проверяем, есть ли уже значение
             const selectedBtn = block.querySelector('.value-button.selected');
             if (!selectedBtn) {
-              // Отправляем на сервер
-              const payload = {
-                parameter: paramKey,
-                value: defValue,
-                date: dateValue,
-              };
-              try {
-                const response = await fetch('/update_value/', {
-                  method: 'POST',
-                  headers: {
-                    'Content-Type': 'application/json',
-                    'X-CSRFToken': getCookie('csrftoken'),
-                  },
-                  body: JSON.stringify(payload),
-                });
-                if (response.ok) {
-                  // Подсвечиваем кнопку
-                  const btn = block.querySelector(`.value-button[data-value="${defValue}"]`);
-                  if (btn) btn.classList.add('selected');
-                  count++;
-                }
-              } catch (e) {
-                console.error('Ошибка при установке дефолтного значения:', e);
-              }
+              defaults.push({ parameter: paramKey, value: defValue, date: dateValue, block });
             }
           }
         }
+        // Все дефолтные значения — одним запросом
+        if (defaults.length > 0) {
+          const ok = await sendValueChanges(defaults.map(({ block, ...change }) => change));
+          if (ok) {
+            for (const { value, block } of defaults) {
+              // Подсвечиваем кнопку
+              const btn = block.querySelector(`.value-button[data-value="${value}"]`);
+              if (btn) btn.classList.add('selected');
+            }
+            count = defaults.length;
+          }
+        }
         if (count > 0) {
           loadPredictions();
           alert(`Установлено дефолтных значений: ${count}`);
@@ -413,6 +367,61 @@ if (sortBtnPercent) {
   }
 });
 
+// --------------------------------------------------------------------
+// 📦 Очередь правок: клики копятся VALUE_FLUSH_DELAY_MS и уходят
+// одним POST /api/update_values/ (последний клик по параметру побеждает)
+// --------------------------------------------------------------------
+const VALUE_FLUSH_DELAY_MS = 400;
+const pendingValueChanges = new Map();   // "date|parameter" → {date, parameter, value}
+let valueFlushTimer = null;
+
+function queueValueChange(parameter, value, date) {
+  pendingValueChanges.set(`${date}|${parameter}`, { parameter, value, date });
+  console.log(`🕓 В очереди: ${parameter} = ${value} (${date}), всего правок: ${pendingValueChanges.size}`);
+  clearTimeout(valueFlushTimer);
+  valueFlushTimer = setTimeout(() => flushValueChanges(), VALUE_FLUSH_DELAY_MS);
+}
+
+async function flushValueChanges({ beacon = false } = {}) {
+  clearTimeout(valueFlushTimer);
+  valueFlushTimer = null;
+  if (pendingValueChanges.size === 0) return;
+  const changes = Array.from(pendingValueChanges.values());
+  pendingValueChanges.clear();
+
+  if (beacon && navigator.sendBeacon) {
+    // Страница закрывается — fetch может не успеть
+    navigator.sendBeacon("/api/update_values/", new Blob([JSON.stringify({ changes })], { type: "application/json" }));
+    return;
+  }
+  if (await sendValueChanges(changes)) {
+    loadPredictions();
+  }
+}
+
+async function sendValueChanges(changes) {
+  console.log(`📦 Отправка пакета правок: ${changes.length}`, changes);
+  try {
+    const response = await fetch("/api/update_values/", {
+      method: "POST",
+      headers: {
+        "Content-Type": "application/json",
+        "X-CSRFToken": getCookie("csrftoken"),
+      },
+      body: JSON.stringify({ changes }),
+    });
+    const data = await response.json();
+    if (response.ok) {
+      console.log(`✅ Записано: ${data.updated}, удалено: ${data.deleted}`);
+      return true;
+    }
+    console.error("❌ Ошибка пакетного обновления:", data.error);
+  } catch (error) {
+    console.error("Ошибка соединения:", error);
+  }
+  return false;
+}
+
 // 🔐 Получение CSRF-токена из cookie
 function getCookie(name) {
   let cookieValue = null;
@@ -514,6 +523,8 @@ async function loadPredictions() {
 }
 
 // --- Графики истории значений параметров ---
+const CHART_MAX_POINTS = 240;   // больше точек мини-график всё равно не различит
+
 async function loadParameterHistory(paramKey, dateStr) {
   const chartId = `history-chart-${paramKey}`;
   const emptyId = `history-chart-empty-${paramKey}`;
@@ -532,7 +543,11 @@ async function loadParameterHistory(paramKey, dateStr) {
   }
 
   try {
-    const res = await fetch(`/api/parameter_history/?param=${encodeURIComponent(paramKey)}&date=${encodeURIComponent(dateStr)}`);
+    // Минимальную дату графика отдаём серверу — он вернёт только нужный диапазон
+    const chartFrom = loadChartsMinDate();
+    const fromParam = chartFrom ? `&from=${encodeURIComponent(chartFrom)}` : '';
+    // Длинную историю сервер прореживает (LTTB) до CHART_MAX_POINTS точек с сохранением формы
+    const res = await fetch(`/api/parameter_history/?param=${encodeURIComponent(paramKey)}&date=${encodeURIComponent(dateStr)}${fromParam}&points=${CHART_MAX_POINTS}`);
     const data = await res.json();
     if (!data.dates || !data.values || data.dates.length === 0) {
       ctx.style.display = 'none';
@@ -606,19 +621,21 @@ async function loadParameterHistory(paramKey, dateStr) {
         {
           label: 'Тренд',
           data: (function() {
-            // Линейная регрессия по filteredValues
+            // Линейная регрессия по filteredValues; X — номер дня (после прореживания точки идут неравномерно)
             const n = filteredValues.length;
             if (n < 2) return Array(n).fill(null);
+            const firstDay = Date.parse(filteredDates[0]);
+            const xs = filteredDates.map(d => (Date.parse(d) - firstDay) / 86400000);
             let sumX = 0, sumY = 0, sumXY = 0, sumXX = 0;
             for (let i = 0; i < n; i++) {
-              sumX += i;
+              sumX += xs[i];
               sumY += filteredValues[i];
-              sumXY += i * filteredValues[i];
-              sumXX += i * i;
+              sumXY += xs[i] * filteredValues[i];
+              sumXX += xs[i] * xs[i];
             }
             const slope = (n * sumXY - sumX * sumY) / (n * sumXX - sumX * sumX);
             const intercept = (sumY - slope * sumX) / n;
-            return Array.from({length: n}, (_, i) => Math.round((slope * i + intercept) * 100) / 100);
+            return xs.map(x => Math.round((slope * x + intercept) * 100) / 100);
           })(),
           borderColor: 'rgba(0,123,255,1)',
           backgroundColor: 'rgba(255,152,0,0.10)',
@@ -1323,4 +1340,20 @@ percentBtnStyle.innerHTML = `
     transition: background 0.2s, color 0.2s;
   }
 `;
-document.head.appendChild(percentBtnStyle);
\ No newline at end of file
+document.head.appendChild(percentBtnStyle);
+
+// Опрашивает /retrain_status/ пока задание переобучения не завершится
+async function pollRetrainStatus(jobId, onProgress, intervalMs = 1000) {
+  while (true) {
+    const res = await fetch(`/retrain_status/?job=${jobId}`);
+    const status = await res.json();
+    if (!res.ok) {
+      throw new Error(status.error || 'retrain_status failed');
+    }
+    onProgress(status);
+    if (status.status === 'ok' || status.status === 'error') {
+      return status;
+    }
+    await new Promise((resolve) => setTimeout(resolve, intervalMs));
+  }
+}
@@ -24,7 +24,7 @@ def get(dictionary, key):
     так как метод .get() не вызовет исключение, если ключ отсутствует в словаре.
     """
     value = dictionary.get(key)
-    web_logger.debug(f"[template filter get] key={key}, value={value}, type={type(value)}")
+    web_logger.debug("[template filter get] key=%s, value=%s, type=%s", key, value, type(value))
     return value
 
 @register.filter
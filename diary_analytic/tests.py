@@ -1,3 +1,925 @@
-from django.test import TestCase
+import io
+import json
+import logging
+import os
+import tempfile
+from datetime import date, timedelta
+from unittest import mock
 
-# Create your tests here.
+import joblib
+import numpy as np
+import pandas as pd
+from django.test import TestCase, override_settings
+from sklearn.linear_model import LinearRegression
+
+from .data_stamp import DataStamp, data_stamp
+from .diary_cache import DiaryMatrixCache, diary_cache
+from .diary_snapshot import database_fingerprint
+from .diary_export import export_diary, update_export
+from .export_scheduler import ExportScheduler
+from .history_downsampling import bucket_aggregate, lttb_indices
+from .importers import stream_importer
+from .importers.excel_entry_importer import import_excel_dataframe, import_rows
+from .loggers import enqueue_handlers, flush_log_queue
+from .ml_utils import base_model
+from .ml_utils.multi_fit import fit_all_targets
+from .ml_utils.online_stats import GramStatistics
+from .ml_utils.parallel import train_parallel
+from .model_registry import ModelRegistry, model_registry
+from .online_training import online_trainer
+from .prediction_cache import prediction_cache
+from .prediction_engine import CompiledStrategy, predict_with_model
+from .prediction_store import prediction_store
+from .request_metrics import request_metrics, span
+from .sqlite_tuning import apply_sqlite_pragmas
+from .predictor_manager import PredictorManager
+from .training_jobs import load_training_frame, run_job
+from .models import Entry, EntryValue, Parameter, PredictionRecord, TrainingJob
+from .utils import get_diary_dataframe, get_today_row
+
+
+def _fresh_dataframe():
+    """Широкая таблица, построенная заново из БД (эталон для сравнения с кэшем)."""
+    diary_cache.invalidate()
+    return get_diary_dataframe()
+
+
+class DiaryTestCase(TestCase):
+    """
+    Общая подготовка: экспорт в other/export.csv выключен (EXPORT_PATCHES),
+    при USE_MODELS_DIR модели пишутся во временный каталог self.models_dir.
+    """
+
+    EXPORT_PATCHES = ("diary_analytic.signals.export_scheduler",)
+    USE_MODELS_DIR = False
+
+    def setUp(self):
+        super().setUp()
+        for target in self.EXPORT_PATCHES:
+            patcher = mock.patch(target)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        if self.USE_MODELS_DIR:
+            tmp = tempfile.TemporaryDirectory()
+            self.addCleanup(tmp.cleanup)
+            override = override_settings(DIARY_MODELS_DIR=tmp.name)
+            override.enable()
+            self.addCleanup(override.disable)
+            self.models_dir = tmp.name
+
+    def fill_diary(self, keys, days: int, start: date, seed: int):
+        """
+        Полная таблица: значения 0..5 всех keys за days дней с даты start.
+
+        :return: (параметры, записи Entry по порядку дат)
+        """
+        rng = np.random.default_rng(seed)
+        params = [Parameter.objects.create(key=key, name=key.upper()) for key in keys]
+        entries = []
+        for day in range(days):
+            entry = Entry.objects.create(date=start + timedelta(days=day))
+            entries.append(entry)
+            for param in params:
+                EntryValue.objects.create(entry=entry, parameter=param, value=float(rng.integers(0, 6)))
+        diary_cache.invalidate()
+        return params, entries
+
+
+class DiaryCacheTests(DiaryTestCase):
+    def setUp(self):
+        super().setUp()
+        self.p1 = Parameter.objects.create(key="toshn", name="Тошнота")
+        self.p2 = Parameter.objects.create(key="ustalost", name="Усталость")
+        self.d1 = Entry.objects.create(date=date(2025, 5, 10))
+        self.d2 = Entry.objects.create(date=date(2025, 5, 11))
+        EntryValue.objects.create(entry=self.d1, parameter=self.p1, value=1.0)
+        EntryValue.objects.create(entry=self.d2, parameter=self.p2, value=3.0)
+        diary_cache.invalidate()
+
+    def assertCacheMatchesDb(self):
+        cached = get_diary_dataframe()
+        pd.testing.assert_frame_equal(cached, _fresh_dataframe())
+
+    def test_patches_follow_signals(self):
+        get_diary_dataframe()
+        version = diary_cache.version
+        builds = diary_cache.builds
+
+        with self.captureOnCommitCallbacks(execute=True):
+            EntryValue.objects.create(entry=self.d1, parameter=self.p2, value=2.0)
+            d3 = Entry.objects.create(date=date(2025, 5, 9))
+            EntryValue.objects.create(entry=d3, parameter=self.p1, value=4.0)
+            p3 = Parameter.objects.create(key="golova", name="Голова")
+            EntryValue.objects.create(entry=self.d2, parameter=p3, value=5.0)
+            EntryValue.objects.filter(entry=self.d2, parameter=self.p2).delete()
+
+        self.assertGreater(diary_cache.version, version)
+        self.assertEqual(diary_cache.builds, builds)
+        self.assertCacheMatchesDb()
+
+    def test_parameter_rename_and_delete(self):
+        get_diary_dataframe()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.p1.key = "toshnota"
+            self.p1.save()
+        self.assertIn("toshnota", get_diary_dataframe().columns)
+        self.assertCacheMatchesDb()
+
+        get_diary_dataframe()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.p2.delete()
+        self.assertCacheMatchesDb()
+
+    def test_changes_of_other_process_are_picked_up(self):
+        get_diary_dataframe()
+        # Другой процесс (manage.py import_diary) пишет в БД и после коммита меняет общий штамп
+        EntryValue.objects.filter(entry=self.d1, parameter=self.p1).update(value=7.0)
+        data_stamp.bump()
+        self.assertEqual(get_diary_dataframe().loc[date(2025, 5, 10), "toshn"], 7.0)
+
+        # Чужая правка между своими: патча своей мало — таблица читается заново
+        EntryValue.objects.filter(entry=self.d2, parameter=self.p2).update(value=8.0)
+        data_stamp.bump()
+        with self.captureOnCommitCallbacks(execute=True):
+            EntryValue.objects.create(entry=self.d2, parameter=self.p1, value=1.0)
+        self.assertCacheMatchesDb()
+
+    def test_data_stamp_bumps_are_atomic(self):
+        import threading
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "data_stamp")
+            seen = []
+
+            def writer():
+                stamp = DataStamp(path)  # своё открытие файла на каждый bump, как у отдельного процесса
+                seen.extend(stamp.bump()[0] for _ in range(50))
+
+            threads = [threading.Thread(target=writer) for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            epoch = DataStamp(path).current().split(":")[0]
+            self.assertEqual(sorted(seen), sorted(f"{epoch}:{n}" for n in range(200)))
+
+            os.remove(path)  # файл пропал — новая эпоха, старые штампы не совпадут
+            self.assertNotEqual(DataStamp(path).current().split(":")[0], epoch)
+
+    def test_cold_start_from_snapshot(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            with mock.patch("diary_analytic.diary_cache.snapshot_dir", return_value=os.path.join(tmp, "db.snapshot")):
+                first = DiaryMatrixCache()
+                built = first.get_dataframe()
+                self.assertEqual((first.builds, first.snapshot_loads), (1, 0))
+
+                second = DiaryMatrixCache()
+                pd.testing.assert_frame_equal(second.get_dataframe(), built)
+                self.assertEqual((second.builds, second.snapshot_loads), (0, 1))
+                # Отображённая матрица copy-on-write: патч меняет таблицу, но не файл
+                with second._lock:
+                    second._set_value(self.d1.pk, self.p2.pk, 9.0)
+                self.assertEqual(second.get_dataframe().loc[date(2025, 5, 10), "ustalost"], 9.0)
+                self.assertTrue(np.isnan(DiaryMatrixCache().get_dataframe().loc[date(2025, 5, 10), "ustalost"]))
+
+                # Правка в обход сигналов меняет отпечаток — снимок не принимается
+                EntryValue.objects.filter(entry=self.d1, parameter=self.p1).update(value=2.0)
+                third = DiaryMatrixCache()
+                self.assertEqual(third.get_dataframe().loc[date(2025, 5, 10), "toshn"], 2.0)
+                self.assertEqual((third.builds, third.snapshot_loads), (1, 0))
+
+    def test_fingerprint_sees_compensating_edits(self):
+        EntryValue.objects.create(entry=self.d1, parameter=self.p2, value=5.0)
+        EntryValue.objects.create(entry=self.d2, parameter=self.p1, value=5.0)
+        before = database_fingerprint()
+        # ±1 по диагоналям 2 × 2: количество и любые суммы, взвешенные id, не меняются
+        EntryValue.objects.filter(entry=self.d1, parameter=self.p1).update(value=2.0)
+        EntryValue.objects.filter(entry=self.d2, parameter=self.p2).update(value=4.0)
+        EntryValue.objects.filter(entry=self.d1, parameter=self.p2).update(value=4.0)
+        EntryValue.objects.filter(entry=self.d2, parameter=self.p1).update(value=4.0)
+        self.assertNotEqual(database_fingerprint(), before)
+
+    def test_today_row(self):
+        self.assertEqual(get_today_row(date(2025, 5, 10)), {"toshn": 1.0})
+        self.assertEqual(get_today_row(date(2025, 1, 1)), {})
+
+
+class ModelRegistryTests(DiaryTestCase):
+    USE_MODELS_DIR = True
+
+    def setUp(self):
+        super().setUp()
+        self.registry = ModelRegistry()
+        self.path = os.path.join(self.models_dir, "base", "toshn.pkl")
+        os.makedirs(os.path.dirname(self.path))
+
+    def _dump(self, intercept, mtime_ns):
+        model = LinearRegression().fit([[0.0], [1.0]], [intercept, intercept + 1])
+        joblib.dump({"model": model, "features": ["ustalost"]}, self.path)
+        os.utime(self.path, ns=(mtime_ns, mtime_ns))
+
+    def test_loads_once_and_reloads_replaced_file(self):
+        self._dump(1.0, 10**18)
+        first = self.registry.get_models("base")["toshn"]
+        self.assertIs(self.registry.get_models("base")["toshn"], first)
+        self.assertEqual((self.registry.misses, self.registry.hits), (1, 1))
+
+        self._dump(2.0, 2 * 10**18)
+        reloaded = self.registry.get_models("base")["toshn"]
+        self.assertEqual(self.registry.reloads, 1)
+        self.assertAlmostEqual(reloaded["model"].intercept_, 2.0)
+
+        os.remove(self.path)
+        self.assertEqual(self.registry.get_models("base"), {})
+        self.assertEqual(self.registry.stats()["loaded"], 0)
+
+
+class PredictionEngineTests(TestCase):
+    def test_matches_sklearn_predict(self):
+        rng = np.random.default_rng(0)
+        keys = [f"p{i}" for i in range(6)]
+        models = {}
+        for target in keys:
+            features = [k for k in keys if k != target]
+            X = pd.DataFrame(rng.integers(0, 6, size=(40, len(features))).astype(float), columns=features)
+            model = LinearRegression().fit(X, rng.random(40) * 5)
+            # Часть моделей — без списка признаков, как старые .pkl
+            models[target] = {"model": model, "features": features if target != "p0" else None}
+
+        compiled = CompiledStrategy("base", models, registry_version=0)
+        self.assertEqual(compiled.fallback, {})
+        rows = [{k: float(v) for k, v in zip(keys, rng.integers(0, 6, size=6)) if v != 3} for _ in range(20)]
+
+        for row in rows:
+            predicted = compiled.predict_row(row)
+            for target, entry in models.items():
+                expected = predict_with_model(entry["model"], entry["features"], row)
+                self.assertAlmostEqual(predicted[target], expected, delta=1e-9)
+
+        matrix = compiled.predict_matrix(compiled.feature_matrix(pd.DataFrame(rows)))
+        expected = [[compiled.predict_row(row)[t] for t in compiled.targets] for row in rows]
+        np.testing.assert_allclose(matrix, expected, rtol=0, atol=1e-9)
+
+
+class MultiFitTests(TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(1)
+        self.keys = [f"p{i}" for i in range(8)]
+        values = rng.integers(0, 6, size=(120, len(self.keys))).astype(float)
+        values[rng.random(values.shape) < 0.05] = np.nan
+        self.df = pd.DataFrame(values, columns=self.keys, index=pd.Index(
+            pd.date_range("2025-01-01", periods=120).date, name="date"))
+
+    def test_matches_per_target_train_model(self):
+        df, keys = self.df, self.keys
+        shared = fit_all_targets(df, keys)
+        for target in keys:
+            expected = base_model.train_model(df.copy(), target=target)
+            self.assertEqual(shared[target]["features"], expected["features"])
+            np.testing.assert_allclose(shared[target]["model"].coef_, expected["model"].coef_, atol=1e-9)
+            self.assertAlmostEqual(shared[target]["model"].intercept_, expected["model"].intercept_, delta=1e-9)
+
+    def test_ill_conditioned_design_matches_sklearn(self):
+        # c ≈ a + b: cond(C) ≈ 10⁹ — и общее обучение, и дообучение должны совпасть с LinearRegression
+        rng = np.random.default_rng(2)
+        a, b = rng.normal(size=200), rng.normal(size=200)
+        df = pd.DataFrame({"a": a, "b": b, "c": a + b + 1e-4 * rng.normal(size=200), "d": rng.normal(size=200)})
+        keys = list(df.columns)
+        shared = fit_all_targets(df, keys)
+        online = GramStatistics.from_rows(keys, [str(i) for i in range(len(df))], df.to_numpy()).solve()
+        for target in keys:
+            expected = LinearRegression().fit(df.drop(columns=target), df[target])
+            for result in (shared[target], online[target]):
+                np.testing.assert_allclose(result["model"].coef_, expected.coef_, atol=1e-10)
+                self.assertAlmostEqual(result["model"].intercept_, expected.intercept_, delta=1e-10)
+
+    def test_parallel_matches_sequential(self):
+        df = self.df.reset_index()
+        jobs = [(strategy, target) for strategy in ("base", "flags") for target in self.keys[:3]]
+        fitted = train_parallel(df, jobs, workers=2)
+        self.assertEqual(list(fitted), jobs)
+        for (strategy, target), result in fitted.items():
+            expected = base_model.train_model(df.copy(), target=target)
+            self.assertEqual(result["features"], expected["features"])
+            np.testing.assert_allclose(result["model"].coef_, expected["model"].coef_, atol=1e-12)
+
+
+class TrainingJobTests(DiaryTestCase):
+    USE_MODELS_DIR = True
+
+    def setUp(self):
+        super().setUp()
+        self.fill_diary([f"p{i}" for i in range(3)], 30, date(2025, 1, 1), seed=2)
+
+    def test_run_job_records_progress(self):
+        job = TrainingJob.objects.create(strategies=["base"], status=TrainingJob.STATUS_RUNNING)
+        job = run_job(job)
+        job.refresh_from_db()
+        self.assertEqual(job.status, TrainingJob.STATUS_OK)
+        self.assertEqual((job.done, job.total), (3, 3))
+        self.assertEqual(sorted(job.timings), ["base:p0", "base:p1", "base:p2"])
+        self.assertEqual(len(job.details), 3)
+
+
+class OnlineTrainingTests(DiaryTestCase):
+    USE_MODELS_DIR = True
+
+    def setUp(self):
+        super().setUp()
+        self.keys = [f"p{i}" for i in range(4)]
+        self.params, self.entries = self.fill_diary(self.keys, 40, date(2025, 3, 1), seed=3)
+        PredictorManager("base").train(load_training_frame(), mode="shared")
+        # Фоновый поток не запускаем — применяем изменения явно через flush()
+        patcher = mock.patch.object(online_trainer, "_wake")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def assert_models_match_full_refit(self):
+        expected = fit_all_targets(load_training_frame(), self.keys)
+        for key in self.keys:
+            model = model_registry.get("base", key)["model"]
+            np.testing.assert_allclose(model.coef_, expected[key]["model"].coef_, atol=1e-9)
+            self.assertAlmostEqual(model.intercept_, expected[key]["model"].intercept_, delta=1e-9)
+
+    def test_edit_and_delete_update_models_without_retrain(self):
+        path = model_registry.model_path("base", self.keys[1])
+        before = os.stat(path).st_mtime_ns
+        with self.captureOnCommitCallbacks(execute=True):
+            value = EntryValue.objects.get(entry=self.entries[5], parameter=self.params[0])
+            value.value = 5.0
+            value.save()
+        # В запросе файлы не пишутся — только в фоновом окне
+        self.assertEqual(os.stat(path).st_mtime_ns, before)
+        self.assertTrue(online_trainer.flush())
+        self.assert_models_match_full_refit()
+        # Поколение не сменилось, прогнозы изменённого дня пересчитаны новыми моделями
+        day = self.entries[5].date
+        version = model_registry.generation("base")
+        self.assertEqual(PredictionRecord.objects.filter(model_version=version).count(), 41 * 4)
+        self.assertEqual(PredictionRecord.objects.exclude(model_version=version).count(), 0)
+        expected = PredictorManager("base").predict_dates([day]).iloc[0].to_dict()
+        self.assertEqual(prediction_store.lookup("base", day, version), expected)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            EntryValue.objects.filter(entry=self.entries[7], parameter=self.params[2]).delete()
+        online_trainer.flush()
+        self.assert_models_match_full_refit()
+        self.assertEqual(GramStatistics.load(online_trainer.stats_path("base")).n, 39)
+
+
+class ExportSchedulerTests(TestCase):
+    def test_burst_of_changes_is_exported_once(self):
+        calls = []
+        scheduler = ExportScheduler(export=calls.append, interval=0.05, path="export.csv")
+        with self.captureOnCommitCallbacks(execute=True):
+            with scheduler.suppress():
+                for _ in range(100):
+                    scheduler.mark_dirty()
+            self.assertEqual(calls, [])
+        self.assertTrue(scheduler.wait(timeout=5))
+        self.assertEqual(calls, ["export.csv"])
+        self.assertEqual((scheduler.requests, scheduler.flushes), (100, 1))
+
+    @override_settings(DIARY_EXPORT_INCREMENTAL=True)
+    def test_failed_export_keeps_changes(self):
+        calls = []
+
+        def update(path, days, check):
+            calls.append((set(days), check))
+            if len(calls) == 1:
+                raise OSError("disk full")
+
+        scheduler = ExportScheduler(update=update, interval=0, path="export.csv")
+        with scheduler.suppress():
+            scheduler.mark_dirty(date(2025, 5, 1))
+        with self.assertLogs("db", "ERROR"):
+            self.assertFalse(scheduler.flush())
+        scheduler.mark_dirty(date(2025, 5, 2), check=True)
+        self.assertTrue(scheduler.flush())
+        self.assertEqual(calls[-1], ({date(2025, 5, 1), date(2025, 5, 2)}, True))
+        self.assertFalse(scheduler.flush())
+
+
+class DiaryExportTests(DiaryTestCase):
+    def test_streaming_csv_keeps_export_format(self):
+        nausea = Parameter.objects.create(key="toshn", name="Тошнота", description="утром")
+        mood = Parameter.objects.create(key="mood", name="Настроение")
+        first = Entry.objects.create(date=date(2025, 5, 10))
+        Entry.objects.create(date=date(2025, 5, 11))
+        third = Entry.objects.create(date=date(2025, 5, 12))
+        EntryValue.objects.create(entry=first, parameter=nausea, value=2.0)
+        EntryValue.objects.create(entry=first, parameter=mood, value=4.7)
+        EntryValue.objects.create(entry=third, parameter=mood, value=1.0)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "export.csv")
+            self.assertEqual(export_diary(path), 3)
+            with open(path, encoding="utf-8-sig") as f:
+                lines = f.read().splitlines()
+            with open(os.path.join(tmp, "export_descriptions.csv"), encoding="utf-8-sig") as f:
+                descriptions = f.read().splitlines()
+
+        self.assertEqual(lines, ["Дата,Настроение,Тошнота", "12.05.25,1,", "11.05.25,,", "10.05.25,4,2"])
+        self.assertEqual(descriptions, ["Ключ,Название,Описание", "mood,Настроение,", "toshn,Тошнота,утром"])
+
+    def test_incremental_update_matches_full_export(self):
+        rng = np.random.default_rng(4)
+        params = [Parameter.objects.create(key=f"p{i}", name=f"P{i}") for i in range(5)]
+        entries = {}
+        for day in range(0, 60, 2):
+            entries[day] = Entry.objects.create(date=date(2025, 1, 1) + timedelta(days=day))
+            for param in params:
+                if rng.random() < 0.6:
+                    EntryValue.objects.create(entry=entries[day], parameter=param, value=float(rng.integers(0, 12)))
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "export.csv")
+            expected_path = os.path.join(tmp, "expected.csv")
+            export_diary(path)
+
+            changed = set()
+            for day in (0, 10, 58):
+                # та же ширина, другая ширина, вставка и удаление значений
+                for param in params:
+                    EntryValue.objects.update_or_create(entry=entries[day], parameter=param,
+                                                        defaults={"value": float(rng.integers(0, 12))})
+                changed.add(entries[day].date)
+            EntryValue.objects.filter(entry=entries[20]).delete()
+            changed.add(entries[20].date)
+            for day in (-3, 31, 61):  # новые даты: в конце, в середине и в начале файла
+                entry = Entry.objects.create(date=date(2025, 1, 1) + timedelta(days=day))
+                EntryValue.objects.create(entry=entry, parameter=params[0], value=3.0)
+                changed.add(entry.date)
+            changed.add(entries[40].date)
+            entries[40].delete()
+
+            inode = os.stat(path).st_ino
+            result = update_export(path, changed)
+            self.assertEqual(result["mode"], "incremental")
+            # Хвост сдвинулся — файл подменён целиком (os.replace), а не переписан на месте
+            self.assertNotEqual(os.stat(path).st_ino, inode)
+            export_diary(expected_path)
+            with open(path, "rb") as f, open(expected_path, "rb") as g:
+                self.assertEqual(f.read(), g.read())
+
+            # Смещения после пересборки верны: правка верхней строки той же ширины — на месте
+            top = Entry.objects.get(date=date(2025, 1, 1) + timedelta(days=61))
+            EntryValue.objects.filter(entry=top).update(value=7.0)
+            inode = os.stat(path).st_ino
+            self.assertEqual(update_export(path, [top.date])["in_place"], 1)
+            self.assertEqual(os.stat(path).st_ino, inode)
+            export_diary(expected_path)
+            with open(path, "rb") as f, open(expected_path, "rb") as g:
+                self.assertEqual(f.read(), g.read())
+
+            # Новый параметр меняет столбцы — полный экспорт
+            Parameter.objects.create(key="new", name="Новый")
+            self.assertEqual(update_export(path, check=True)["mode"], "full")
+
+
+class ExcelImportTests(DiaryTestCase):
+    EXPORT_PATCHES = ("diary_analytic.importers.excel_entry_importer.export_scheduler",)
+
+    def test_vectorized_import_upserts_values(self):
+        mood = Parameter.objects.create(key="mood", name="Настроение")
+        entry = Entry.objects.create(date=date(2025, 5, 10))
+        EntryValue.objects.create(entry=entry, parameter=mood, value=1.0)
+
+        df = pd.DataFrame({
+            "Дата": ["10.05.25", "2025-05-11", "не дата", "11.05.25"],
+            "Настроение": [4.0, 2.0, 9.0, 3.0],
+            " Сон ": [None, 7.5, 1.0, "x"],
+        })
+        notes = []
+        created, updated = import_excel_dataframe(df, message_callback=notes.append)
+
+        # 10.05: обновлено настроение; 11.05 (повтор даты — побеждает последняя строка): настроение и сон
+        self.assertEqual((created, updated), (2, 1))
+        values = {
+            (d, key): v for d, key, v in EntryValue.objects.values_list("entry__date", "parameter__key", "value")
+        }
+        sleep = Parameter.objects.get(name="Сон").key
+        self.assertEqual(values, {
+            (date(2025, 5, 10), "mood"): 4.0,
+            (date(2025, 5, 11), "mood"): 3.0,
+            (date(2025, 5, 11), sleep): 7.5,
+        })
+        self.assertTrue(any("не дата" in note for note in notes))
+
+
+class StreamImportTests(DiaryTestCase):
+    EXPORT_PATCHES = ("diary_analytic.importers.stream_importer.export_scheduler",)
+
+    def setUp(self):
+        super().setUp()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.rows = [(f"{day:02d}.05.25", str(day), "" if day % 2 else "1.5") for day in range(1, 8)]
+
+    def test_csv_import_resumes_from_checkpoint(self):
+        path = os.path.join(self.tmp.name, "dump.csv")
+        with open(path, "w", encoding="utf-8-sig") as f:
+            f.write("Дата,Настроение,Сон\n" + "".join(",".join(row) + "\n" for row in self.rows[:2]))
+            # Пустая строка не считается записью — продолжение не должно сбиться
+            f.write("\n" + "".join(",".join(row) + "\n" for row in self.rows[2:]))
+        checkpoint = stream_importer.checkpoint_path(path)
+
+        calls = []
+
+        def failing(chunk, callback=None, entry_ids=None):
+            calls.append(len(chunk))
+            if len(calls) == 3:
+                raise RuntimeError("обрыв")
+            return import_rows(chunk, callback, entry_ids=entry_ids)
+
+        with mock.patch.object(stream_importer, "import_rows", failing):
+            with self.assertRaises(RuntimeError):
+                stream_importer.import_diary_file(path, chunk_rows=3, checkpoint=checkpoint)
+        with open(checkpoint, encoding="utf-8") as f:
+            self.assertEqual(json.load(f)["rows"], 6)
+        self.assertEqual(EntryValue.objects.count(), 6 + 3)
+
+        result = stream_importer.import_diary_file(path, chunk_rows=3, checkpoint=checkpoint)
+        self.assertEqual(result["resumed_from"], 6)
+        self.assertEqual((result["rows"], result["chunks"], result["created"]), (7, 1, 7 + 3))
+        self.assertFalse(os.path.exists(checkpoint))
+        self.assertEqual(
+            EntryValue.objects.get(entry__date=date(2025, 5, 7), parameter__name="Настроение").value, 7.0
+        )
+
+    def test_xlsx_read_only_chunks(self):
+        from openpyxl import Workbook
+
+        path = os.path.join(self.tmp.name, "dump.xlsx")
+        workbook = Workbook()
+        sheet = workbook.active
+        sheet.append(["Дата", "Настроение", "Сон"])
+        for day, mood, sleep in self.rows:
+            sheet.append([date(2025, 5, int(day[:2])), float(mood), float(sleep) if sleep else None])
+        sheet.append([None, None, None])
+        workbook.save(path)
+
+        result = stream_importer.import_diary_file(path, chunk_rows=4)
+        self.assertEqual((result["rows"], result["chunks"], result["created"]), (7, 2, 10))
+        self.assertEqual(Entry.objects.count(), 7)
+
+
+class BulkValuesTests(DiaryTestCase):
+    EXPORT_PATCHES = ("diary_analytic.signals.export_scheduler", "diary_analytic.bulk_values.export_scheduler")
+
+    def setUp(self):
+        super().setUp()
+        diary_cache.invalidate()
+        self.addCleanup(diary_cache.invalidate)
+
+    def post(self, changes):
+        return self.client.post("/api/update_values/", data=json.dumps({"changes": changes}),
+                                content_type="application/json")
+
+    def test_batch_upserts_deletes_and_patches_cache(self):
+        mood = Parameter.objects.create(key="mood", name="Настроение")
+        Parameter.objects.create(key="sleep", name="Сон")
+        entry = Entry.objects.create(date=date(2025, 5, 10))
+        EntryValue.objects.create(entry=entry, parameter=mood, value=1.0)
+        diary_cache.get_dataframe()
+        builds = diary_cache.builds
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.post([
+                {"date": "2025-05-10", "parameter": "mood", "value": 2},
+                {"date": "2025-05-10", "parameter": "mood", "value": 4},   # последний клик побеждает
+                {"date": "2025-05-11", "parameter": "sleep", "value": 7},
+                {"date": "2025-05-11", "parameter": "mood", "value": 3},
+                {"date": "2025-05-11", "parameter": "mood", "value": None},
+            ])
+        self.assertEqual(response.json(), {"success": True, "updated": 2, "deleted": 0, "days": 2})
+        self.assertEqual(
+            sorted(EntryValue.objects.values_list("entry__date", "parameter__key", "value")),
+            [(date(2025, 5, 10), "mood", 4.0), (date(2025, 5, 11), "sleep", 7.0)],
+        )
+        patched = diary_cache.get_dataframe()
+        self.assertEqual(diary_cache.builds, builds)
+        diary_cache.invalidate()
+        pd.testing.assert_frame_equal(patched, diary_cache.get_dataframe())
+
+        # Неизвестный параметр — 400 и ничего не записано
+        response = self.post([
+            {"date": "2025-05-12", "parameter": "mood", "value": 1},
+            {"date": "2025-05-12", "parameter": "nope", "value": 1},
+        ])
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Entry.objects.filter(date=date(2025, 5, 12)).exists())
+
+
+class SqliteTuningTests(TestCase):
+    def test_pragmas_applied_and_invalid_skipped(self):
+        from django.db import connection
+
+        # synchronous / journal_mode внутри транзакции TestCase не меняются — проверяем на остальных
+        applied = apply_sqlite_pragmas(connection, {"cache_size": -4096, "temp_store": "MEMORY", "x; DROP": 1})
+        self.assertEqual(applied, {"cache_size": -4096, "temp_store": 2})
+
+
+class QueryPlanTests(DiaryTestCase):
+    """
+    Горячие запросы представлений не должны читать EntryValue / Entry целиком
+    (полное построение широкой таблицы — сознательное исключение, оно выполняется заранее).
+    """
+
+    SCANNED_TABLES = ("diary_analytic_entryvalue", "diary_analytic_entry")
+    # Маленькие справочники читать целиком можно (подзапросы видны под псевдонимами U0, U1 — их нельзя)
+    SCAN_ALLOWED = ("diary_analytic_parameter", "CONSTANT")
+    EXPORT_PATCHES = BulkValuesTests.EXPORT_PATCHES
+    USE_MODELS_DIR = True
+
+    def setUp(self):
+        super().setUp()
+        params = [Parameter.objects.create(key=f"p{i}", name=f"P{i}") for i in range(3)]
+        for day in range(5):
+            entry = Entry.objects.create(date=date(2025, 5, 1) + timedelta(days=day))
+            for param in params:
+                EntryValue.objects.create(entry=entry, parameter=param, value=float(day))
+        diary_cache.invalidate()
+        diary_cache.get_dataframe()
+        model_registry.invalidate()
+        prediction_cache.clear()
+
+    def assertNoFullScans(self, queries):
+        from django.db import connection
+
+        for query in queries:
+            sql = query["sql"]
+            if not sql.startswith("SELECT") or not any(table in sql for table in self.SCANNED_TABLES):
+                continue
+            with connection.cursor() as cursor:
+                cursor.execute(f"EXPLAIN QUERY PLAN {sql}")
+                plan = [row[3] for row in cursor.fetchall()]
+            scans = [step for step in plan if step.startswith("SCAN ") and step.split()[1] not in self.SCAN_ALLOWED]
+            self.assertEqual(scans, [], f"Полный проход по таблице:\n{sql}\n{plan}")
+
+    def test_hot_views_use_indexes(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        requests = [
+            lambda: self.client.get("/add/?date=2025-05-03"),
+            lambda: self.client.get("/get_predictions/?date=2025-05-03"),
+            lambda: self.client.get("/api/parameter_history/?param=p1&date=2025-05-04"),
+            lambda: self.client.post("/update_value/", content_type="application/json",
+                                     data=json.dumps({"parameter": "p0", "value": 3, "date": "2025-05-03"})),
+            lambda: self.client.post("/api/update_values/", content_type="application/json",
+                                     data=json.dumps({"changes": [{"parameter": "p2", "value": None, "date": "2025-05-02"}]})),
+        ]
+        for request in requests:
+            with CaptureQueriesContext(connection) as ctx:
+                self.assertEqual(request().status_code, 200)
+            self.assertNoFullScans(ctx.captured_queries)
+
+
+@override_settings(DIARY_ONLINE_UPDATES=False)
+class PredictionCacheTests(DiaryTestCase):
+    USE_MODELS_DIR = True
+
+    def setUp(self):
+        super().setUp()
+        self.fill_diary([f"p{i}" for i in range(3)], 20, date(2025, 6, 1), seed=5)
+        PredictorManager("base").train(load_training_frame(), mode="shared")
+        model_registry.invalidate()
+        prediction_cache.clear()
+
+    def test_hits_until_day_or_models_change(self):
+        manager = PredictorManager("base")
+        edited, other = date(2025, 6, 10), date(2025, 6, 15)
+        first = self.client.get("/get_predictions/?date=2025-06-10").json()
+        other_before = manager.predict_for_date(other)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get("/get_predictions/?date=2025-06-10").json(), first)
+            self.assertEqual(manager.predict_for_date(other), other_before)
+
+        # Правка дня сбрасывает прогнозы только этого дня
+        with self.captureOnCommitCallbacks(execute=True):
+            value = EntryValue.objects.get(entry__date=edited, parameter__key="p0")
+            value.value += 10
+            value.save()
+        with self.assertNumQueries(0):
+            self.assertEqual(manager.predict_for_date(other), other_before)
+        self.assertNotEqual(self.client.get("/get_predictions/?date=2025-06-10").json(), first)
+
+        # Новые модели — пересчёт всех дат
+        misses = prediction_cache.misses
+        model_registry.invalidate("base")
+        manager.predict_for_date(other)
+        self.assertEqual(prediction_cache.misses, misses + 1)
+
+    def test_training_materializes_predictions(self):
+        manager = PredictorManager("base")
+        tomorrow = date.today() + timedelta(days=1)
+        # 20 дней с записями и завтра × 3 targets
+        self.assertEqual(PredictionRecord.objects.filter(strategy="base").count(), 21 * 3)
+        self.assertEqual(PredictionRecord.objects.filter(date=tomorrow).count(), 3)
+
+        day = date(2025, 6, 12)
+        compiled = CompiledStrategy("base", model_registry.get_models("base"), 0)
+        expected = {key: round(value, 2) for key, value in compiled.predict_row(get_today_row(day)).items()}
+        with self.assertNumQueries(1):  # только поиск по индексу (date, strategy), без строки признаков
+            self.assertEqual(manager.predict_for_date(day), expected)
+
+        # Правка дня удаляет его прогнозы после коммита (не в транзакции правки);
+        # следующий запрос считает и записывает их заново
+        with self.captureOnCommitCallbacks() as callbacks:
+            value = EntryValue.objects.get(entry__date=day, parameter__key="p1")
+            value.value += 10
+            value.save()
+        self.assertEqual(PredictionRecord.objects.filter(date=day).count(), 3)
+        for callback in callbacks:
+            callback()
+        self.assertFalse(PredictionRecord.objects.filter(date=day).exists())
+        self.assertEqual(PredictionRecord.objects.count(), 20 * 3)
+        manager.predict_for_date(day)
+        self.assertEqual(PredictionRecord.objects.filter(date=day).count(), 3)
+
+        # Прогноз, посчитанный до чужой правки, не записывается
+        PredictionRecord.objects.filter(date=day).delete()
+        stale = data_stamp.current()
+        data_stamp.bump()
+        prediction_store.save_day("base", day, model_registry.generation("base"), expected, stamp=stale)
+        self.assertFalse(PredictionRecord.objects.filter(date=day).exists())
+
+
+class PredictionRangeTests(DiaryTestCase):
+    USE_MODELS_DIR = True
+
+    def setUp(self):
+        super().setUp()
+        self.fill_diary([f"p{i}" for i in range(3)], 30, date(2025, 6, 1), seed=6)
+        PredictorManager("base").train(load_training_frame(), mode="shared")
+        model_registry.invalidate()
+
+    def get_range(self, start, end):
+        return self.client.get("/get_predictions_range/", {"start": start, "end": end, "strategies": "base"})
+
+    def test_grid_matches_row_predictions(self):
+        # Диапазон выходит за записи с обеих сторон: там прогноз по пустой строке
+        grid = PredictorManager("base").predict_range(date(2025, 5, 30), date(2025, 7, 2))
+        self.assertEqual((len(grid), list(grid.columns)), (34, ["p0", "p1", "p2"]))
+        compiled = CompiledStrategy("base", model_registry.get_models("base"), 0)
+        for day in (date(2025, 5, 30), date(2025, 6, 1), date(2025, 6, 17), date(2025, 7, 2)):
+            expected = {key: round(value, 2) for key, value in compiled.predict_row(get_today_row(day)).items()}
+            self.assertEqual(grid.loc[day].to_dict(), expected)
+
+    def test_endpoint_streams_chunks_and_limits_range(self):
+        expected = PredictorManager("base").predict_range(date(2025, 6, 1), date(2025, 6, 30))
+        with mock.patch("diary_analytic.views.PREDICTION_RANGE_CHUNK_ROWS", 7), \
+                mock.patch("diary_analytic.views.PREDICTION_RANGE_STREAM_DAYS", 10):
+            response = self.get_range("2025-06-01", "2025-06-30")
+            self.assertTrue(response.streaming)
+            data = json.loads(b"".join(response.streaming_content))
+        self.assertEqual(len(data["dates"]), 30)
+        self.assertEqual(data["strategies"]["base"]["targets"], ["p0", "p1", "p2"])
+        self.assertEqual(data["strategies"]["base"]["values"], expected.values.tolist())
+
+        short = self.get_range("2025-06-01", "2025-06-03")
+        self.assertFalse(short.streaming)
+        self.assertEqual(short.json()["strategies"]["base"]["values"], expected.values[:3].tolist())
+
+        self.assertEqual(self.get_range("2000-01-01", "2025-06-30").status_code, 400)
+        self.assertEqual(self.get_range("2025-06-30", "2025-06-01").status_code, 400)
+
+
+class HistoryDownsamplingTests(TestCase):
+    def test_lttb_keeps_ends_and_extremes(self):
+        x = np.arange(1000)
+        y = np.sin(x / 40.0)
+        y[517] = 9.0
+        indices = lttb_indices(x, y, 50)
+        self.assertEqual(len(indices), 50)
+        self.assertEqual((indices[0], indices[-1]), (0, 999))
+        self.assertTrue(np.all(np.diff(indices) > 0))
+        self.assertIn(517, indices)
+        np.testing.assert_array_equal(lttb_indices(x[:10], y[:10], 20), np.arange(10))
+        with self.assertRaises(ValueError):
+            lttb_indices(x, y, 2)
+
+    def test_bucket_aggregate_by_week_and_month(self):
+        # 2025-01-27 — понедельник; 2025-02-01 и 02 — та же неделя, но другой месяц
+        dates = ["2025-01-27", "2025-01-29", "2025-02-01", "2025-02-02", "2025-02-03"]
+        values = [1.0, 3.0, 5.0, 7.0, 2.0]
+        weekly = bucket_aggregate(dates, values, "week")
+        self.assertEqual([str(d) for d in weekly["dates"]], ["2025-01-27", "2025-02-03"])
+        self.assertEqual(weekly["values"].tolist(), [4.0, 2.0])
+        self.assertEqual((weekly["min"].tolist(), weekly["max"].tolist(), weekly["count"].tolist()),
+                         ([1.0, 2.0], [7.0, 2.0], [4, 1]))
+        monthly = bucket_aggregate(dates, values, "month")
+        self.assertEqual([str(d) for d in monthly["dates"]], ["2025-01-01", "2025-02-01"])
+        self.assertEqual((monthly["values"].tolist(), monthly["count"].tolist()), ([2.0, 14.0 / 3], [2, 3]))
+        self.assertEqual(len(bucket_aggregate([], [], "week")["dates"]), 0)
+        with self.assertRaises(ValueError):
+            bucket_aggregate(dates, values, "day")
+
+
+class ParameterHistoryTests(DiaryTestCase):
+    def setUp(self):
+        super().setUp()
+        mood = Parameter.objects.create(key="mood", name="Настроение")
+        other = Parameter.objects.create(key="other", name="Другое")
+        for day in range(1, 11):
+            entry = Entry.objects.create(date=date(2025, 5, day))
+            EntryValue.objects.create(entry=entry, parameter=other, value=0.0)
+            if day != 4:
+                EntryValue.objects.create(entry=entry, parameter=mood, value=float(day))
+        diary_cache.invalidate()
+
+    def history(self, **params):
+        response = self.client.get("/api/parameter_history/", {"param": "mood", **params})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_range_limit_and_thinning(self):
+        data = self.history(date="2025-05-08")
+        self.assertEqual(data["dates"], [f"2025-05-0{d}" for d in (1, 2, 3, 5, 6, 7, 8)])
+        self.assertEqual(data["values"], [1.0, 2.0, 3.0, 5.0, 6.0, 7.0, 8.0])
+
+        self.assertEqual(self.history(date="2025-05-08", **{"from": "2025-05-05"})["values"], [5.0, 6.0, 7.0, 8.0])
+        self.assertEqual(self.history(date="2025-05-10", limit=3)["values"], [8.0, 9.0, 10.0])
+        thinned = self.history(date="2025-05-10", every=3)
+        self.assertEqual((thinned["values"], thinned["total"]), ([3.0, 7.0, 10.0], 9))
+        self.assertEqual(self.client.get("/api/parameter_history/", {"param": "mood", "date": "2025-05-10",
+                                                                     "every": "0"}).status_code, 400)
+
+    def test_downsampling_and_cache(self):
+        weekly = self.history(date="2025-05-10", resolution="week")
+        # 2025-05-05 — понедельник: 1–3 мая и 5–10 мая (4-го значения нет)
+        self.assertEqual(weekly["dates"], ["2025-04-28", "2025-05-05"])
+        self.assertEqual((weekly["min"], weekly["max"], weekly["count"]), ([1.0, 5.0], [3.0, 10.0], [3, 6]))
+        self.assertEqual(weekly["values"], [2.0, 7.5])
+
+        spike = Parameter.objects.create(key="spike", name="Пик")
+        days = np.arange(200)
+        for offset in days:
+            entry, _ = Entry.objects.get_or_create(date=date(2025, 6, 1) + timedelta(days=int(offset)))
+            EntryValue.objects.create(entry=entry, parameter=spike, value=5.0 if offset == 123 else 1.0)
+        diary_cache.invalidate()
+        params = {"param": "spike", "date": "2026-01-01", "points": 20}
+        data = self.client.get("/api/parameter_history/", params).json()
+        self.assertEqual((len(data["dates"]), data["total"]), (20, 200))
+        self.assertIn("2025-10-02", data["dates"])  # пик не потерян
+        self.assertEqual(max(data["values"]), 5.0)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get("/api/parameter_history/", params).json(), data)
+        diary_cache.invalidate()  # новая версия данных — кэш не используется
+        with self.assertNumQueries(1):
+            self.client.get("/api/parameter_history/", params)
+        data_stamp.bump()  # данные изменил другой процесс
+        with self.assertNumQueries(1):
+            self.client.get("/api/parameter_history/", params)
+
+
+class QueuedLoggingTests(TestCase):
+    def test_records_reach_own_handlers_in_background(self):
+        streams = {}
+        for name in ("diary_test_a", "diary_test_b"):
+            logger = logging.getLogger(name)
+            logger.propagate = False
+            logger.setLevel(logging.INFO)
+            streams[name] = io.StringIO()
+            handler = logging.StreamHandler(streams[name])
+            handler.setFormatter(logging.Formatter("[%(name)s] %(message)s"))
+            logger.addHandler(handler)
+            enqueue_handlers(logger)
+            self.assertEqual([type(h).__name__ for h in logger.handlers], ["_RoutedQueueHandler"])
+
+        logging.getLogger("diary_test_a").info("раз %s", 1)
+        logging.getLogger("diary_test_a").debug("не пишется: %s", 2)
+        logging.getLogger("diary_test_b").warning("два")
+        flush_log_queue()
+        self.assertEqual(streams["diary_test_a"].getvalue(), "[diary_test_a] раз 1\n")
+        self.assertEqual(streams["diary_test_b"].getvalue(), "[diary_test_b] два\n")
+
+
+class RequestMetricsTests(DiaryTestCase):
+    def setUp(self):
+        super().setUp()
+        mood = Parameter.objects.create(key="mood", name="Настроение")
+        entry = Entry.objects.create(date=date(2025, 5, 1))
+        EntryValue.objects.create(entry=entry, parameter=mood, value=3.0)
+        diary_cache.invalidate()
+        request_metrics.reset()
+
+    def test_server_timing_and_percentiles(self):
+        timings = [
+            self.client.get("/api/parameter_history/", {"param": "mood", "date": "2025-05-01"})["Server-Timing"]
+            for _ in range(3)
+        ]
+        self.assertRegex(timings[0], r'^db;dur=[\d.]+;desc="1 queries", total;dur=[\d.]+$')
+        self.assertRegex(timings[-1], r'^db;dur=0.0;desc="0 queries"')
+
+        with span("outside"):  # вне запроса — ничего не пишет
+            pass
+        views = self.client.get("/api/metrics/").json()["views"]
+        history = views["parameter_history"]
+        self.assertEqual(history["count"], 3)
+        # Первый запрос сходил в БД, два следующих — из кэша истории
+        self.assertEqual((history["queries"]["p50"], history["queries"]["p99"] > 0), (0.0, True))
+        self.assertEqual(set(history["total_ms"]), {"p50", "p90", "p99"})
+        self.assertNotIn("metrics", views)
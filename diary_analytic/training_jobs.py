@@ -0,0 +1,196 @@
+# diary_analytic/training_jobs.py
+
+"""
+🔁 training_jobs.py — фоновое переобучение моделей
+
+Назначение:
+    - POST /retrain_models_all/ только ставит задание в очередь (таблица TrainingJob)
+      и сразу возвращает его id;
+    - фоновый поток-воркер забирает задания из таблицы и обучает стратегии;
+    - прогресс пишется в TrainingJob по каждому target: done/total,
+      текущий target и время обучения каждого target;
+    - GET /retrain_status/?job=<id> отдаёт этот прогресс (diary.js опрашивает его).
+
+Задания хранятся в БД, поэтому переживают перезапуск: при первом пробуждении
+воркер подбирает оставшиеся в очереди, а задания в running, чей процесс
+уже не существует, помечает ошибкой.
+Забор задания атомарный (UPDATE ... WHERE status='queued'), так что несколько
+процессов gunicorn не возьмут одно и то же задание.
+"""
+
+import os
+import socket
+import threading
+import traceback
+from datetime import datetime
+
+from django.db import close_old_connections, connection, transaction
+from django.utils import timezone
+
+from .loggers import predict_logger
+from .models import TrainingJob
+
+DEFAULT_STRATEGIES = ["base", "flags"]
+
+
+
+# --------------------------------------------------------------------
+# 📊 Данные для обучения
+# --------------------------------------------------------------------
+
+def load_training_frame():
+    """
+    Широкая таблица для обучения: все даты строго до сегодняшней (сегодня ещё заполняется).
+    """
+    from .utils import get_diary_dataframe
+
+    df = get_diary_dataframe().reset_index()
+    if "date" in df.columns:
+        df = df[df["date"] < datetime.now().date()]
+    return df
+
+
+# --------------------------------------------------------------------
+# 📈 Прогресс задания
+# --------------------------------------------------------------------
+
+class JobProgress:
+    """
+    Передаётся в PredictorManager.train(progress=...) и пишет ход обучения в TrainingJob.
+    """
+
+    def __init__(self, job: TrainingJob):
+        self.job = job
+
+    def start(self, strategy: str, target: str):
+        self.job.current_target = f"{strategy}:{target}"
+        self.job.save(update_fields=["current_target"])
+
+    def finish(self, strategy: str, target: str, seconds: float, message: str):
+        self.job.done += 1
+        self.job.timings[f"{strategy}:{target}"] = round(seconds, 4)
+        self.job.details.append(message)
+        self.job.save(update_fields=["done", "timings", "details"])
+
+
+# --------------------------------------------------------------------
+# ▶️ Выполнение одного задания
+# --------------------------------------------------------------------
+
+def run_job(job: TrainingJob) -> TrainingJob:
+    """
+    Обучает все стратегии задания и записывает итог (status ok/error).
+    """
+    from .predictor_manager import train_strategies, training_targets
+
+    try:
+        df = load_training_frame()
+        job.total = len(training_targets(df)) * len(job.strategies)
+        job.save(update_fields=["total"])
+        predict_logger.info(f"[training_jobs] ▶️ Задание #{job.pk}: {job.strategies}, всего targets: {job.total}")
+
+        train_strategies(df, job.strategies, progress=JobProgress(job))
+
+        job.status = TrainingJob.STATUS_ERROR if any("❌" in msg for msg in job.details) else TrainingJob.STATUS_OK
+    except Exception as e:
+        predict_logger.exception(f"[training_jobs] ❌ Задание #{job.pk} упало: {e}")
+        job.status = TrainingJob.STATUS_ERROR
+        job.error = traceback.format_exc()
+
+    job.current_target = ""
+    job.finished_at = timezone.now()
+    job.save(update_fields=["status", "error", "current_target", "finished_at"])
+    predict_logger.info(f"[training_jobs] ⏹️ Задание #{job.pk}: {job.status}, {job.done}/{job.total}")
+    return job
+
+
+def claim_next_job():
+    """
+    Атомарно переводит самое старое задание из очереди в running и возвращает его (или None).
+    """
+    for job_id in TrainingJob.objects.filter(status=TrainingJob.STATUS_QUEUED).order_by("pk").values_list("pk", flat=True):
+        claimed = TrainingJob.objects.filter(pk=job_id, status=TrainingJob.STATUS_QUEUED).update(
+            status=TrainingJob.STATUS_RUNNING, started_at=timezone.now(), worker=f"{socket.gethostname()}:{os.getpid()}",
+        )
+        if claimed:
+            return TrainingJob.objects.get(pk=job_id)
+    return None
+
+
+# --------------------------------------------------------------------
+# 🧵 Фоновый воркер
+# --------------------------------------------------------------------
+
+class TrainingWorker:
+    """
+    Один фоновый поток на процесс: выполняет задания из очереди по одному
+    и завершается, когда очередь пуста (следующий enqueue запустит его снова).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._thread = None
+        self._recovered = False
+
+    def wake(self):
+        with self._lock:
+            if not self._recovered:
+                self._recover_interrupted()
+                self._recovered = True
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._loop, name="diary-training-worker", daemon=True)
+                self._thread.start()
+
+    def _loop(self):
+        try:
+            while True:
+                close_old_connections()
+                job = claim_next_job()
+                if job is None:
+                    return
+                run_job(job)
+        except Exception as e:
+            predict_logger.exception(f"[training_jobs] 🔥 Воркер остановился: {e}")
+        finally:
+            connection.close()
+
+    @staticmethod
+    def _recover_interrupted():
+        """
+        Задания в running, чей процесс на этой машине уже не существует, никто не доделает —
+        помечаем их ошибкой. Задания живых процессов не трогаем.
+        """
+        host = socket.gethostname()
+        for job in TrainingJob.objects.filter(status=TrainingJob.STATUS_RUNNING, worker__startswith=f"{host}:"):
+            if _process_alive(int(job.worker.rsplit(":", 1)[1])):
+                continue
+            job.status = TrainingJob.STATUS_ERROR
+            job.error = "Прервано перезапуском сервера"
+            job.finished_at = timezone.now()
+            job.save(update_fields=["status", "error", "finished_at"])
+            predict_logger.warning(f"[training_jobs] ⚠️ Задание #{job.pk} помечено прерванным ({job.worker})")
+
+
+def _process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+# Единственный воркер на процесс
+training_worker = TrainingWorker()
+
+
+def enqueue_retrain(strategies: list[str] | None = None) -> TrainingJob:
+    """
+    Ставит переобучение в очередь и будит фоновый воркер.
+    """
+    job = TrainingJob.objects.create(strategies=list(strategies or DEFAULT_STRATEGIES))
+    predict_logger.info(f"[training_jobs] 📥 Задание #{job.pk} поставлено в очередь: {job.strategies}")
+    # Воркер читает задание своим соединением — будим его только после коммита
+    transaction.on_commit(training_worker.wake)
+    return job
@@ -32,6 +32,14 @@ urlpatterns = [
     # -----------------------------------------------------------
     path("update_value/", views.update_value, name="update_value"),
 
+    # -----------------------------------------------------------
+    # 📦 /api/update_values/
+    # Пакет правок одной транзакцией (фронтенд копит быстрые клики)
+    # {"changes": [{"parameter": "ustalost", "value": 3 | null, "date": "2025-05-12"}, ...]}
+    # Возвращает JSON: {"success": true, "updated": N, "deleted": M, "days": K}
+    # -----------------------------------------------------------
+    path("api/update_values/", views.update_values, name="update_values"),
+
     # API: история значений параметра
     path("api/parameter_history/", views.parameter_history, name="parameter_history"),
 
@@ -41,4 +49,7 @@ urlpatterns = [
 
     # API: переименование параметра
     path("api/rename_parameter/", views.rename_parameter, name="rename_parameter"),
+
+    # API: перцентили времени запросов по view (Server-Timing пишет RequestMetricsMiddleware)
+    path("api/metrics/", views.metrics, name="metrics"),
 ]
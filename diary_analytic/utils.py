@@ -7,13 +7,21 @@
     - get_diary_dataframe() — превращает данные из моделей Entry, Parameter, EntryValue
       в широкую таблицу для обучения и прогнозирования моделей.
     - get_today_row(date) — извлекает строку параметров за конкретный день
+    - get_parameter_history(key, to_date) — история одного параметра одним запросом
+      (с прореживанием LTTB / по неделям и месяцам для графиков)
+    - get_diary_version() — версия данных для проверки свежести кэшей
 """
 
+import numpy as np
 import pandas as pd
 from datetime import date
-from .models import EntryValue, Entry, Parameter
-import os
+from .models import EntryValue
+from django.conf import settings
 from .loggers import db_logger
+from .data_stamp import data_stamp
+from .diary_cache import diary_cache
+from .diary_export import export_diary, update_export
+from .history_downsampling import bucket_aggregate, history_cache, lttb_indices, to_datetime64
 
 
 # --------------------------------------------------------------------
@@ -40,39 +48,22 @@ def get_diary_dataframe() -> pd.DataFrame:
         | 2025-05-11   | 0.0   | NaN      | 3.0         |
         | 2025-05-12   | NaN   | 1.0      | NaN         |
 
-    :return: pd.DataFrame, индексированный по дате
-    """
-
-    # Извлекаем все значения параметров, связанных с Entry и Parameter
-    values = EntryValue.objects.select_related("entry", "parameter")
-
-    # Создаём список словарей (удобно для передачи в DataFrame)
-    rows = []
-    for val in values:
-        rows.append({
-            "date": val.entry.date,             # Дата (строка = день)
-            "parameter": val.parameter.key,     # Название параметра (ключ)
-            "value": val.value                  # Значение от 0.0 до 5.0
-        })
-
-    # Преобразуем в "узкий" DataFrame
-    df = pd.DataFrame(rows)
+    Данные берутся из материализованной таблицы diary_cache: она строится
+    один раз на процесс и дальше точечно обновляется сигналами (см. signals.py),
+    поэтому повторные вызовы не перечитывают всю историю из БД.
 
-    if df.empty:
-        return pd.DataFrame()  # если данных нет — вернуть пустую таблицу
-
-    # Преобразуем из узкого формата в "широкий":
-    # было: date | parameter | value
-    # станет: date | toshn | ustalost | ...
-    df = df.pivot(index="date", columns="parameter", values="value")
-
-    # Убедимся, что даты отсортированы (на всякий случай)
-    df.sort_index(inplace=True)
+    :return: pd.DataFrame, индексированный по дате (копия — её можно менять)
+    """
+    return diary_cache.get_dataframe()
 
-    # Можно заполнить пропуски, если нужно (по ТЗ: только при обучении)
-    # df.fillna(0.0, inplace=True)
 
-    return df
+def get_diary_version() -> int:
+    """
+    Возвращает текущую версию данных дневника в этом процессе.
+    Версия растёт при каждом изменении EntryValue / Entry / Parameter —
+    по ней можно проверить, не устарели ли производные данные.
+    """
+    return diary_cache.version
 
 
 # --------------------------------------------------------------------
@@ -86,17 +77,98 @@ def get_today_row(target_date: date) -> dict:
     Используется для:
         - передачи в модель при прогнозировании на конкретную дату
 
+    Один индексированный запрос к EntryValue с JOIN на Entry.date (date уникальна,
+    entry_id проиндексирован) — широкая таблица за всю историю не нужна,
+    поэтому время ответа не зависит от длины истории.
     Пропуски (NaN) исключаются из результата.
 
     :param target_date: дата, за которую нужна строка
     :return: dict — { "ustalost": 2.0, "toshn": 0.0, ... }
     """
 
-    df = get_diary_dataframe()
-    if df.empty or target_date not in df.index:
-        return {}
+    values = (
+        EntryValue.objects
+        .filter(entry__date=target_date)
+        .values_list("parameter__key", "value")
+    )
+    # value == value отбрасывает NaN — так же, как dropna() в широкой таблице
+    return {key: value for key, value in values if value == value}
+
+
+# --------------------------------------------------------------------
+# 📉 История одного параметра (графики)
+# --------------------------------------------------------------------
 
-    return df.loc[target_date].dropna().to_dict()
+def get_parameter_history(
+    param_key: str,
+    to_date: date,
+    from_date: date | None = None,
+    limit: int | None = None,
+    every: int = 1,
+    points: int | None = None,
+    resolution: str | None = None,
+) -> dict:
+    """
+    Возвращает значения одного параметра по датам в [from_date, to_date], по возрастанию даты.
+
+    Один запрос: параметр по ключу → индекс (parameter, entry) → Entry.date,
+    сортируются только строки этого параметра; широкая таблица не нужна.
+    Готовый ответ кэшируется (history_downsampling.history_cache) до следующего
+    изменения данных любым процессом (общий штамп data_stamp) — повторные графики не ходят в БД.
+
+    :param limit: только последние limit точек (самые свежие)
+    :param every: прореживание — каждая every-я точка, считая от последней
+                  (последняя точка всегда в ответе)
+    :param resolution: "week" / "month" — агрегация по корзинам: values — среднее,
+                       плюс "min", "max", "count"; dates — начала корзин
+    :param points: не больше points точек, отобранных LTTB (форма линии сохраняется)
+    :return: {"dates": ["YYYY-MM-DD", ...], "values": [...], "total": точек в диапазоне до прореживания}
+    """
+    cache_key = (param_key, to_date, from_date, limit, every, points, resolution)
+    # Штамп — до запроса: изменение, закоммиченное во время чтения, не попадёт в кэш под старым
+    version = data_stamp.current()
+    cached = history_cache.get(cache_key, version)
+    if cached is not None:
+        return cached
+
+    values = EntryValue.objects.filter(parameter__key=param_key, entry__date__lte=to_date)
+    if from_date is not None:
+        values = values.filter(entry__date__gte=from_date)
+    if limit is not None:
+        # Свежие точки: с конца, затем разворачиваем обратно
+        rows = list(values.order_by("-entry__date").values_list("entry__date", "value")[:limit])
+        rows.reverse()
+    else:
+        rows = list(values.order_by("entry__date").values_list("entry__date", "value").iterator(chunk_size=2000))
+
+    total = len(rows)
+    if every > 1:
+        rows = rows[::-1][::every][::-1]
+
+    if resolution is None and points is None:
+        result = {
+            "dates": [d.isoformat() for d, _ in rows],
+            "values": [v for _, v in rows],
+            "total": total,
+        }
+    else:
+        series = {
+            "dates": to_datetime64([d for d, _ in rows]),
+            "values": np.array([v for _, v in rows], dtype=np.float64),
+        }
+        if resolution is not None:
+            series = bucket_aggregate(series["dates"], series["values"], resolution)
+        if points is not None:
+            keep = lttb_indices(series["dates"].astype(np.int64), series["values"], points)
+            series = {name: column[keep] for name, column in series.items()}
+        result = {name: column.tolist() for name, column in series.items()}
+        result["dates"] = np.datetime_as_string(series["dates"], unit="D").tolist()
+        result["total"] = total
+        if resolution is not None:
+            result["resolution"] = resolution
+
+    history_cache.put(cache_key, version, result)
+    return result
 
 
 def export_diary_to_csv(filepath=None):
@@ -105,60 +177,36 @@ def export_diary_to_csv(filepath=None):
     Также создает отдельный лист/файл с описаниями параметров.
     ВНИМАНИЕ: если вы переименовали ключ параметра, старые экспортированные файлы будут содержать старый ключ.
     При необходимости обновляйте их вручную.
-    :param filepath: путь к файлу (по умолчанию other/export.csv)
+
+    Экспорт потоковый (см. diary_export): один запрос по всем значениям в порядке дат,
+    строки пишутся в файл по мере чтения, память не растёт с длиной истории.
+
+    :param filepath: путь к файлу (по умолчанию settings.DIARY_EXPORT_PATH)
     """
     if filepath is None:
-        filepath = os.path.join("other", "export.csv")
+        filepath = str(settings.DIARY_EXPORT_PATH)
 
     try:
-        # Получаем все параметры (по name, как в примере)
-        parameters = list(Parameter.objects.order_by("name"))
-        param_keys = [p.key for p in parameters]
-        param_names = [p.name for p in parameters]
-
-        # Получаем все Entry (даты)
-        entries = list(Entry.objects.order_by("-date"))
-
-        # Формируем строки для DataFrame
-        data = []
-        for entry in entries:
-            row = {"Дата": entry.date.strftime("%d.%m.%y")}
-            values = {ev.parameter_id: ev.value for ev in entry.entryvalue_set.all()}
-            for p in parameters:
-                val = values.get(p.id, None)
-                if val is None:
-                    row[p.name] = ""
-                else:
-                    row[p.name] = int(val)
-            data.append(row)
-
-        import pandas as pd
-        df = pd.DataFrame(data)
-        # Ставим "Дата" первым столбцом, остальные — как в param_names
-        columns = ["Дата"] + param_names
-        df = df[columns]
-
-        # Экспорт основной таблицы
-        if filepath.endswith('.xlsx'):
-            with pd.ExcelWriter(filepath, engine='openpyxl') as writer:
-                df.to_excel(writer, index=False, encoding="utf-8-sig", sheet_name="Данные")
-                # Описания параметров на отдельном листе
-                desc_df = pd.DataFrame({
-                    "Ключ": [p.key for p in parameters],
-                    "Название": [p.name for p in parameters],
-                    "Описание": [p.description or "" for p in parameters],
-                })
-                desc_df.to_excel(writer, index=False, encoding="utf-8-sig", sheet_name="Описания параметров")
-        else:
-            # CSV: сохраняем основной файл и отдельный файл с описаниями
-            df.to_csv(filepath, index=False, encoding="utf-8-sig")
-            desc_path = filepath.replace('.csv', '_descriptions.csv')
-            desc_df = pd.DataFrame({
-                "Ключ": [p.key for p in parameters],
-                "Название": [p.name for p in parameters],
-                "Описание": [p.description or "" for p in parameters],
-            })
-            desc_df.to_csv(desc_path, index=False, encoding="utf-8-sig")
-        db_logger.info(f"✅ Экспорт данных в CSV завершён: {filepath}, строк: {len(df)}")
+        rows = export_diary(str(filepath))
+        db_logger.info(f"✅ Экспорт данных в CSV завершён: {filepath}, строк: {rows}")
     except Exception as e:
         db_logger.exception(f"❌ Ошибка при экспорте данных в CSV: {e}")
+
+
+def update_diary_export(filepath=None, days=(), check=False):
+    """
+    Переписывает в экспорте только строки изменённых дат (см. diary_export.update_export).
+    Если изменился набор столбцов или индекса строк нет — выполняется полный экспорт.
+
+    :param filepath: путь к файлу (по умолчанию settings.DIARY_EXPORT_PATH)
+    :param days: даты, значения которых менялись
+    :param check: сверить столбцы и даты с БД (после сохранения Parameter / Entry)
+    """
+    if filepath is None:
+        filepath = str(settings.DIARY_EXPORT_PATH)
+
+    try:
+        result = update_export(str(filepath), days, check=check)
+        db_logger.info(f"✅ Экспорт обновлён: {filepath}, {result}")
+    except Exception as e:
+        db_logger.exception(f"❌ Ошибка при обновлении экспорта: {e}")
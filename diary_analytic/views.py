@@ -2,18 +2,25 @@
 
 from datetime import datetime
 from django.shortcuts import render
-from django.http import HttpRequest, HttpResponse, JsonResponse 
+from django.http import HttpRequest, HttpResponse, JsonResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_POST, require_GET, require_http_methods
-from .models import Entry, Parameter, EntryValue
+from .models import Entry, Parameter, EntryValue, TrainingJob
+from .bulk_values import apply_value_changes, parse_changes
+from .training_jobs import enqueue_retrain, run_job, training_worker
 from .forms import EntryForm
-from .utils import get_diary_dataframe, get_today_row
+from .utils import get_parameter_history, get_today_row
+from .history_downsampling import RESOLUTIONS
 from .predictor_manager import PredictorManager
+from .prediction_cache import prediction_cache
+from .request_metrics import request_metrics, span
 from .loggers import web_logger, db_logger, predict_logger
 import json
+import logging
 import os
 import traceback
 from django.conf import settings
+from django.utils import timezone
 from diary_analytic.ml_utils import get_model
 import pandas as pd
 import re
@@ -48,7 +55,7 @@ def add_entry(request: HttpRequest) -> HttpResponse:
 
     try:
         selected_date = datetime.strptime(selected_str, "%Y-%m-%d").date()
-        web_logger.debug(f"[add_entry] ✅ Получена дата из запроса: {selected_date}")
+        web_logger.debug("[add_entry] ✅ Получена дата из запроса: %s", selected_date)
     except ValueError:
         selected_date = datetime.now().date()
         web_logger.warning(f"[add_entry] ⚠️ Некорректная дата '{selected_str}' — используем текущую: {selected_date}")
@@ -59,46 +66,49 @@ def add_entry(request: HttpRequest) -> HttpResponse:
     entry, created = Entry.objects.get_or_create(date=selected_date)
 
     if created:
-        web_logger.debug(f"[add_entry] 🆕 Создана новая запись Entry на дату: {selected_date}")
+        web_logger.debug("[add_entry] 🆕 Создана новая запись Entry на дату: %s", selected_date)
     else:
-        web_logger.debug(f"[add_entry] 📄 Найдена запись Entry на дату: {selected_date}")
+        web_logger.debug("[add_entry] 📄 Найдена запись Entry на дату: %s", selected_date)
 
     # ----------------------------------------------------------------
     # 📝 3. Инициализируем форму комментария
     # ----------------------------------------------------------------
     form = EntryForm(instance=entry)
-    web_logger.debug(f"[add_entry] 🧾 Инициализирована форма комментария для Entry ({selected_date})")
+    web_logger.debug("[add_entry] 🧾 Инициализирована форма комментария для Entry (%s)", selected_date)
 
     # ----------------------------------------------------------------
     # 📌 4. Получаем все активные параметры из базы
     # ----------------------------------------------------------------
     parameters = Parameter.objects.filter(is_active=True).order_by("name")
-    web_logger.debug(f"[add_entry] 📌 Загружено активных параметров: {parameters.count()}")
+    # len(), а не count(): queryset всё равно читается шаблоном, лишний COUNT не нужен
+    web_logger.debug("[add_entry] 📌 Загружено активных параметров: %d", len(parameters))
 
     # ----------------------------------------------------------------
     # 📈 5. Загружаем текущие значения параметров за день (если есть)
     # ----------------------------------------------------------------
     entry_values = EntryValue.objects.filter(entry=entry).select_related("parameter")
-    web_logger.debug(f"[add_entry] 🔍 SQL запрос: {entry_values.query}")
+    web_logger.debug("[add_entry] 🔍 SQL запрос: %s", entry_values.query)
     
     values_map = {
         v.parameter.key: v.value
         for v in entry_values
     }
-    web_logger.debug(f"[add_entry] 📊 Загружено параметров для Entry: {len(values_map)}")
-    for key, value in values_map.items():
-        web_logger.debug(f"[add_entry] 📌 Параметр {key}: значение {value} (тип: {type(value)})")
-    
-    # Проверяем все активные параметры
-    for param in parameters:
-        if param.key not in values_map:
-            web_logger.debug(f"[add_entry] ⚠️ Параметр {param.key} не имеет значения в базе")
+    web_logger.debug("[add_entry] 📊 Загружено параметров для Entry: %d", len(values_map))
+    # Построчные дампы — только если DEBUG включён (DIARY_LOG_LEVEL)
+    if web_logger.isEnabledFor(logging.DEBUG):
+        for key, value in values_map.items():
+            web_logger.debug("[add_entry] 📌 Параметр %s: значение %s (тип: %s)", key, value, type(value))
+
+        # Проверяем все активные параметры
+        for param in parameters:
+            if param.key not in values_map:
+                web_logger.debug("[add_entry] ⚠️ Параметр %s не имеет значения в базе", param.key)
 
     # ----------------------------------------------------------------
     # 💬 6. Обработка POST-запроса (обновление комментария)
     # ----------------------------------------------------------------
     if request.method == "POST":
-        web_logger.debug(f"[add_entry] 📥 Обработка POST-запроса")
+        web_logger.debug("[add_entry] 📥 Обработка POST-запроса")
 
         form = EntryForm(request.POST, instance=entry)
         if form.is_valid():
@@ -112,7 +122,7 @@ def add_entry(request: HttpRequest) -> HttpResponse:
     # ----------------------------------------------------------------
     # 🖼️ 7. Рендерим HTML-страницу через шаблон
     # ----------------------------------------------------------------
-    web_logger.debug(f"[add_entry] 📤 Передаём данные в шаблон add_entry.html")
+    web_logger.debug("[add_entry] 📤 Передаём данные в шаблон add_entry.html")
 
     context = {
         "form": form,
@@ -124,7 +134,8 @@ def add_entry(request: HttpRequest) -> HttpResponse:
     # Добавляем прогнозы по всем моделям
     context["predictions_by_model"] = get_predictions_by_models(selected_date)
 
-    return render(request, "diary_analytic/add_entry.html", context)
+    with span("render"):
+        return render(request, "diary_analytic/add_entry.html", context)
 
 
 # --------------------------------------------------------------------
@@ -222,13 +233,51 @@ def update_value(request):
         db_logger.exception(f"🔥 Ошибка в update_value: {str(e)}")
         return JsonResponse({"error": "internal error"}, status=500)
 
+# --------------------------------------------------------------------
+# 📦 AJAX: пакет правок значений (клики, собранные фронтендом в один запрос)
+# --------------------------------------------------------------------
+
+@csrf_exempt
+@require_POST
+def update_values(request):
+    """
+    Применяет много правок одной транзакцией (см. bulk_values.apply_value_changes).
+
+    📥 Вход:
+        {"changes": [
+            {"date": "2025-05-12", "parameter": "toshn", "value": 2},
+            {"date": "2025-05-12", "parameter": "ustalost", "value": null}   ← удалить значение
+        ]}
+
+    📤 Ответ:
+    - {"success": true, "updated": N, "deleted": M, "days": K}
+    - {"error": "..."} (400) — некорректная правка или неизвестный параметр; ничего не записано
+    """
+    try:
+        data = json.loads(request.body)
+        changes = parse_changes(data.get("changes") if isinstance(data, dict) else data)
+    except ValueError as e:
+        db_logger.warning(f"[update_values] ⚠️ Некорректный запрос: {e}")
+        return JsonResponse({"error": str(e)}, status=400)
+
+    try:
+        result = apply_value_changes(changes)
+    except ValueError as e:
+        db_logger.error(f"[update_values] ❌ {e}")
+        return JsonResponse({"error": str(e)}, status=400)
+    except Exception as e:
+        db_logger.exception(f"🔥 Ошибка в update_values: {str(e)}")
+        return JsonResponse({"error": "internal error"}, status=500)
+
+    db_logger.info(
+        f"[update_values] ✅ Правок: {len(changes)} → записано {result['updated']}, "
+        f"удалено {result['deleted']}, дней {result['days']}"
+    )
+    return JsonResponse({"success": True, **result})
+
 # 📡 Обрабатывает GET-запрос на получение прогнозов по всем стратегиям
 @require_GET
 def get_predictions(request: HttpRequest) -> JsonResponse:
-    from .utils import get_today_row
-    import joblib
-    import traceback
-
     web_logger.debug("[get_predictions] 🔧 Получен запрос на прогнозы: %s", request.GET)
 
     date_str = request.GET.get("date")
@@ -243,108 +292,188 @@ def get_predictions(request: HttpRequest) -> JsonResponse:
         web_logger.warning("[get_predictions] ❌ Некорректный формат даты: %s", date_str)
         return JsonResponse({"error": "invalid date"}, status=400)
 
+    # Готовый ответ живёт, пока не изменились строка этого дня и модели (см. prediction_cache)
+    predictions = prediction_cache.get_or_compute("api", selected_date, lambda: _predictions_payload(selected_date))
+    if predictions is None:
+        return JsonResponse({"error": "no data"}, status=404)
+
+    web_logger.debug("[get_predictions] 📤 Отправка JSON с %d прогнозами", len(predictions))
+    return JsonResponse(predictions)
+
+def _predictions_payload(selected_date):
+    """
+    Прогнозы всех стратегий на дату: {"<param>_<strategy>": значение}; None — нет данных на дату.
+    """
     # Получаем строку данных для указанной даты
     row = get_today_row(selected_date)
-    web_logger.debug(f"[get_predictions] 🧩 Строка признаков на дату {selected_date}: {row}")
+    web_logger.debug("[get_predictions] 🧩 Строка признаков на дату %s: %s", selected_date, row)
     if row is None or not row:
         web_logger.warning("[get_predictions] 🚫 Данные на дату %s отсутствуют или пусты", selected_date)
-        return JsonResponse({"error": "no data"}, status=404)
+        return None
 
-    base_dir = os.path.join(settings.BASE_DIR, "diary_analytic", "trained_models")
     strategies = ["base"]  # Здесь можно добавить другие стратегии при необходимости
     predictions = {}
 
     web_logger.debug("[get_predictions] 🔍 Стратегии для прогноза: %s", strategies)
 
     for strategy in strategies:
-        model_dir = os.path.join(base_dir, strategy)
-        web_logger.debug("[get_predictions] 📂 Проверка папки моделей: %s", model_dir)
-
-        if not os.path.exists(model_dir):
-            web_logger.warning("[get_predictions] ⚠️ Папка не найдена: %s", model_dir)
+        # Готовые прогнозы из PredictionRecord, иначе одно матричное умножение (см. predict_for_date)
+        strategy_predictions = PredictorManager(strategy).predict_for_date(selected_date)
+        if not strategy_predictions:
+            web_logger.warning("[get_predictions] ⚠️ Нет моделей для стратегии: %s", strategy)
             continue
 
-        for fname in os.listdir(model_dir):
-            if not fname.endswith(".pkl"):
-                continue
-
-            param_key = fname.replace(".pkl", "")
+        for param_key, value in sorted(strategy_predictions.items()):
             full_key = f"{param_key}_{strategy}"
-            model_path = os.path.join(model_dir, fname)
+            predictions[full_key] = value
+            web_logger.debug("[get_predictions] ✅ Прогноз: %s = %s", full_key, value)
 
-            try:
-                model_dict = joblib.load(model_path)
-                if isinstance(model_dict, dict) and "model" in model_dict:
-                    model = model_dict["model"]
-                    features = model_dict.get("features", None)
-                else:
-                    model = model_dict
-                    features = None
-                web_logger.debug(f"[get_predictions] 📦 Загружена модель: {model_path}")
-                # Логируем shape входа и имена признаков
-                if hasattr(model, 'n_features_in_'):
-                    web_logger.debug(f"[get_predictions] Модель {full_key} ожидает признаков: {model.n_features_in_}")
-                if hasattr(model, 'feature_names_in_'):
-                    web_logger.debug(f"[get_predictions] Модель {full_key} ожидает признаки: {model.feature_names_in_}")
-                # Преобразуем row в список признаков в том же порядке, что и при обучении
-                if features is not None:
-                    X = pd.DataFrame([{f: row.get(f, 0.0) for f in features}])
-                    web_logger.debug(f"[get_predictions] Вход для модели {full_key}: {X}")
-                    value = float(model.predict(X)[0])
-                elif hasattr(model, 'feature_names_in_'):
-                    X = pd.DataFrame([{f: row.get(f, 0.0) for f in model.feature_names_in_}])
-                    web_logger.debug(f"[get_predictions] Вход для модели {full_key}: {X}")
-                    value = float(model.predict(X)[0])
-                else:
-                    # Fallback: просто все значения row
-                    X = pd.DataFrame([row])
-                    web_logger.debug(f"[get_predictions] Вход для модели {full_key} (fallback): {X}")
-                    value = float(model.predict(X)[0])
-                predictions[full_key] = round(value, 2)
-                web_logger.debug("[get_predictions] ✅ Прогноз: %s = %.2f", full_key, value)
-            except Exception as e:
-                tb = traceback.format_exc()
-                web_logger.error(f"[get_predictions] ⚠️ Ошибка при прогнозе {full_key}: {e}\n{tb}")
-                predictions[full_key] = None
+    return predictions
+
+# Диапазоны длиннее этого отдаются потоком (StreamingHttpResponse)
+PREDICTION_RANGE_STREAM_DAYS = 366
+# Сколько дат считается и сериализуется за один кусок потока
+PREDICTION_RANGE_CHUNK_ROWS = 256
+# Самый длинный допустимый диапазон (≈10 лет); длиннее — 400
+PREDICTION_RANGE_MAX_DAYS = 3660
 
-    web_logger.debug("[get_predictions] 📤 Отправка JSON с %d прогнозами", len(predictions))
-    return JsonResponse(predictions)
 
-# 📦 Обучает модели по всем стратегиям и сохраняет их в отдельные папки
+# 📡 Прогнозы по диапазону дат: одна матрица признаков и одно умножение на стратегию
+@require_GET
+def get_predictions_range(request: HttpRequest) -> HttpResponse:
+    """
+    Возвращает сетку прогнозов «даты × targets» по каждой стратегии.
+
+    GET-параметры:
+        start: первая дата (YYYY-MM-DD)
+        end:   последняя дата включительно (YYYY-MM-DD)
+        strategies: список через запятую (по умолчанию "base,flags")
+
+    Ответ:
+        {
+          "start": "...", "end": "...",
+          "dates": ["2025-05-01", ...],
+          "strategies": {
+            "base": {"targets": ["toshn", ...], "values": [[1.2, ...], ...]}
+          }
+        }
+    Значение null — модель не дала прогноза. Длинные диапазоны отдаются потоком:
+    прогнозы считаются кусками по PREDICTION_RANGE_CHUNK_ROWS дат по мере отправки,
+    поэтому в памяти нет всей сетки. Диапазон длиннее PREDICTION_RANGE_MAX_DAYS — 400.
+    """
+    start_str = request.GET.get("start")
+    end_str = request.GET.get("end")
+    if not start_str or not end_str:
+        return JsonResponse({"error": "missing start or end"}, status=400)
+    try:
+        start = datetime.strptime(start_str, "%Y-%m-%d").date()
+        end = datetime.strptime(end_str, "%Y-%m-%d").date()
+    except ValueError:
+        return JsonResponse({"error": "invalid date"}, status=400)
+    if end < start:
+        return JsonResponse({"error": "end before start"}, status=400)
+    if (end - start).days + 1 > PREDICTION_RANGE_MAX_DAYS:
+        return JsonResponse({"error": f"range longer than {PREDICTION_RANGE_MAX_DAYS} days"}, status=400)
+
+    strategies = [s for s in request.GET.get("strategies", "base,flags").split(",") if s]
+    try:
+        for strategy in strategies:
+            get_model(strategy)
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
+    days = pd.date_range(start, end, freq="D").date
+    dates = [d.isoformat() for d in days]
+    web_logger.debug(
+        "[get_predictions_range] 📆 %s — %s: %d дат, стратегии: %s",
+        start, end, len(dates), strategies,
+    )
+
+    def grids(manager):
+        # Сетка кусками: столбцы — как у первого куска, даже если модели сменятся посреди потока
+        targets = None
+        for offset in range(0, len(days), PREDICTION_RANGE_CHUNK_ROWS):
+            chunk = days[offset:offset + PREDICTION_RANGE_CHUNK_ROWS]
+            grid = manager.predict_range(chunk[0], chunk[-1])
+            targets = list(grid.columns) if targets is None else targets
+            yield targets, grid.reindex(columns=targets)
+
+    def stream():
+        yield json.dumps({"start": start_str, "end": end_str, "dates": dates})[:-1]
+        yield ', "strategies": {'
+        for i, strategy in enumerate(strategies):
+            yield ("," if i else "") + json.dumps(strategy) + ": "
+            for offset, (targets, grid) in enumerate(grids(PredictorManager(strategy))):
+                if not offset:
+                    yield '{"targets": ' + json.dumps(targets) + ', "values": ['
+                # NaN → null, чтобы ответ оставался валидным JSON
+                rows = grid.astype(object).where(grid.notna(), None).values.tolist()
+                yield ("," if offset else "") + ",".join(json.dumps(row) for row in rows)
+            yield "]}"
+        yield "}}"
+
+    if len(dates) > PREDICTION_RANGE_STREAM_DAYS:
+        return StreamingHttpResponse(stream(), content_type="application/json")
+    return HttpResponse("".join(stream()), content_type="application/json")
+
+# 📦 Ставит переобучение моделей по всем стратегиям в фоновую очередь
 @csrf_exempt
 @require_POST
 def retrain_models_all(request: HttpRequest) -> JsonResponse:
-    from .utils import get_diary_dataframe
+    """
+    Ставит переобучение всех стратегий в очередь (см. training_jobs) и сразу
+    возвращает {"status": "queued", "job_id": ...}. Ход обучения — GET /retrain_status/?job=<id>.
+
+    С параметром ?wait=1 обучает синхронно и возвращает итог, как раньше:
+    {"status": "ok" | "error", "details": [...]}.
+    """
     web_logger.info("=== retrain_models_all вызвана ===")
-    web_logger.info("[retrain] 🔁 Запущено переобучение моделей по всем стратегиям...")
+    strategies = ["base", "flags"]  # теперь обе модели!
 
-    df = get_diary_dataframe()
-    today = datetime.now().date()
-    # Исправленная фильтрация по дате
-    if "date" in df.columns:
-        df = df[df["date"] < today]
-    else:
-        df = df.reset_index()
-        if "date" in df.columns:
-            df = df[df["date"] < today]
-        # если и после этого нет — не фильтруем
+    if request.GET.get("wait") == "1":
+        web_logger.info("[retrain] 🔁 Синхронное переобучение моделей по всем стратегиям...")
+        job = TrainingJob.objects.create(
+            strategies=strategies, status=TrainingJob.STATUS_RUNNING, started_at=timezone.now(),
+        )
+        job = run_job(job)
+        return JsonResponse({"status": job.status, "details": job.details, "job_id": job.pk})
 
-    web_logger.info(f"Перед обучением: df.columns = {list(df.columns)}")
+    job = enqueue_retrain(strategies)
+    web_logger.info(f"[retrain] 📥 Переобучение поставлено в очередь: задание #{job.pk}")
+    return JsonResponse({"status": "queued", "job_id": job.pk}, status=202)
 
-    strategies = ["base", "flags"]  # теперь обе модели!
-    results = []
 
-    from .predictor_manager import PredictorManager
-    for strategy_name in strategies:
-        web_logger.debug(f"[retrain] ▶️ Стратегия: {strategy_name}")
-        manager = PredictorManager(strategy_name)
-        res = manager.train(df.copy())
-        results.extend(res)
+# 📡 Прогресс фонового переобучения
+@require_GET
+def retrain_status(request: HttpRequest) -> JsonResponse:
+    """
+    Возвращает состояние задания переобучения.
+    GET-параметры:
+        job: id задания (по умолчанию — последнее)
+    Ответ:
+        {"job_id", "status": queued|running|ok|error, "done", "total",
+         "current_target", "timings": {"base:toshn": 0.01, ...}, "details": [...], "error"}
+    """
+    job_id = request.GET.get("job")
+    jobs = TrainingJob.objects.order_by("-pk")
+    job = jobs.filter(pk=job_id).first() if job_id and job_id.isdigit() else (None if job_id else jobs.first())
+    if job is None:
+        return JsonResponse({"error": "not found"}, status=404)
 
-    # Новый блок: если есть ошибки, возвращаем status: error
-    if any("❌" in msg for msg in results):
-        return JsonResponse({"status": "error", "details": results})
-    return JsonResponse({"status": "ok", "details": results})
+    if job.status == TrainingJob.STATUS_QUEUED:
+        # Задание могло остаться в очереди после перезапуска — будим воркер
+        training_worker.wake()
+
+    return JsonResponse({
+        "job_id": job.pk,
+        "status": job.status,
+        "done": job.done,
+        "total": job.total,
+        "current_target": job.current_target,
+        "timings": job.timings,
+        "details": job.details,
+        "error": job.error,
+    })
 
 # --------------------------------------------------------------------
 # 📊 API: история значений параметра по датам
@@ -356,7 +485,12 @@ def parameter_history(request):
     GET-параметры:
         param: ключ параметра (например, 'ustalost')
         date:  конечная дата (например, '2025-05-13')
-    Ответ: { dates: [...], values: [...] }
+        from:  начальная дата (необязательно)
+        limit: только последние N точек (необязательно)
+        every: каждая N-я точка, считая от последней (необязательно, для длинных графиков)
+        resolution: 'week' | 'month' — средние по неделям / месяцам, плюс min, max, count (необязательно)
+        points: не больше N точек, отобранных LTTB с сохранением формы (необязательно, N >= 3)
+    Ответ: { dates: [...], values: [...], total: точек в диапазоне до прореживания }
     """
     param_key = request.GET.get('param')
     date_str = request.GET.get('date')
@@ -364,28 +498,26 @@ def parameter_history(request):
         return JsonResponse({'error': 'missing param or date'}, status=400)
     try:
         to_date = datetime.strptime(date_str, '%Y-%m-%d').date()
+        from_str = request.GET.get('from')
+        from_date = datetime.strptime(from_str, '%Y-%m-%d').date() if from_str else None
     except ValueError:
         return JsonResponse({'error': 'invalid date'}, status=400)
-
-    df = get_diary_dataframe()
-    if df.empty or param_key not in df.columns:
-        return JsonResponse({'dates': [], 'values': []})
-
-    # Оставляем только даты <= выбранной
-    df = df.loc[df.index <= to_date]
-    # Если данных нет — вернуть пусто
-    if df.empty:
-        return JsonResponse({'dates': [], 'values': []})
-
-    # Убираем пропуски
-    series = df[param_key].dropna()
-    if series.empty:
-        return JsonResponse({'dates': [], 'values': []})
-
-    # Формируем списки для ответа
-    dates = [d.strftime('%Y-%m-%d') for d in series.index]
-    values = series.values.tolist()
-    return JsonResponse({'dates': dates, 'values': values})
+    try:
+        limit = int(request.GET['limit']) if request.GET.get('limit') else None
+        every = int(request.GET.get('every') or 1)
+        points = int(request.GET['points']) if request.GET.get('points') else None
+    except ValueError:
+        return JsonResponse({'error': 'invalid limit, every or points'}, status=400)
+    if (limit is not None and limit < 1) or every < 1 or (points is not None and points < 3):
+        return JsonResponse({'error': 'invalid limit, every or points'}, status=400)
+    resolution = request.GET.get('resolution') or None
+    if resolution is not None and resolution not in RESOLUTIONS:
+        return JsonResponse({'error': 'invalid resolution'}, status=400)
+
+    # Один запрос по индексу (parameter, entry) вместо широкой таблицы по всем параметрам
+    return JsonResponse(get_parameter_history(
+        param_key, to_date, from_date, limit=limit, every=every, points=points, resolution=resolution,
+    ))
 
 def get_predictions_by_models(date):
     model_names = ["base", "flags"]  # список моделей, которые есть
@@ -428,7 +560,7 @@ def set_parameter_description(request):
             return JsonResponse({"error": "missing key"}, status=400)
         param = Parameter.objects.get(key=key)
         param.description = description
-        param.save()
+        param.save(update_fields=["description"])
         return JsonResponse({"success": True})
     except Parameter.DoesNotExist:
         return JsonResponse({"error": "not found"}, status=404)
@@ -464,4 +596,20 @@ def rename_parameter(request):
     except Parameter.DoesNotExist:
         return JsonResponse({"error": "not found"}, status=404)
     except Exception as e:
-        return JsonResponse({"error": str(e)}, status=400)
\ No newline at end of file
+        return JsonResponse({"error": str(e)}, status=400)
+
+
+# --------------------------------------------------------------------
+# ⏱️ API: время запросов по view (см. request_metrics.py)
+# --------------------------------------------------------------------
+@require_GET
+def metrics(request):
+    """
+    Перцентили времени запросов по каждому view за последние DIARY_METRICS_WINDOW запросов:
+    общее время, число и время SQL, отрезки model_load / predict / dataframe / render.
+    ?reset=1 — начать окно заново.
+    """
+    data = request_metrics.snapshot()
+    if request.GET.get("reset") == "1":
+        request_metrics.reset()
+    return JsonResponse(data)